@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:54
+
+import accounts.models
+import mediafiles.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0003_profile_saved_comments"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="profile",
+            name="avatar",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                upload_to=accounts.models.profile_avatar_path,
+                validators=[mediafiles.validators.validate_image_upload],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="profile",
+            name="banner",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                upload_to=accounts.models.profile_banner_path,
+                validators=[mediafiles.validators.validate_image_upload],
+            ),
+        ),
+    ]
@@ -1,14 +1,31 @@
 from django.db import models
 from django.contrib.auth.models import User
 from blog.models import Post, Comment
+from mediafiles.images import upload_path
+from mediafiles.mixins import ProcessedImagesMixin
+from mediafiles.validators import validate_image_upload
 
 
-class Profile(models.Model):
+def profile_avatar_path(instance, filename):
+    return upload_path("avatars", filename)
+
+
+def profile_banner_path(instance, filename):
+    return upload_path("banners", filename)
+
+
+class Profile(ProcessedImagesMixin, models.Model):
+    image_profiles = {"avatar": "avatar", "banner": "banner"}
+
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     nombre = models.CharField(max_length=150, blank=True)
     bio = models.TextField(blank=True)
-    avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
-    banner = models.ImageField(upload_to='banners/', blank=True, null=True)
+    avatar = models.ImageField(upload_to=profile_avatar_path,
+                               blank=True, null=True,
+                               validators=[validate_image_upload])
+    banner = models.ImageField(upload_to=profile_banner_path,
+                               blank=True, null=True,
+                               validators=[validate_image_upload])
     saved_posts = models.ManyToManyField(Post,
                                          blank=True, related_name='saved_by')
     saved_comments = models.ManyToManyField(Comment,
@@ -4,6 +4,8 @@ from django.contrib.auth.models import User
 from .forms import ProfileForm
 from .models import Profile
 from blog.models import Post, Comment
+from blog.services.feed import feed_loader
+from blog.services.vote_buffer import apply_pending_votes
 from django.http import JsonResponse
 
 
@@ -16,9 +18,14 @@ def profile_view(request, username=None):
 
     profile, created = Profile.objects.get_or_create(user=user_obj)
 
-    posts = Post.objects.filter(author=user_obj)
-    comments = Comment.objects.filter(author=user_obj)
-    saved_posts = profile.saved_posts.all()
+    posts = list(feed_loader(Post.objects.filter(author=user_obj)))
+    comments = list(Comment.objects.filter(author=user_obj).select_related(
+        "author", "post"))
+    saved_posts = list(feed_loader(profile.saved_posts.all()))
+    saved_comments = list(
+        profile.saved_comments.select_related("author", "post")
+    )
+    apply_pending_votes(posts + comments + saved_posts + saved_comments)
 
     return render(request, "accounts/profile.html", {
         "user_obj": user_obj,
@@ -26,8 +33,9 @@ def profile_view(request, username=None):
         "posts": posts,
         "comments": comments,
         "saved_posts": saved_posts,
-        "num_posts": posts.count(),
-        "num_comments": comments.count(),
+        "saved_comments": saved_comments,
+        "num_posts": len(posts),
+        "num_comments": len(comments),
     })
 
 
@@ -38,19 +46,16 @@ def settings_view(request):
     if request.method == "POST":
         form = ProfileForm(request.POST, request.FILES, instance=profile)
 
-        if request.POST.get('delete_avatar') == 'true':
-            if profile.avatar:
-                profile.avatar.delete(save=False)
+        if form.is_valid():
+            profile = form.save(commit=False)
+
+            # Els fitxers s'esborren en diferit quan es desa el perfil
+            if request.POST.get('delete_avatar') == 'true':
                 profile.avatar = None
 
-        if request.POST.get('delete_banner') == 'true':
-            if profile.banner:
-                profile.banner.delete(save=False)
+            if request.POST.get('delete_banner') == 'true':
                 profile.banner = None
 
-        if form.is_valid():
-            profile = form.save(commit=False)
-
             if 'nombre' in form.cleaned_data:
                 request.user.first_name = form.cleaned_data['nombre']
                 request.user.save()
@@ -71,7 +76,7 @@ def toggle_saved_post(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     profile = request.user.profile
 
-    if post in profile.saved_posts.all():
+    if profile.saved_posts.filter(pk=post.pk).exists():
         profile.saved_posts.remove(post)
         saved = False
     else:
@@ -86,7 +91,7 @@ def toggle_saved_comment(request, comment_id):
     comment = get_object_or_404(Comment, pk=comment_id)
     profile = request.user.profile
 
-    if comment in profile.saved_comments.all():
+    if profile.saved_comments.filter(pk=comment.pk).exists():
         profile.saved_comments.remove(comment)
         saved = False
     else:
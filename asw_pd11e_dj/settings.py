@@ -29,6 +29,7 @@ INSTALLED_APPS = [
     "blog",
     "communities",
     "accounts",
+    "mediafiles",
     "allauth",
     "allauth.account",
     "allauth.socialaccount",
@@ -89,6 +90,61 @@ DATABASES = {
     }
 }
 
+# -----------------------
+# Cache
+# -----------------------
+# "community_feeds": ids de posts i comptadors de cada comunitat
+# (communities/cache.py). Amb CULL_FREQUENCY == MAX_ENTRIES, LocMemCache
+# treu només l'entrada menys usada recentment (LRU) quan s'omple.
+#
+# Com a "post_cards", LocMem és per procés: amb diversos workers, un post,
+# comentari o subscripció nova només invalida el feed del worker que l'ha
+# rebut, i els altres poden servir el feed i els comptadors d'abans
+# durant TIMEOUT segons (1 minut com a molt). Amb
+# COMMUNITY_FEEDS_REDIS_URL la cache es comparteix entre workers.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "community_feeds": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "community-feeds",
+        "TIMEOUT": 60,
+        "OPTIONS": {"MAX_ENTRIES": 1000, "CULL_FREQUENCY": 1000},
+    },
+    # Fragments de post_card.html (blog/services/post_cards.py). El
+    # TIMEOUT ha de quedar per sota de MEDIA_SIGNED_URL_TTL, perquè els
+    # fragments porten les URLs de les imatges.
+    #
+    # LocMem és per procés, i les versions que invaliden els fragments
+    # també: amb diversos workers de gunicorn, una edició o un canvi de
+    # comunitats només invalida el fragment del worker que l'ha rebut.
+    # Els altres poden servir el títol, el contingut o les comunitats
+    # d'abans durant TIMEOUT segons (5 minuts com a molt). Amb
+    # POST_CARDS_REDIS_URL la cache es comparteix entre workers i la
+    # invalidació és immediata a tots.
+    "post_cards": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "post-cards",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+COMMUNITY_FEEDS_REDIS_URL = os.environ.get("COMMUNITY_FEEDS_REDIS_URL")
+if COMMUNITY_FEEDS_REDIS_URL:
+    CACHES["community_feeds"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": COMMUNITY_FEEDS_REDIS_URL,
+        "TIMEOUT": 60,
+    }
+POST_CARDS_REDIS_URL = os.environ.get("POST_CARDS_REDIS_URL")
+if POST_CARDS_REDIS_URL:
+    CACHES["post_cards"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": POST_CARDS_REDIS_URL,
+        "TIMEOUT": 300,
+    }
+
 # -----------------------
 # Password Validators
 # -----------------------
@@ -139,11 +195,16 @@ AWS_STORAGE_BUCKET_NAME = "asw-pd11e-dj"
 AWS_S3_REGION_NAME = "us-east-1"
 
 STORAGES = {
-    "default": {  # Media files
-        "BACKEND": "storages.backends.s3boto3.S3Boto3Storage",
+    # Media files: content-addressed (deduplicated) on top of S3,
+    # see mediafiles/storage.py
+    "default": {
+        "BACKEND": "mediafiles.storage.ContentAddressedStorage",
         "OPTIONS": {
-            "bucket_name": AWS_STORAGE_BUCKET_NAME,
-            "region_name": AWS_S3_REGION_NAME,
+            "backend": "asw_pd11e_dj.storages.PooledS3Boto3Storage",
+            "options": {
+                "bucket_name": AWS_STORAGE_BUCKET_NAME,
+                "region_name": AWS_S3_REGION_NAME,
+            },
         },
     },
     "staticfiles": {  # Keep static files local
@@ -153,6 +214,44 @@ STORAGES = {
 
 MEDIA_URL = f"https://{AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/"
 
+# Les URL de media es construeixen a partir de MEDIA_URL sense passar per
+# l'storage (mediafiles/images.py). Amb MEDIA_SIGNED_URLS=1 se signen i
+# es reutilitzen en memòria durant MEDIA_SIGNED_URL_TTL segons.
+MEDIA_SIGNED_URLS = os.environ.get("MEDIA_SIGNED_URLS", "") == "1"
+MEDIA_SIGNED_URL_TTL = 50 * 60
+AWS_QUERYSTRING_AUTH = MEDIA_SIGNED_URLS
+
+# Client S3 compartit (asw_pd11e_dj/storages.py): connexions obertes,
+# pujades multipart a partir de 8 MB i 4 parts en paral·lel.
+AWS_S3_MAX_POOL_CONNECTIONS = 50
+AWS_S3_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+AWS_S3_MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+AWS_S3_MAX_CONCURRENCY = 4
+# Per renovar el token de sessió sense reiniciar, p. ex.
+# "asw_pd11e_dj.storages.shared_credentials_file"
+AWS_S3_CREDENTIALS_REFRESHER = os.environ.get("AWS_S3_CREDENTIALS_REFRESHER")
+
+# -----------------------
+# Media processing
+# -----------------------
+# Les imatges pujades es converteixen a WebP fora de la petició
+# (mediafiles/tasks.py). Amb False la conversió es fa en línia.
+MEDIA_TRANSCODE_ASYNC = True
+MEDIA_TRANSCODE_WORKERS = 2
+# Límits de les imatges pujades (mediafiles/validators.py): mida del
+# fitxer i píxels declarats a la capçalera.
+MEDIA_MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+MEDIA_MAX_IMAGE_PIXELS = 40_000_000
+
+# -----------------------
+# Votes
+# -----------------------
+# Write-behind: els vots s'acumulen en un buffer i es bolquen a
+# Post.votes / Comment.votes cada VOTE_FLUSH_INTERVAL_MS mil·lisegons.
+VOTE_WRITE_BEHIND = os.environ.get("VOTE_WRITE_BEHIND", "") == "1"
+VOTE_BUFFER_BACKEND = "blog.services.vote_buffer.LocalVoteBuffer"
+VOTE_FLUSH_INTERVAL_MS = 500
+
 # -----------------------
 # Auth / Allauth
 # -----------------------
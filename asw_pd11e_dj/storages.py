@@ -1,8 +1,196 @@
-from storages.backends.s3boto3 import S3Boto3Storage
+import configparser
+import os
+import threading
+from datetime import timedelta
+
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.credentials import RefreshableCredentials
 from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name, setting
+
+MB = 1024 * 1024
+
+# Clients compartits per tot el procés: (config) -> (client, resource class)
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def shared_credentials_file(profile=None, ttl=None):
+    """
+    Credential refresher that re-reads the shared credentials file
+    (AWS_SHARED_CREDENTIALS_FILE or ~/.aws/credentials), where temporary
+    lab/SSO credentials are usually rotated. The result is considered
+    valid for AWS_S3_CREDENTIALS_TTL seconds (default 15 minutes).
+    """
+    path = os.environ.get("AWS_SHARED_CREDENTIALS_FILE",
+                          os.path.expanduser("~/.aws/credentials"))
+    profile = profile or os.environ.get("AWS_PROFILE", "default")
+    ttl = ttl or setting("AWS_S3_CREDENTIALS_TTL", 15 * 60)
+
+    parser = configparser.ConfigParser()
+    parser.read(path)
+    section = parser[profile]
+    return {
+        "access_key": section["aws_access_key_id"],
+        "secret_key": section["aws_secret_access_key"],
+        "token": section.get("aws_session_token"),
+        "expiry_time": (timezone.now() + timedelta(seconds=ttl)).isoformat(),
+    }
+
+
+class PooledS3Boto3Storage(S3Boto3Storage):
+    """
+    S3 storage that reuses one botocore client (and its HTTP connection
+    pool) per process instead of building a session and client per
+    storage instance and thread.
+
+    - ``max_pool_connections`` (AWS_S3_MAX_POOL_CONNECTIONS) bounds the
+      connections kept alive by the shared client.
+    - Objects above ``multipart_threshold`` (AWS_S3_MULTIPART_THRESHOLD)
+      are uploaded in ``multipart_chunksize`` parts, ``max_concurrency``
+      (AWS_S3_MAX_CONCURRENCY) at a time.
+    - ``credentials_refresher`` (AWS_S3_CREDENTIALS_REFRESHER), a callable
+      or its dotted path, returns botocore credential metadata
+      (access_key, secret_key, token, expiry_time). When set, the client
+      refreshes expiring session tokens by itself.
+
+    Each thread gets its own (cheap) boto3 resource wrapping the shared
+    client, since resources are not thread-safe but clients are.
+    """
+
+    def get_default_settings(self):
+        return {
+            **super().get_default_settings(),
+            "max_pool_connections": setting("AWS_S3_MAX_POOL_CONNECTIONS",
+                                            50),
+            "multipart_threshold": setting("AWS_S3_MULTIPART_THRESHOLD",
+                                           8 * MB),
+            "multipart_chunksize": setting("AWS_S3_MULTIPART_CHUNKSIZE",
+                                           8 * MB),
+            "max_concurrency": setting("AWS_S3_MAX_CONCURRENCY", 4),
+            "credentials_refresher": setting("AWS_S3_CREDENTIALS_REFRESHER"),
+        }
+
+    def __init__(self, **kwargs):
+        custom_transfer = (kwargs.get("transfer_config")
+                           or setting("AWS_S3_TRANSFER_CONFIG"))
+        super().__init__(**kwargs)
+        self.client_config = self.client_config.merge(
+            Config(max_pool_connections=self.max_pool_connections)
+        )
+        if not custom_transfer:
+            self.transfer_config = TransferConfig(
+                multipart_threshold=self.multipart_threshold,
+                multipart_chunksize=self.multipart_chunksize,
+                max_concurrency=self.max_concurrency,
+                use_threads=self.max_concurrency > 1,
+            )
+
+    def _pool_key(self):
+        return (
+            self.session_profile, self.access_key, self.security_token,
+            self.region_name, self.endpoint_url, self.use_ssl, self.verify,
+            self.max_pool_connections, self.signature_version,
+            self.addressing_style, repr(self.credentials_refresher),
+        )
+
+    def _create_session(self):
+        session = super()._create_session()
+        refresher = self.credentials_refresher
+        if refresher:
+            if isinstance(refresher, str):
+                refresher = import_string(refresher)
+            session._session._credentials = (
+                RefreshableCredentials.create_from_metadata(
+                    metadata=refresher(),
+                    refresh_using=refresher,
+                    method="asw-refresher",
+                )
+            )
+        return session
+
+    def _shared_client(self):
+        key = self._pool_key()
+        with _clients_lock:
+            if key not in _clients:
+                resource = self._create_session().resource(
+                    "s3",
+                    region_name=self.region_name,
+                    use_ssl=self.use_ssl,
+                    endpoint_url=self.endpoint_url,
+                    config=self.client_config,
+                    verify=self.verify,
+                )
+                _clients[key] = (resource.meta.client, type(resource))
+            return _clients[key]
+
+    @property
+    def connection(self):
+        connection = getattr(self._connections, "connection", None)
+        if connection is None:
+            client, resource_class = self._shared_client()
+            connection = resource_class(client=client)
+            self._connections.connection = connection
+        return connection
+
+    @property
+    def bucket(self):
+        # Per fil, com la connexió (el Bucket és un resource)
+        bucket = getattr(self._connections, "bucket", None)
+        if bucket is None:
+            bucket = self.connection.Bucket(self.bucket_name)
+            self._connections.bucket = bucket
+        return bucket
+
+    def delete_many(self, names):
+        """
+        Deletes `names` with DeleteObjects, 1,000 keys per request.
+        Returns the per-key errors reported by S3, with "Key" set back to
+        the name it was given.
+        """
+        client = self.connection.meta.client
+        names_by_key = {self._normalize_name(clean_name(name)): name
+                        for name in names}
+        keys = list(names_by_key)
+        errors = []
+        for start in range(0, len(keys), 1000):
+            response = client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={
+                    "Objects": [{"Key": key}
+                                for key in keys[start:start + 1000]],
+                    "Quiet": True,
+                },
+            )
+            errors.extend(
+                {**error, "Key": names_by_key.get(error["Key"], error["Key"])}
+                for error in response.get("Errors", [])
+            )
+        return errors
+
+    def iter_keys(self):
+        """Streams (key, last modified) from the bucket listing."""
+        paginator = self.connection.meta.client.get_paginator(
+            "list_objects_v2")
+        prefix = self._normalize_name("")
+        prefix = f"{prefix.rstrip('/')}/" if prefix else ""
+        for page in paginator.paginate(Bucket=self.bucket_name,
+                                       Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(prefix):], obj["LastModified"]
+
+
+def reset_shared_clients():
+    """Drops the pooled clients (after rotating static keys, in tests)."""
+    with _clients_lock:
+        _clients.clear()
 
 
-class TemporaryS3Boto3Storage(S3Boto3Storage):
+class TemporaryS3Boto3Storage(PooledS3Boto3Storage):
     """
     Custom S3 storage that works with temporary AWS credentials.
     """
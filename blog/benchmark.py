@@ -0,0 +1,92 @@
+"""
+Peak memory and time to the first comment of ``comments_index`` over
+generated threads, building the whole tree for a JsonResponse and
+streaming it one root subtree at a time (``?stream=1``).
+
+Measured in-process: the peak comes from tracemalloc, so it covers the
+Python objects built for the response (querysets, nodes, JSON text)
+and not the database driver's own buffers. Run it through the
+``comments_benchmark`` fixture in blog/tests/services/test_comment_tree.py.
+"""
+import time
+import tracemalloc
+
+from blog.models import Comment
+from blog.models.comment import PATH_STEP, path_segment
+
+# (root comments, replies per root) of the generated threads
+THREADS = [(100, 10), (400, 10)]
+
+
+def _with_paths(comments, parents):
+    for comment in comments:
+        parent = parents.get(comment.parent_id)
+        comment.path = (parent.path if parent else "") + path_segment(
+            comment.pk)
+        comment.depth = len(comment.path) // PATH_STEP - 1
+    Comment.objects.bulk_update(comments, ["path", "depth"])
+    return comments
+
+
+def comment_thread(post, author, roots, replies):
+    """
+    `roots` root comments with `replies` replies each, inserted with
+    bulk_create (paths included, which save() would otherwise set).
+    """
+    text = "Lorem ipsum dolor sit amet. " * 8
+
+    def build(parent=None):
+        return Comment(post=post, author=author, content=text,
+                       url=post.url, parent=parent)
+
+    top = _with_paths(
+        Comment.objects.bulk_create(build() for _ in range(roots)), {}
+    )
+    _with_paths(
+        Comment.objects.bulk_create(
+            build(root) for root in top for _ in range(replies)
+        ),
+        {root.pk: root for root in top},
+    )
+
+
+def measure(post_id, stream):
+    """
+    Renders comments_index for `post_id` as an anonymous user and
+    returns {"bytes", "first_comment", "seconds", "peak"}:
+    first_comment is the time until the response had produced a
+    comment (more than the opening "["), peak the tracemalloc peak.
+    """
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+    from blog.views.post_views import comments_index
+
+    request = RequestFactory().get(f"/blog/posts/{post_id}/comments/",
+                                   {"stream": "1"} if stream else {})
+    request.user = AnonymousUser()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    first_comment, size = None, 0
+    response = comments_index(request, post_id)
+    for chunk in response:
+        size += len(chunk)
+        if first_comment is None and size > 1:
+            first_comment = time.perf_counter() - start
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"bytes": size, "first_comment": first_comment,
+            "seconds": seconds, "peak": peak}
+
+
+def report(results):
+    lines = [f"{'thread':<14}{'mode':<10}{'JSON':>9}{'first':>9}"
+             f"{'total':>9}{'peak':>10}"]
+    for (roots, replies, mode), r in results.items():
+        lines.append(
+            f"{f'{roots}x{replies}':<14}{mode:<10}"
+            f"{r['bytes'] / 2**20:>7.1f}MB{r['first_comment'] * 1000:>7.0f}ms"
+            f"{r['seconds'] * 1000:>7.0f}ms{r['peak'] / 2**20:>8.1f}MB"
+        )
+    return "\n".join(lines)
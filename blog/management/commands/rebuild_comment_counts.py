@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from blog.models import Comment, Post
+from blog.services.ranking import refresh_post_scores
+
+
+def comment_count_subquery():
+    """Subquery with the real number of comments of the outer post."""
+    counts = (
+        Comment.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula Post.comment_count a partir de la taula de comentaris "
+        "i refresca hot_score, que en depèn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        updated = Post.objects.update(comment_count=comment_count_subquery())
+
+        # Els scores es calculen a partir dels comptadors emmagatzemats
+        ids = Post.objects.order_by("id").values_list("id", flat=True)
+        last_id = 0
+        while True:
+            batch = list(ids.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            refresh_post_scores(batch)
+            last_id = batch[-1]
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Comptadors recalculats per {updated} posts.")
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from blog.models import Post
+from blog.services.ranking import recompute_post_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula els vots (upvotes, downvotes), hot_score i "
+        "controversy_score de tots els posts. "
+        "Pensat per executar-se periòdicament (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        ids = Post.objects.order_by("id").values_list("id", flat=True)
+        total, last_id = 0, 0
+        while True:
+            batch = list(ids.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            total += recompute_post_scores(batch)
+            last_id = batch[-1]
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Scores recalculats per {total} posts.")
+        )
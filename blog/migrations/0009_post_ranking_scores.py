@@ -0,0 +1,90 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:29
+
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+# Còpia de blog/services/ranking.py tal com era en aquesta migració, perquè
+# el backfill no canviï si la fórmula canvia més endavant.
+HOT_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+HOT_DECAY_SECONDS = 45000
+COMMENT_WEIGHT = 0.5
+
+
+def hot_score(ups, downs, comments, published_date):
+    score = ups - downs + COMMENT_WEIGHT * comments
+    order = math.log10(max(abs(score), 1))
+    sign = (score > 0) - (score < 0)
+    seconds = (published_date - HOT_EPOCH).total_seconds()
+    return sign * order + seconds / HOT_DECAY_SECONDS
+
+
+def controversy_score(ups, downs):
+    if ups <= 0 or downs <= 0:
+        return 0.0
+    balance = downs / ups if ups > downs else ups / downs
+    return (ups + downs) ** balance
+
+
+def backfill_scores(apps, schema_editor):
+    Post = apps.get_model("blog", "Post")
+    VotePost = apps.get_model("blog", "VotePost")
+    last_id = 0
+    while True:
+        posts = list(Post.objects.filter(id__gt=last_id).order_by("id")[:500])
+        if not posts:
+            break
+        tallies = {
+            row["post"]: (row["ups"], row["downs"])
+            for row in VotePost.objects.filter(post__in=posts)
+            .order_by()
+            .values("post")
+            .annotate(ups=Count("id", filter=Q(vote=1)),
+                      downs=Count("id", filter=Q(vote=-1)))
+        }
+        for post in posts:
+            ups, downs = tallies.get(post.pk, (0, 0))
+            post.hot_score = hot_score(ups, downs, post.comment_count,
+                                       post.published_date)
+            post.controversy_score = controversy_score(ups, downs)
+        Post.objects.bulk_update(posts, ["hot_score", "controversy_score"])
+        last_id = posts[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0008_post_comment_count"),
+        ("communities", "0002_community_subscribers"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="controversy_score",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="hot_score",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["-hot_score", "-id"], name="post_hot_score_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["-controversy_score", "-id"],
+                name="post_controversy_score_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+    ]
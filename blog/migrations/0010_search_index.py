@@ -0,0 +1,71 @@
+# Índex de cerca full-text (blog/services/search.py). Només es crea per
+# a SQLite (FTS5) i PostgreSQL (tsvector + GIN); la resta de bases de
+# dades fan servir el fallback amb icontains.
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE blog_post_fts USING fts5("
+    "title, content, tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE blog_comment_fts USING fts5("
+    "content, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO blog_post_fts (rowid, title, content) "
+    "SELECT id, title, content FROM blog_post",
+    "INSERT INTO blog_comment_fts (rowid, content) "
+    "SELECT id, content FROM blog_comment",
+]
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS blog_post_fts",
+    "DROP TABLE IF EXISTS blog_comment_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE TABLE blog_post_search ("
+    "post_id bigint PRIMARY KEY "
+    "REFERENCES blog_post (id) ON DELETE CASCADE DEFERRABLE "
+    "INITIALLY DEFERRED, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX blog_post_search_gin ON blog_post_search "
+    "USING GIN (document)",
+    "CREATE TABLE blog_comment_search ("
+    "comment_id bigint PRIMARY KEY "
+    "REFERENCES blog_comment (id) ON DELETE CASCADE DEFERRABLE "
+    "INITIALLY DEFERRED, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX blog_comment_search_gin ON blog_comment_search "
+    "USING GIN (document)",
+    "INSERT INTO blog_post_search (post_id, document) "
+    "SELECT id, setweight(to_tsvector('simple', title), 'A') || "
+    "setweight(to_tsvector('simple', content), 'B') FROM blog_post",
+    "INSERT INTO blog_comment_search (comment_id, document) "
+    "SELECT id, to_tsvector('simple', content) FROM blog_comment",
+]
+POSTGRES_BACKWARD = [
+    "DROP TABLE IF EXISTS blog_post_search",
+    "DROP TABLE IF EXISTS blog_comment_search",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements_by_vendor.get(vendor, []):
+            schema_editor.execute(sql)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0009_post_ranking_scores"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"sqlite": SQLITE_FORWARD,
+                  "postgresql": POSTGRES_FORWARD}),
+            _run({"sqlite": SQLITE_BACKWARD,
+                  "postgresql": POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0010_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="image_processing",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="image_processing",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:48
+
+import blog.models.comment
+import blog.models.post
+import mediafiles.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0012_image_variants"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="comment",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                upload_to=blog.models.comment.comment_image_path,
+                validators=[mediafiles.validators.validate_image_upload],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="post",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                upload_to=blog.models.post.post_image_path,
+                validators=[mediafiles.validators.validate_image_upload],
+            ),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:16
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+
+# Còpia de blog/models/comment.py tal com era en aquesta migració
+PATH_STEP = 10
+
+
+def path_segment(pk):
+    return f"{pk:0{PATH_STEP}d}"
+
+
+def backfill_paths(apps, schema_editor):
+    Comment = apps.get_model("blog", "Comment")
+    # Per lots de 500 i de dalt a baix: un comentari s'omple quan el seu
+    # pare ja té path (les arrels, de seguida)
+    while True:
+        rows = list(
+            Comment.objects.filter(path="")
+            .filter(Q(parent__isnull=True) | ~Q(parent__path=""))
+            .order_by("id")
+            .values_list("id", "parent__path")[:500]
+        )
+        if not rows:
+            break
+        comments = []
+        for pk, parent_path in rows:
+            path = (parent_path or "") + path_segment(pk)
+            comments.append(Comment(id=pk, path=path,
+                                    depth=len(path) // PATH_STEP - 1))
+        Comment.objects.bulk_update(comments, ["path", "depth"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0013_image_upload_limits"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="path",
+            field=models.CharField(
+                default="", editable=False, max_length=1000
+            ),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["post", "path"], name="blog_comment_post_path_idx"
+            ),
+        ),
+    ]
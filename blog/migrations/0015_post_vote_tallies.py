@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:05
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_tallies(apps, schema_editor):
+    Post = apps.get_model("blog", "Post")
+    VotePost = apps.get_model("blog", "VotePost")
+    last_id = 0
+    while True:
+        posts = list(Post.objects.filter(id__gt=last_id).order_by("id")
+                     .only("id")[:500])
+        if not posts:
+            break
+        tallies = {
+            row["post"]: (row["ups"], row["downs"])
+            for row in VotePost.objects.filter(post__in=posts)
+            .order_by()
+            .values("post")
+            .annotate(ups=Count("id", filter=Q(vote=1)),
+                      downs=Count("id", filter=Q(vote=-1)))
+        }
+        for post in posts:
+            post.upvotes, post.downvotes = tallies.get(post.pk, (0, 0))
+        Post.objects.bulk_update(posts, ["upvotes", "downvotes"])
+        last_id = posts[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0014_comment_path"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="downvotes",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="upvotes",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_tallies, migrations.RunPython.noop),
+    ]
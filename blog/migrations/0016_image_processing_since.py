@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0015_post_vote_tallies"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="image_processing_since",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="image_processing_since",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0016_image_processing_since"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["-published_date", "-id"],
+                name="post_published_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["-votes", "-id"], name="post_votes_idx"
+            ),
+        ),
+    ]
@@ -1,19 +1,96 @@
-import uuid
-import os
-from io import BytesIO
-from django.core.files.base import ContentFile
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
-from PIL import Image
 from django.contrib.auth.models import User
+from mediafiles.images import upload_path
+from mediafiles.mixins import ProcessedImagesMixin
+from mediafiles.validators import validate_image_upload
+
+
+# Materialized path: l'id de cada avantpassat i el del propi comentari,
+# amb amplada fixa de PATH_STEP xifres ("0000000012" + "0000000040"...).
+# Ordenar per path dona l'ordre de l'arbre (pare abans que respostes) i
+# un subarbre és un rang [path, path_upper_bound(path)) de l'índex.
+# Només xifres perquè el rang no depengui de la collation de la BD.
+PATH_STEP = 10
+MAX_DEPTH = 100
+
+
+def path_segment(pk):
+    return f"{pk:0{PATH_STEP}d}"
+
+
+def path_upper_bound(path):
+    """First path after every descendant of `path`."""
+    return path[:-PATH_STEP] + path_segment(int(path[-PATH_STEP:]) + 1)
+
+
+class CommentQuerySet(models.QuerySet):
+    def thread(self, post_id, max_depth=None):
+        """
+        Comments of a post in tree order; with `max_depth`, only the
+        first `max_depth` levels (1 = root comments).
+        """
+        queryset = self.filter(post_id=post_id)
+        if max_depth is not None:
+            queryset = queryset.filter(depth__lt=max_depth)
+        return queryset.order_by("path")
+
+    def subtree(self, comment):
+        """`comment` and all its replies, in tree order."""
+        if not comment.path:
+            raise ValueError(
+                f"Comment #{comment.pk} has no path; call "
+                f"Comment.objects.fill_paths({comment.post_id}) first."
+            )
+        return self.filter(
+            post_id=comment.post_id,
+            path__gte=comment.path,
+            path__lt=path_upper_bound(comment.path),
+        ).order_by("path")
+
+    def fill_paths(self, post_id):
+        """
+        Sets path and depth of the comments of `post_id` inserted without
+        save() (bulk_create, loaddata, raw SQL), which still have an empty
+        path. Costs one indexed query when there are none.
+        Returns the number of comments filled.
+        """
+        if not self.filter(post_id=post_id, path="").exists():
+            return 0
+        rows = {
+            pk: (parent_id, path) for pk, parent_id, path in
+            self.filter(post_id=post_id)
+            .values_list("id", "parent_id", "path")
+        }
+        paths = {pk: path for pk, (_, path) in rows.items() if path}
+
+        def path_of(pk):
+            if pk not in paths:
+                parent_id = rows[pk][0]
+                prefix = path_of(parent_id) if parent_id in rows else ""
+                paths[pk] = prefix + path_segment(pk)
+            return paths[pk]
+
+        filled = [
+            self.model(id=pk, path=path_of(pk),
+                       depth=len(path_of(pk)) // PATH_STEP - 1)
+            for pk, (_, path) in rows.items() if not path
+        ]
+        self.bulk_update(filled, ["path", "depth"])
+        return len(filled)
 
 
 def comment_image_path(instance, filename):
-    """Genera un nombre único para cada imagen de comentario."""
-    return os.path.join("comment_image", f"{uuid.uuid4()}.webp")
+    """
+    Genera un nombre único para cada imagen de comentario. Los originales
+    pendientes de convertir a WebP conservan su extensión.
+    """
+    return upload_path("comment_image", filename)
+
 
+class Comment(ProcessedImagesMixin, models.Model):
+    image_profiles = {"image": "post"}
 
-class Comment(models.Model):
     post = models.ForeignKey(
         "blog.Post",
         on_delete=models.CASCADE,
@@ -38,7 +115,21 @@ class Comment(models.Model):
     votes = models.IntegerField(default=0)
     url = models.URLField(blank=True, null=True)
     image = models.ImageField(upload_to=comment_image_path,
-                              blank=True, null=True)
+                              blank=True, null=True,
+                              validators=[validate_image_upload])
+    image_processing = models.BooleanField(default=False)
+    # Quan es va encuar la conversió (requeue_transcodes)
+    image_processing_since = models.DateTimeField(null=True, blank=True,
+                                                  editable=False)
+    # {"full"|"feed"|"thumb": {"name", "width"}} (mediafiles.processing)
+    image_variants = models.JSONField(default=dict, blank=True)
+    # Es calculen en crear el comentari (save); els comentaris no canvien
+    # mai de pare
+    path = models.CharField(max_length=PATH_STEP * MAX_DEPTH, default="",
+                            editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    objects = CommentQuerySet.as_manager()
 
     def __str__(self):
         prefix = "↳ Reply" if self.parent else "Comment"
@@ -49,20 +140,7 @@ class Comment(models.Model):
         return self.parent is None
 
     def save(self, *args, **kwargs):
-        if self.image and not self.image.name.endswith(".webp"):
-            try:
-                img = Image.open(self.image).convert("RGB")
-                buffer = BytesIO()
-                img.save(buffer, format="WEBP", quality=85)
-                buffer.seek(0)
-                new_name = f"{uuid.uuid4()}.webp"
-                self.image.save(new_name,
-                                ContentFile(buffer.read()),
-                                save=False)
-                buffer.close()
-            except Exception as e:
-                print(f"Error al convertir imagen a WebP en Comment: {e}")
-
+        adding = self._state.adding
         # Solo intentar copiar la URL si realmente hay un post
         if not self.url:
             try:
@@ -71,7 +149,26 @@ class Comment(models.Model):
             except Exception:
                 pass
 
-        super().save(*args, **kwargs)
+        if adding and not self.path:
+            # L'INSERT i el path en una transacció: una fila sense path
+            # trencaria els rangs de subtree()
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                self._set_path()
+        else:
+            super().save(*args, **kwargs)
+
+    def _set_path(self):
+        # L'id només existeix després de l'INSERT: un UPDATE més
+        prefix = self.parent.path if self.parent_id else ""
+        self.path = prefix + path_segment(self.pk)
+        self.depth = len(self.path) // PATH_STEP - 1
+        Comment.objects.filter(pk=self.pk).update(path=self.path,
+                                                  depth=self.depth)
 
     class Meta:
         ordering = ["published_date"]
+        indexes = [
+            models.Index(fields=["post", "path"],
+                         name="blog_comment_post_path_idx"),
+        ]
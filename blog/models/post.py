@@ -1,22 +1,25 @@
-import uuid
-from io import BytesIO
-from django.core.files.base import ContentFile
 from django.db import models
 from django.utils import timezone
 from django.urls import reverse
-from PIL import Image
 from django.contrib.auth.models import User
+from mediafiles.images import upload_path
+from mediafiles.mixins import ProcessedImagesMixin
+from mediafiles.validators import validate_image_upload
 
 
 def post_image_path(instance, filename):
     """
-    Returns S3 path: posts/<username>/<uuid>.webp
+    Returns S3 path: originals/posts/<username>/<uuid><ext> for uploads
+    waiting to be transcoded. The WebP files are stored content-addressed
+    under cas/ (mediafiles/storage.py).
     S3 will create the "folders" automatically, no need to pre-create them.
     """
-    return f"posts/{instance.author.username}/{uuid.uuid4()}.webp"
+    return upload_path(f"posts/{instance.author.username}", filename)
 
 
-class Post(models.Model):
+class Post(ProcessedImagesMixin, models.Model):
+    image_profiles = {"image": "post"}
+
     title = models.CharField(max_length=200, blank=False, null=False)
     content = models.TextField(max_length=5000, blank=False, null=False)
     author = models.ForeignKey(
@@ -26,7 +29,25 @@ class Post(models.Model):
     )
     published_date = models.DateTimeField(default=timezone.now)
     votes = models.IntegerField(default=0)
-    image = models.ImageField(upload_to=post_image_path, blank=True, null=True)
+    # Denormalitzat: el mantenen els signals de Comment (blog/signals.py)
+    comment_count = models.PositiveIntegerField(default=0)
+    # Vots positius i negatius, per calcular els scores sense agregar
+    # VotePost: els manté el servei de vots (blog/services/votes.py)
+    upvotes = models.PositiveIntegerField(default=0)
+    downvotes = models.PositiveIntegerField(default=0)
+    # Scores precalculats per als ordres "hot" i "controversial"
+    # (blog/services/ranking.py)
+    hot_score = models.FloatField(default=0)
+    controversy_score = models.FloatField(default=0)
+    image = models.ImageField(upload_to=post_image_path, blank=True, null=True,
+                              validators=[validate_image_upload])
+    # True mentre el worker converteix l'original a WebP (mediafiles)
+    image_processing = models.BooleanField(default=False)
+    # Quan es va encuar la conversió (requeue_transcodes)
+    image_processing_since = models.DateTimeField(null=True, blank=True,
+                                                  editable=False)
+    # {"full"|"feed"|"thumb": {"name", "width"}} (mediafiles.processing)
+    image_variants = models.JSONField(default=dict, blank=True)
     url = models.URLField(blank=True, null=True)
 
     communities = models.ManyToManyField(
@@ -35,6 +56,20 @@ class Post(models.Model):
         related_name="posts",
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-published_date", "-id"],
+                         name="post_published_date_idx"),
+            models.Index(fields=["-votes", "-id"],
+                         name="post_votes_idx"),
+            models.Index(fields=["-comment_count", "-id"],
+                         name="post_comment_count_idx"),
+            models.Index(fields=["-hot_score", "-id"],
+                         name="post_hot_score_idx"),
+            models.Index(fields=["-controversy_score", "-id"],
+                         name="post_controversy_score_idx"),
+        ]
+
     def __str__(self):
         return f"{self.title} — {self.author}: {self.content[:50]}..."
 
@@ -42,21 +77,6 @@ class Post(models.Model):
         return reverse("blog:post_detail", args=[str(self.id)])
 
     def save(self, *args, **kwargs):
-        # Convert uploaded image to WebP
-        if self.image and not self.image.name.endswith(".webp"):
-            try:
-                img = Image.open(self.image).convert("RGB")
-                buffer = BytesIO()
-                img.save(buffer, format="WEBP", quality=85)
-                buffer.seek(0)
-                new_name = f"{uuid.uuid4()}.webp"
-                self.image.save(new_name,
-                                ContentFile(buffer.read()),
-                                save=False)
-                buffer.close()
-            except Exception as e:
-                print(f"⚠️ Error converting image to WebP: {e}")
-
         # Ensure URL is set
         if not self.url:
             super().save(*args, **kwargs)
@@ -0,0 +1,99 @@
+"""
+Set-based deletion of a comment and all its replies.
+
+Deleting comment by comment makes Django collect the cascade and send
+post_delete for every node, so a thread with a thousand replies costs
+thousands of queries. Here the ids of the subtree come from one range
+scan of the materialized path index (``Comment.path``), and the
+comments, their votes and their saved-comment rows are removed with a
+handful of DELETE ... WHERE id IN (...) statements inside one
+transaction.
+
+The per-row post_delete receivers do not run: `comments_deleted` is sent
+once instead, with every deleted id, and the receivers in
+``blog/signals.py`` and ``communities/signals.py`` update the comment
+count, the search index and the feed cache in bulk.
+
+The same receivers skip the comments that go away with their post
+(`post.delete()` cascades): the post's own pre_delete marks it with
+`deleting_post` and handles its comments once.
+"""
+from django.db import connection, transaction
+from django.dispatch import Signal
+from blog.models import Comment, VoteComment
+from mediafiles.deletion import image_names, release
+
+# Límit de paràmetres per sentència (SQLite antic en permet 999)
+CHUNK_SIZE = 900
+
+# sender=Comment, post_id, comment_ids
+comments_deleted = Signal()
+
+
+def deleting_post(origin, post_id):
+    """
+    Marks `post_id` as deleted by the delete() call of `origin` (the
+    instance or queryset Django passes to the delete signals).
+    """
+    if origin is not None:
+        origin.__dict__.setdefault("_deleted_post_ids", set()).add(post_id)
+
+
+def deleted_with_post(comment, origin):
+    """True if `comment` is being deleted together with its post."""
+    return comment.post_id in getattr(origin, "_deleted_post_ids", ())
+
+
+def _chunks(ids):
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def subtree_ids(comment):
+    """Ids of `comment` and all its descendants, in one query."""
+    if Comment.objects.fill_paths(comment.post_id):
+        comment.refresh_from_db(fields=["path", "depth"])
+    return list(
+        Comment.objects.subtree(comment).values_list("id", flat=True)
+    )
+
+
+def _delete_rows(model, ids):
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        for chunk in _chunks(ids):
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(
+                f"DELETE FROM {table} WHERE id IN ({placeholders})", chunk
+            )
+
+
+def delete_comment_subtree(comment):
+    """
+    Deletes `comment` and all its replies. Returns the number of
+    comments deleted.
+    """
+    # Import local: accounts depèn de blog
+    from accounts.models import Profile
+
+    saved = Profile.saved_comments.through
+    with transaction.atomic():
+        ids = subtree_ids(comment)
+        for chunk in _chunks(ids):
+            # Les imatges es deixen a la cua d'esborrat (mediafiles)
+            with_images = (
+                Comment.objects.filter(pk__in=chunk).exclude(image="")
+                .exclude(image__isnull=True)
+                .only("id", "image", "image_variants")
+            )
+            for instance in with_images:
+                for names in image_names(instance).values():
+                    release(names)
+            VoteComment.objects.filter(comment_id__in=chunk).delete()
+            saved.objects.filter(comment_id__in=chunk).delete()
+        # SQL directe: el QuerySet.delete() tornaria a recollir la
+        # cascada i enviaria els signals fila a fila
+        _delete_rows(Comment, ids)
+        comments_deleted.send(sender=Comment, post_id=comment.post_id,
+                              comment_ids=ids)
+    return len(ids)
@@ -0,0 +1,304 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Exists, F, OuterRef, Q, Window
+from django.db.models.functions import RowNumber
+from blog.models import Comment
+from blog.models.comment import path_upper_bound
+from blog.services.feed import InvalidCursor
+from blog.services.vote_buffer import apply_pending_votes
+from blog.services.viewer import get_user_comment_votes
+from mediafiles.images import image_url
+
+
+# Claus d'ordenació dels germans per a cada mode ('top', 'new', 'old').
+# Els comentaris arriben ja ordenats per data, així que el sort estable
+# desempata igual que ho feia el `comment.replies.all()` original.
+def _reply_key(order):
+    if order == "top":
+        return lambda node: -node["votes"]
+    if order == "old":
+        return lambda node: node["published_date"]
+    return lambda node: -node["published_date"].timestamp()
+
+
+def _root_key(order):
+    if order == "top":
+        return lambda node: (-node["votes"],
+                             -node["published_date"].timestamp())
+    if order == "old":
+        return lambda node: node["published_date"]
+    return lambda node: -node["published_date"].timestamp()
+
+
+def _node(comment, votes):
+    return {
+        "id": comment.id,
+        "author": comment.author.username,
+        "content": comment.content,
+        "published_date": comment.published_date,
+        "votes": comment.votes,
+        "image": image_url(comment, "thumb") or None,
+        "user_vote": votes.get(comment.id, 0),
+        "replies": [],
+    }
+
+
+def _assemble(comments, user, order):
+    """Sorted root nodes of `comments` (oldest first) with their replies."""
+    apply_pending_votes(comments)
+    votes = get_user_comment_votes(user, comments)
+
+    nodes = {comment.id: _node(comment, votes) for comment in comments}
+
+    roots = []
+    for comment in comments:
+        node = nodes[comment.id]
+        if comment.parent_id is None:
+            roots.append(node)
+        elif comment.parent_id in nodes:
+            nodes[comment.parent_id]["replies"].append(node)
+
+    reply_key = _reply_key(order)
+    for node in nodes.values():
+        node["replies"].sort(key=reply_key)
+    roots.sort(key=_root_key(order))
+
+    return roots
+
+
+def build_comments_tree(post_id, user=None, order="top"):
+    """
+    Builds the nested comment structure of a post in memory.
+
+    All the comments of the post are loaded in one query (authors joined)
+    and the viewer's votes in another one; the tree is then assembled
+    with a parent-id index, so the cost does not depend on the shape of
+    the thread.
+    """
+    comments = list(
+        Comment.objects.filter(post_id=post_id)
+        .select_related("author")
+        .order_by("published_date", "id")
+    )
+    return _assemble(comments, user, order)
+
+
+STREAM_BATCH_SIZE = 50
+
+
+def iter_comments_tree(post_id, user=None, order="top",
+                       batch_size=STREAM_BATCH_SIZE):
+    """
+    Yields the same root nodes as build_comments_tree, in the same
+    order, loading `batch_size` root subtrees at a time.
+
+    The root comments are sorted first (only their sort keys are
+    loaded); then each batch of subtrees comes from one query over the
+    materialized path ranges of its roots, plus one for the viewer's
+    votes. Only one batch is in memory at a time.
+    """
+    Comment.objects.fill_paths(post_id)
+    roots = list(
+        Comment.objects.filter(post_id=post_id, parent__isnull=True)
+        .order_by("published_date", "id")
+        .only("id", "path", "votes", "published_date")
+    )
+    apply_pending_votes(roots)
+    root_key = _root_key(order)
+    roots.sort(key=lambda comment: root_key(
+        {"votes": comment.votes, "published_date": comment.published_date}
+    ))
+
+    for start in range(0, len(roots), batch_size):
+        ranges = Q()
+        for root in roots[start:start + batch_size]:
+            ranges |= Q(path__gte=root.path,
+                        path__lt=path_upper_bound(root.path))
+        comments = list(
+            Comment.objects.filter(ranges, post_id=post_id)
+            .select_related("author")
+            .order_by("published_date", "id")
+        )
+        # El tall és contigu en l'ordre global: ordenar-lo dona el mateix
+        yield from _assemble(comments, user, order)
+        # El FieldFile i la instància es referencien mútuament: sense
+        # trencar el cicle cada lot esperaria el GC i el pic creixeria
+        # amb el fil
+        for comment in comments:
+            comment.__dict__.pop("image", None)
+
+
+# -------------------- PAGINATED THREAD -------------------- #
+# Les arrels arriben per pàgines i, sota cada una, com a molt `depth`
+# nivells i `breadth` respostes per comentari. On es talla (més germans o
+# més nivells) el node porta "more_replies", un cursor per demanar la
+# continuació d'aquell subarbre.
+
+THREAD_PAGE_SIZE = 20
+MAX_THREAD_PAGE_SIZE = 100
+THREAD_DEPTH = 3
+MAX_THREAD_DEPTH = 10
+THREAD_BREADTH = 5
+MAX_THREAD_BREADTH = 50
+
+# order -> (claus de les arrels, claus de les respostes), cada clau
+# (camp, descendent?). Són les mateixes ordenacions que _root_key i
+# _reply_key, amb l'id per desempatar.
+THREAD_ORDERS = {
+    "top": (
+        (("votes", True), ("published_date", True), ("id", True)),
+        (("votes", True), ("published_date", False), ("id", False)),
+    ),
+    "new": ((("published_date", True), ("id", True)),) * 2,
+    "old": ((("published_date", False), ("id", False)),) * 2,
+}
+
+
+def _thread_keys(order, parent_id):
+    return THREAD_ORDERS[order][parent_id is not None]
+
+
+def _order_by(keys):
+    return [F(field).desc() if descending else F(field).asc()
+            for field, descending in keys]
+
+
+def _after(keys, values):
+    """Keyset filter: rows sorted after `values` in `keys` order."""
+    condition, equal = Q(), {}
+    for (field, descending), value in zip(keys, values):
+        op = "lt" if descending else "gt"
+        condition |= Q(**equal, **{f"{field}__{op}": value})
+        equal[field] = value
+    return condition
+
+
+def encode_thread_cursor(order, parent_id, comment=None):
+    """
+    Opaque token for the children of `parent_id` (None = root comments)
+    that come after `comment`, or from the first one if it is None.
+    """
+    values = None
+    if comment is not None:
+        values = []
+        for field, _ in _thread_keys(order, parent_id):
+            value = getattr(comment, field)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            values.append(value)
+    payload = json.dumps([order, parent_id, values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_thread_cursor(order, token):
+    """Returns (parent id, key values or None) from a thread cursor."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        cursor_order, parent_id, values = json.loads(
+            base64.urlsafe_b64decode(padded.encode())
+        )
+        if cursor_order != order:
+            raise InvalidCursor(token)
+        if parent_id is not None and not isinstance(parent_id, int):
+            raise InvalidCursor(token)
+        if values is not None:
+            keys = _thread_keys(order, parent_id)
+            if len(values) != len(keys):
+                raise InvalidCursor(token)
+            values = [
+                datetime.fromisoformat(value)
+                if field == "published_date" else int(value)
+                for (field, _), value in zip(keys, values)
+            ]
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise InvalidCursor(token) from e
+    return parent_id, values
+
+
+def get_thread_page(post_id, user=None, order="top", cursor=None,
+                    page_size=THREAD_PAGE_SIZE, depth=THREAD_DEPTH,
+                    breadth=THREAD_BREADTH):
+    """
+    Returns (nodes, next_cursor) for one page of the comments of a post:
+    root comments, or the replies of one comment when `cursor` comes
+    from a "more_replies", each with its replies down to `depth` levels
+    and at most `breadth` replies per comment. Nodes are shaped like
+    those of build_comments_tree plus "more_replies". Raises
+    InvalidCursor for bad tokens.
+
+    One query per level (the breadth limit per parent is a ROW_NUMBER()
+    window) and one for the viewer's votes, whatever the thread size.
+    """
+    if order not in THREAD_ORDERS:
+        order = "top"
+    page_size = max(1, min(page_size, MAX_THREAD_PAGE_SIZE))
+    depth = max(1, min(depth, MAX_THREAD_DEPTH))
+    breadth = max(1, min(breadth, MAX_THREAD_BREADTH))
+
+    parent_id, after = None, None
+    if cursor:
+        parent_id, after = decode_thread_cursor(order, cursor)
+    has_replies = Exists(Comment.objects.filter(parent_id=OuterRef("pk")))
+    base = (Comment.objects.filter(post_id=post_id)
+            .select_related("author").annotate(has_replies=has_replies))
+
+    keys = _thread_keys(order, parent_id)
+    first = base.filter(parent_id=parent_id)
+    if after:
+        first = first.filter(_after(keys, after))
+    limit = breadth if parent_id is not None else page_size
+    # Un element extra per saber si hi ha pàgina següent
+    page = list(first.order_by(*_order_by(keys))[:limit + 1])
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_thread_cursor(order, parent_id, page[-1])
+
+    levels = [page]
+    reply_keys = _thread_keys(order, 0)
+    while len(levels) < depth and levels[-1]:
+        parents = [comment.pk for comment in levels[-1]
+                   if comment.has_replies]
+        levels.append(list(
+            base.filter(parent_id__in=parents)
+            .annotate(rank=Window(RowNumber(),
+                                  partition_by=[F("parent_id")],
+                                  order_by=_order_by(reply_keys)))
+            .filter(rank__lte=breadth + 1)
+            .order_by("parent_id", *_order_by(reply_keys))
+        ) if parents else [])
+
+    # Els cursors es fan amb els vots de la BD, que són els que compara
+    # _after(); les deltes pendents només van als nodes
+    children, cut = {}, {}
+    for level in levels[1:]:
+        for comment in level:
+            children.setdefault(comment.parent_id, []).append(comment)
+    for parent, replies in children.items():
+        if len(replies) > breadth:
+            children[parent] = replies[:breadth]
+            cut[parent] = encode_thread_cursor(order, parent,
+                                               replies[breadth - 1])
+
+    comments = [comment for level in levels for comment in level]
+    apply_pending_votes(comments)
+    votes = get_user_comment_votes(user, comments)
+    nodes = {}
+    for comment in comments:
+        nodes[comment.pk] = _node(comment, votes)
+        if comment.pk in children:
+            more_replies = cut.get(comment.pk)
+        elif comment.has_replies:
+            # Últim nivell: la continuació comença pel primer fill
+            more_replies = encode_thread_cursor(order, comment.pk)
+        else:
+            more_replies = None
+        nodes[comment.pk]["more_replies"] = more_replies
+
+    for parent, replies in children.items():
+        nodes[parent]["replies"] = [nodes[reply.pk] for reply in replies]
+
+    return [nodes[comment.pk] for comment in page], next_cursor
@@ -0,0 +1,103 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from blog.models import Post
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+# order -> (camp de la clau d'ordenació, descendent?)
+FEED_ORDERS = {
+    "nou": ("published_date", True),
+    "antic": ("published_date", False),
+    "mes_comentaris": ("comment_count", True),
+    "mes_vots": ("votes", True),
+    "hot": ("hot_score", True),
+    "controversial": ("controversy_score", True),
+}
+DEFAULT_ORDER = "nou"
+
+
+class InvalidCursor(ValueError):
+    """The cursor token is malformed or belongs to another sort order."""
+
+
+def encode_cursor(order, post):
+    """
+    Opaque token pointing right after `post` in the given order. It only
+    holds the sort key and the id, so any page is reached with a single
+    index range scan instead of an OFFSET.
+    """
+    field, _ = FEED_ORDERS[order]
+    value = getattr(post, field)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([order, value, post.pk], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(order, token):
+    """Returns (key value, id) from a token built by `encode_cursor`."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        cursor_order, value, pk = json.loads(
+            base64.urlsafe_b64decode(padded.encode())
+        )
+        if cursor_order != order or not isinstance(pk, int):
+            raise InvalidCursor(token)
+        if FEED_ORDERS[order][0] == "published_date":
+            value = datetime.fromisoformat(value)
+        elif not isinstance(value, (int, float)):
+            raise InvalidCursor(token)
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise InvalidCursor(token) from e
+    return value, pk
+
+
+def feed_loader(queryset):
+    """
+    Shared loader of the post feeds (post_list, community_site and the
+    profile page): the author comes joined and the communities of the
+    whole page in one prefetch query, so rendering the post cards runs
+    no query per post.
+    """
+    return queryset.select_related("author").prefetch_related("communities")
+
+
+def feed_queryset(order):
+    """Base queryset of the feed, sorted by (key, id) in the given order."""
+    field, descending = FEED_ORDERS[order]
+    posts = Post.objects.select_related("author")
+    prefix = "-" if descending else ""
+    return posts.order_by(f"{prefix}{field}", f"{prefix}id")
+
+
+def get_feed_page(order=DEFAULT_ORDER, cursor=None, page_size=PAGE_SIZE):
+    """
+    Returns (posts, next_cursor) for one page of the feed. `next_cursor`
+    is None on the last page. Raises InvalidCursor for bad tokens.
+    """
+    if order not in FEED_ORDERS:
+        order = DEFAULT_ORDER
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+    field, descending = FEED_ORDERS[order]
+    posts = feed_queryset(order)
+    if cursor:
+        value, pk = decode_cursor(order, cursor)
+        op = "lt" if descending else "gt"
+        posts = posts.filter(
+            Q(**{f"{field}__{op}": value})
+            | Q(**{field: value, f"id__{op}": pk})
+        )
+
+    # Un element extra per saber si hi ha pàgina següent
+    page = list(feed_loader(posts)[:page_size + 1])
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(order, page[-1])
+    return page, next_cursor
@@ -0,0 +1,69 @@
+"""
+Fragment cache of the viewer-independent part of blog/post_card.html.
+
+`blog/post_card_body.html` (image, title, byline, communities, content)
+is rendered once per post version and kept in the ``post_cards`` cache
+split at its ``<!--viewer-->`` markers. post_card.html only fills the
+gaps with what depends on the viewer: own vote, saved star and the
+edit/delete buttons, plus the vote count and the CSRF-protected vote
+forms around it.
+
+The version of each post lives in the cache too, as in
+communities/cache.py: the signals bump it when the post is edited, its
+communities change (or one of them is renamed) or its image finishes
+processing. Votes do not bump it, the count is rendered outside the
+fragment.
+
+With the default LocMem backend both the fragments and the versions are
+per process, so another gunicorn worker can serve a stale card for up
+to the alias TIMEOUT (300 s); ``POST_CARDS_REDIS_URL`` shares them (see
+settings.CACHES).
+"""
+import time
+
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CACHE_ALIAS = "post_cards"
+BODY_TEMPLATE = "blog/post_card_body.html"
+MARKER = "<!--viewer-->"
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _version_key(post_id):
+    return f"post_card:{post_id}:version"
+
+
+def _version(post_id):
+    # Una clau de versió desallotjada torna a començar amb un valor nou
+    return _cache().get_or_set(_version_key(post_id), time.time_ns,
+                               timeout=None)
+
+
+def card_fragments(post):
+    """
+    The pieces of the card body of `post` between the viewer markers,
+    rendered on a miss.
+    """
+    key = f"post_card:{post.pk}:v{_version(post.pk)}"
+    parts = _cache().get(key)
+    if parts is None:
+        html = render_to_string(BODY_TEMPLATE, {"post": post})
+        parts = html.split(MARKER)
+        _cache().set(key, parts)
+    return [mark_safe(part) for part in parts]
+
+
+def invalidate_post_cards(*post_ids):
+    """Drops the cached card of the given posts."""
+    cache = _cache()
+    for post_id in set(post_ids):
+        try:
+            cache.incr(_version_key(post_id))
+        except ValueError:
+            # Encara no s'havia pintat cap targeta d'aquest post
+            pass
@@ -0,0 +1,90 @@
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import Count, Q
+from blog.models import Post
+from blog.models.votes import VotePost
+
+# Fórmula "hot" de Reddit: el terme de temps creix amb la data de
+# publicació, així que un post nou puja per sobre d'un de vell amb els
+# mateixos vots sense haver de tocar els scores antics.
+HOT_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+HOT_DECAY_SECONDS = 45000
+# Pes d'un comentari respecte a un vot en el score "hot"
+COMMENT_WEIGHT = 0.5
+
+
+def hot_score(ups, downs, comments, published_date):
+    score = ups - downs + COMMENT_WEIGHT * comments
+    order = math.log10(max(abs(score), 1))
+    sign = (score > 0) - (score < 0)
+    seconds = (published_date - HOT_EPOCH).total_seconds()
+    return sign * order + seconds / HOT_DECAY_SECONDS
+
+
+def controversy_score(ups, downs):
+    """Many votes split evenly between up and down rank highest."""
+    if ups <= 0 or downs <= 0:
+        return 0.0
+    balance = downs / ups if ups > downs else ups / downs
+    return (ups + downs) ** balance
+
+
+def tally_delta(old, new):
+    """
+    (upvotes, downvotes) deltas of a user's vote going from `old` to
+    `new` (-1, 0 or 1).
+    """
+    return ((new == 1) - (old == 1), (new == -1) - (old == -1))
+
+
+def refresh_post_scores(post_ids):
+    """
+    Recomputes hot_score and controversy_score for the given posts from
+    their stored tallies (upvotes, downvotes, comment_count), with one
+    SELECT and one bulk UPDATE. The cost does not depend on the number
+    of votes of each post. Returns the number of posts updated.
+    """
+    post_ids = set(post_ids)
+    if not post_ids:
+        return 0
+
+    posts = list(
+        Post.objects.filter(pk__in=post_ids)
+        .only("id", "published_date", "comment_count", "upvotes",
+              "downvotes")
+    )
+    for post in posts:
+        post.hot_score = hot_score(post.upvotes, post.downvotes,
+                                   post.comment_count, post.published_date)
+        post.controversy_score = controversy_score(post.upvotes,
+                                                   post.downvotes)
+
+    Post.objects.bulk_update(posts, ["hot_score", "controversy_score"])
+    return len(posts)
+
+
+def recompute_post_scores(post_ids):
+    """
+    Re-aggregates the upvotes/downvotes tallies of the given posts from
+    VotePost and then refreshes their scores. For the periodic command
+    (recompute_post_scores), not for the vote path.
+    Returns the number of posts updated.
+    """
+    post_ids = set(post_ids)
+    if not post_ids:
+        return 0
+
+    tallies = {
+        row["post"]: (row["ups"], row["downs"])
+        for row in VotePost.objects.filter(post_id__in=post_ids)
+        .order_by()
+        .values("post")
+        .annotate(ups=Count("id", filter=Q(vote=1)),
+                  downs=Count("id", filter=Q(vote=-1)))
+    }
+    posts = list(Post.objects.filter(pk__in=post_ids).only("id"))
+    for post in posts:
+        post.upvotes, post.downvotes = tallies.get(post.pk, (0, 0))
+    Post.objects.bulk_update(posts, ["upvotes", "downvotes"])
+    return refresh_post_scores(post_ids)
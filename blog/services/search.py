@@ -0,0 +1,264 @@
+"""
+Full-text search over posts and comments.
+
+Each database has its own index, kept in sync by the signals in
+``blog/signals.py``:
+
+* SQLite: FTS5 virtual tables ``blog_post_fts`` / ``blog_comment_fts``.
+* PostgreSQL: ``tsvector`` tables ``blog_post_search`` /
+  ``blog_comment_search`` with a GIN index.
+
+Both are created by migration ``0010_search_index``. Any other database
+falls back to the old ``icontains`` scan. ``SEARCH_BACKEND`` in settings
+can force a backend by import path.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+from blog.models import Comment, Post
+
+PAGE_SIZE = 20
+
+
+def _terms(query):
+    # Només paraules: l'entrada de l'usuari mai arriba com a sintaxi
+    # de consulta (ni FTS5 ni tsquery)
+    return re.findall(r"\w+", query)
+
+
+class BaseSearchBackend:
+    """
+    Search backend interface. `search_*` return (ids, total): the ids of
+    one page sorted by relevance and the total number of matches.
+    """
+
+    def index_post(self, post):
+        pass
+
+    def index_comment(self, comment):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def remove_comment(self, comment_id):
+        pass
+
+    def remove_comments(self, comment_ids):
+        for comment_id in comment_ids:
+            self.remove_comment(comment_id)
+
+    def search_posts(self, query, limit, offset):
+        raise NotImplementedError
+
+    def search_comments(self, query, limit, offset):
+        raise NotImplementedError
+
+
+class _RawSQLSearchBackend(BaseSearchBackend):
+    """
+    Shared code of the SQL backends: one query per index and page.
+    Subclasses define POSTS_SQL, COMMENTS_SQL and `_match(query)`.
+    """
+    POSTS_SQL = COMMENTS_SQL = None
+
+    def _match(self, query):
+        raise NotImplementedError
+
+    def _execute(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall() if cursor.description else []
+
+    def _delete_in(self, sql, ids):
+        # Un DELETE ... IN (...) per cada 900 ids (límit de paràmetres)
+        for start in range(0, len(ids), 900):
+            chunk = list(ids[start:start + 900])
+            self._execute(sql.format(", ".join(["%s"] * len(chunk))), chunk)
+
+    def _search(self, sql, query, limit, offset):
+        match = self._match(query)
+        if not match:
+            return [], 0
+        # COUNT(*) OVER () dona el total en la mateixa consulta
+        rows = self._execute(sql, [*match, limit, offset])
+        return [row[0] for row in rows], rows[0][1] if rows else 0
+
+    def search_posts(self, query, limit, offset):
+        return self._search(self.POSTS_SQL, query, limit, offset)
+
+    def search_comments(self, query, limit, offset):
+        return self._search(self.COMMENTS_SQL, query, limit, offset)
+
+
+class SQLiteFTSBackend(_RawSQLSearchBackend):
+    # bm25() no es pot combinar amb una window function a la mateixa
+    # consulta, per això el rank es calcula a la subconsulta
+    POSTS_SQL = (
+        "SELECT id, COUNT(*) OVER () FROM ("
+        "SELECT rowid AS id, bm25(blog_post_fts, 2.0, 1.0) AS rank "
+        "FROM blog_post_fts WHERE blog_post_fts MATCH %s) "
+        "ORDER BY rank, id DESC LIMIT %s OFFSET %s"
+    )
+    COMMENTS_SQL = (
+        "SELECT id, COUNT(*) OVER () FROM ("
+        "SELECT rowid AS id, bm25(blog_comment_fts) AS rank "
+        "FROM blog_comment_fts WHERE blog_comment_fts MATCH %s) "
+        "ORDER BY rank, id DESC LIMIT %s OFFSET %s"
+    )
+
+    def _match(self, query):
+        terms = _terms(query)
+        return [" ".join(f'"{term}"*' for term in terms)] if terms else None
+
+    def index_post(self, post):
+        self.remove_post(post.pk)
+        self._execute(
+            "INSERT INTO blog_post_fts (rowid, title, content) "
+            "VALUES (%s, %s, %s)",
+            [post.pk, post.title, post.content],
+        )
+
+    def index_comment(self, comment):
+        self.remove_comment(comment.pk)
+        self._execute(
+            "INSERT INTO blog_comment_fts (rowid, content) VALUES (%s, %s)",
+            [comment.pk, comment.content],
+        )
+
+    def remove_post(self, post_id):
+        self._execute("DELETE FROM blog_post_fts WHERE rowid = %s",
+                      [post_id])
+
+    def remove_comment(self, comment_id):
+        self._execute("DELETE FROM blog_comment_fts WHERE rowid = %s",
+                      [comment_id])
+
+    def remove_comments(self, comment_ids):
+        self._delete_in("DELETE FROM blog_comment_fts WHERE rowid IN ({})",
+                        comment_ids)
+
+
+class PostgresSearchBackend(_RawSQLSearchBackend):
+    POSTS_SQL = (
+        "SELECT post_id, COUNT(*) OVER () "
+        "FROM blog_post_search, to_tsquery('simple', %s) AS q "
+        "WHERE document @@ q "
+        "ORDER BY ts_rank(document, q) DESC, post_id DESC "
+        "LIMIT %s OFFSET %s"
+    )
+    COMMENTS_SQL = (
+        "SELECT comment_id, COUNT(*) OVER () "
+        "FROM blog_comment_search, to_tsquery('simple', %s) AS q "
+        "WHERE document @@ q "
+        "ORDER BY ts_rank(document, q) DESC, comment_id DESC "
+        "LIMIT %s OFFSET %s"
+    )
+
+    def _match(self, query):
+        terms = _terms(query)
+        return [" & ".join(f"{term}:*" for term in terms)] if terms else None
+
+    def index_post(self, post):
+        self._execute(
+            "INSERT INTO blog_post_search (post_id, document) VALUES "
+            "(%s, setweight(to_tsvector('simple', %s), 'A') || "
+            "setweight(to_tsvector('simple', %s), 'B')) "
+            "ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document",
+            [post.pk, post.title, post.content],
+        )
+
+    def index_comment(self, comment):
+        self._execute(
+            "INSERT INTO blog_comment_search (comment_id, document) VALUES "
+            "(%s, to_tsvector('simple', %s)) "
+            "ON CONFLICT (comment_id) "
+            "DO UPDATE SET document = EXCLUDED.document",
+            [comment.pk, comment.content],
+        )
+
+    def remove_post(self, post_id):
+        self._execute("DELETE FROM blog_post_search WHERE post_id = %s",
+                      [post_id])
+
+    def remove_comment(self, comment_id):
+        self._execute(
+            "DELETE FROM blog_comment_search WHERE comment_id = %s",
+            [comment_id],
+        )
+
+    def remove_comments(self, comment_ids):
+        self._delete_in(
+            "DELETE FROM blog_comment_search WHERE comment_id IN ({})",
+            comment_ids,
+        )
+
+
+class IContainsSearchBackend(BaseSearchBackend):
+    """Fallback without an index: the original `icontains` scan."""
+
+    def _search(self, queryset, lookups, query, limit, offset):
+        terms = _terms(query)
+        if not terms:
+            return [], 0
+        for term in terms:
+            q = Q()
+            for lookup in lookups:
+                q |= Q(**{f"{lookup}__icontains": term})
+            queryset = queryset.filter(q)
+        queryset = queryset.order_by("-published_date", "-id")
+        ids = list(
+            queryset.values_list("id", flat=True)[offset:offset + limit]
+        )
+        return ids, queryset.count()
+
+    def search_posts(self, query, limit, offset):
+        return self._search(Post.objects.all(), ["title", "content"],
+                            query, limit, offset)
+
+    def search_comments(self, query, limit, offset):
+        return self._search(Comment.objects.all(), ["content"],
+                            query, limit, offset)
+
+
+VENDOR_BACKENDS = {
+    "sqlite": SQLiteFTSBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, "SEARCH_BACKEND", None)
+        if path:
+            _backend = import_string(path)()
+        else:
+            _backend = VENDOR_BACKENDS.get(connection.vendor,
+                                           IContainsSearchBackend)()
+    return _backend
+
+
+def _page(search, model_qs, query, page, page_size):
+    ids, total = search(query, page_size, (page - 1) * page_size)
+    objects = model_qs.in_bulk(ids)
+    return [objects[i] for i in ids if i in objects], total
+
+
+def search_posts(query, page=1, page_size=PAGE_SIZE):
+    """Returns (posts of the page sorted by relevance, total matches)."""
+    return _page(get_search_backend().search_posts,
+                 Post.objects.select_related("author"),
+                 query, page, page_size)
+
+
+def search_comments(query, page=1, page_size=PAGE_SIZE):
+    """Returns (comments of the page sorted by relevance, total matches)."""
+    return _page(get_search_backend().search_comments,
+                 Comment.objects.select_related("post", "author"),
+                 query, page, page_size)
@@ -0,0 +1,195 @@
+"""
+Write-behind buffer for vote counters.
+
+With ``VOTE_WRITE_BEHIND`` enabled the vote service does not update
+``Post.votes`` / ``Comment.votes`` (nor the Post upvotes/downvotes
+tallies) on every vote. The deltas are stored in a buffer and a
+background flusher folds all pending deltas into the database every
+``VOTE_FLUSH_INTERVAL_MS``, one UPDATE per model. Reads merge the
+pending ``votes`` deltas (``apply_pending_votes``) so users see their
+own votes straight away.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils.module_loading import import_string
+from blog.models import Post
+from blog.services.ranking import refresh_post_scores
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = "blog.services.vote_buffer.LocalVoteBuffer"
+DEFAULT_FLUSH_INTERVAL_MS = 500
+
+
+class LocalVoteBuffer:
+    """In-process buffer: {(model label, pk, field): delta} behind a lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deltas = defaultdict(int)
+
+    def add(self, key, delta):
+        with self._lock:
+            self._deltas[key] += delta
+
+    def pending(self, keys):
+        with self._lock:
+            return {key: self._deltas[key] for key in keys
+                    if self._deltas.get(key)}
+
+    def drain(self):
+        with self._lock:
+            deltas, self._deltas = self._deltas, defaultdict(int)
+        return {key: delta for key, delta in deltas.items() if delta}
+
+
+class VoteFlusher(threading.Thread):
+    """Daemon thread that calls `flush()` every `interval` seconds."""
+
+    def __init__(self, interval):
+        super().__init__(name="vote-flusher", daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        from django.db import connection
+
+        while not self._stopped.wait(self.interval):
+            try:
+                flush()
+            except Exception:
+                logger.exception("Error flushing vote buffer")
+            finally:
+                connection.close()
+
+    def stop(self):
+        self._stopped.set()
+
+
+_buffer = None
+_flusher = None
+_state_lock = threading.Lock()
+
+
+def is_enabled():
+    return getattr(settings, "VOTE_WRITE_BEHIND", False)
+
+
+def get_buffer():
+    global _buffer
+    with _state_lock:
+        if _buffer is None:
+            backend = getattr(settings, "VOTE_BUFFER_BACKEND",
+                              DEFAULT_BACKEND)
+            _buffer = import_string(backend)()
+        return _buffer
+
+
+def _ensure_flusher():
+    global _flusher
+    with _state_lock:
+        if _flusher is None or not _flusher.is_alive():
+            interval_ms = getattr(settings, "VOTE_FLUSH_INTERVAL_MS",
+                                  DEFAULT_FLUSH_INTERVAL_MS)
+            _flusher = VoteFlusher(interval_ms / 1000)
+            _flusher.start()
+
+
+def stop_flusher():
+    global _flusher
+    with _state_lock:
+        if _flusher is not None:
+            _flusher.stop()
+            _flusher.join()
+            _flusher = None
+
+
+def buffer_vote(model, pk, **deltas):
+    """Queues the {field: delta} counter deltas of the row `pk`."""
+    buffer = get_buffer()
+    for field, delta in deltas.items():
+        if delta:
+            buffer.add((model._meta.label, pk, field), delta)
+    _ensure_flusher()
+
+
+def pending_votes(model, pks):
+    """Returns {pk: pending delta} for the given rows of `model`."""
+    if not is_enabled():
+        return {}
+    label = model._meta.label
+    pending = get_buffer().pending([(label, pk, "votes") for pk in pks])
+    return {pk: delta for (_, pk, _), delta in pending.items()}
+
+
+def apply_pending_votes(objs):
+    """Adds the pending deltas to `obj.votes` of already loaded objects."""
+    if not is_enabled():
+        return objs
+    by_model = defaultdict(list)
+    for obj in objs:
+        by_model[type(obj)].append(obj)
+    for model, instances in by_model.items():
+        pending = pending_votes(model, [obj.pk for obj in instances])
+        for obj in instances:
+            obj.votes += pending.get(obj.pk, 0)
+    return objs
+
+
+def flush():
+    """
+    Folds every pending delta into the database, one UPDATE per model.
+    On failure the deltas go back to the buffer so no vote is lost.
+    Returns the number of rows updated.
+    """
+    buffer = get_buffer()
+    deltas = buffer.drain()
+    if not deltas:
+        return 0
+
+    # {label: {field: {pk: delta}}}
+    by_model = defaultdict(lambda: defaultdict(dict))
+    for (label, pk, field), delta in deltas.items():
+        by_model[label][field][pk] = delta
+
+    try:
+        updated = 0
+        with transaction.atomic():
+            for label, fields in by_model.items():
+                pks = set().union(*fields.values())
+                updated += apps.get_model(label).objects.filter(
+                    pk__in=pks
+                ).update(**{
+                    field: F(field) + Case(
+                        *[When(pk=pk, then=Value(d))
+                          for pk, d in rows.items()],
+                        default=Value(0),
+                        output_field=IntegerField(),
+                    )
+                    for field, rows in fields.items()
+                })
+            # Els scores de ranking es refresquen un cop per flush
+            post_fields = by_model.get(Post._meta.label, {})
+            refresh_post_scores(set().union(*post_fields.values()))
+        return updated
+    except Exception:
+        for key, delta in deltas.items():
+            buffer.add(key, delta)
+        raise
+
+
+@atexit.register
+def _flush_on_exit():
+    # Buffer en memòria: el que no s'hagi escrit es perdria en sortir
+    if _buffer is not None and is_enabled():
+        try:
+            flush()
+        except Exception:
+            logger.exception("Error flushing vote buffer on exit")
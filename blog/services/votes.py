@@ -0,0 +1,89 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from blog.models import Comment, Post
+from blog.models.votes import VoteComment, VotePost
+from blog.services import vote_buffer
+from blog.services.ranking import refresh_post_scores, tally_delta
+
+UPVOTE = 1
+DOWNVOTE = -1
+
+
+def _step_vote(vote_model, lookup, direction):
+    """
+    Moves the user's existing vote one step towards `direction` with a
+    conditional UPDATE. Returns the previous vote, or None if there was
+    nothing to move (no row, or already voted that way).
+    """
+    for old in (-direction, 0):
+        if vote_model.objects.filter(vote=old, **lookup).update(
+                vote=old + direction):
+            return old
+    return None
+
+
+def _apply_vote(vote_model, target_model, target_field, user, target_id,
+                direction):
+    """
+    Applies an up/down vote and the matching counter delta in one
+    transaction. Both changes are conditional UPDATEs with F()
+    expressions, so concurrent votes never overwrite each other.
+
+    Semantics are the ones the views always had: voting in the same
+    direction twice is a no-op, voting the opposite way moves the user's
+    vote one step (-1 -> 0 -> 1) and the counter with it.
+    For posts the upvotes/downvotes tallies follow the same transition,
+    and the ranking scores are refreshed from them.
+    Returns the resulting counter value, including the deltas still
+    pending in the write-behind buffer.
+    """
+    lookup = {"user": user, target_field: target_id}
+
+    with transaction.atomic():
+        # L'UPDATE va primer perquè agafi el lock d'escriptura abans de
+        # llegir res (a SQLite evita el deadlock en pujar de lock).
+        old = _step_vote(vote_model, lookup, direction)
+        if old is None and not vote_model.objects.filter(**lookup).exists():
+            try:
+                with transaction.atomic():
+                    vote_model.objects.create(vote=direction, **lookup)
+                old = 0
+            except IntegrityError:
+                # Un altre vot concurrent ha creat la fila: tornem a provar
+                old = _step_vote(vote_model, lookup, direction)
+
+        target = target_model.objects.filter(pk=target_id)
+        deltas = {}
+        if old is not None:
+            deltas["votes"] = direction
+            if target_model is Post:
+                ups, downs = tally_delta(old, old + direction)
+                deltas.update(upvotes=ups, downvotes=downs)
+        if deltas and vote_buffer.is_enabled():
+            # Write-behind: els comptadors s'escriuran en el següent flush
+            transaction.on_commit(lambda: vote_buffer.buffer_vote(
+                target_model, target_id, **deltas
+            ))
+        elif deltas:
+            target.update(**{
+                field: F(field) + delta for field, delta in deltas.items()
+            })
+            if target_model is Post:
+                refresh_post_scores([target_id])
+        votes = target.values_list("votes", flat=True).first()
+
+    if votes is None:
+        return None
+    pending = vote_buffer.pending_votes(target_model, [target_id])
+    return votes + pending.get(target_id, 0)
+
+
+def vote_post(user, post_id, direction):
+    """Upvote (1) or downvote (-1) a post. Returns the new post.votes."""
+    return _apply_vote(VotePost, Post, "post_id", user, post_id, direction)
+
+
+def vote_comment(user, comment_id, direction):
+    """Upvote (1) or downvote (-1) a comment. Returns the new votes."""
+    return _apply_vote(VoteComment, Comment, "comment_id", user, comment_id,
+                       direction)
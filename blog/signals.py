@@ -0,0 +1,115 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from blog.models import Comment, Post
+from blog.services.comment_delete import (
+    comments_deleted, deleted_with_post, deleting_post,
+)
+from blog.services.post_cards import invalidate_post_cards
+from blog.services.ranking import refresh_post_scores
+from blog.services.search import get_search_backend
+from mediafiles.signals import image_processed
+
+
+# -------------------- COMMENT COUNT -------------------- #
+# Els updates amb F() es fan a la BD, així que dues peticions alhora
+# no es trepitgen el comptador. També salten en els deletes en cascada
+# (post_delete), perquè el Collector envia el signal per a cada
+# comentari esborrat. L'esborrat d'un fil sencer (comment_delete) no
+# passa pel Collector i envia comments_deleted una sola vegada.
+# Els comentaris que s'esborren amb el seu post no toquen res: el post
+# desapareix igualment i post_deleting ja els treu de l'índex.
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F("comment_count") + 1
+        )
+        refresh_post_scores([instance.post_id])
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, origin=None, **kwargs):
+    if deleted_with_post(instance, origin):
+        return
+    updated = Post.objects.filter(
+        pk=instance.post_id, comment_count__gt=0
+    ).update(comment_count=F("comment_count") - 1)
+    if updated:
+        refresh_post_scores([instance.post_id])
+
+
+@receiver(comments_deleted, sender=Comment)
+def subtract_deleted_comments(sender, post_id, comment_ids, **kwargs):
+    updated = Post.objects.filter(pk=post_id).update(
+        comment_count=Greatest(F("comment_count") - len(comment_ids), 0)
+    )
+    if updated:
+        refresh_post_scores([post_id])
+
+
+# -------------------- RANKING SCORES -------------------- #
+# Els vots refresquen els scores des de blog/services/votes.py (o des
+# del flush del buffer write-behind).
+
+@receiver(post_save, sender=Post)
+def init_post_scores(sender, instance, created, **kwargs):
+    if created:
+        refresh_post_scores([instance.pk])
+
+
+# -------------------- SEARCH INDEX -------------------- #
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    get_search_backend().index_post(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, origin=None, **kwargs):
+    # Abans del Collector: encara es poden llegir els comentaris del post
+    deleting_post(origin, instance.pk)
+    comment_ids = list(
+        Comment.objects.filter(post_id=instance.pk)
+        .values_list("id", flat=True)
+    )
+    if comment_ids:
+        get_search_backend().remove_comments(comment_ids)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    get_search_backend().remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    get_search_backend().index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, origin=None, **kwargs):
+    if deleted_with_post(instance, origin):
+        return
+    get_search_backend().remove_comment(instance.pk)
+
+
+@receiver(comments_deleted, sender=Comment)
+def unindex_comments(sender, comment_ids, **kwargs):
+    get_search_backend().remove_comments(comment_ids)
+
+
+# -------------------- POST CARD FRAGMENTS -------------------- #
+# Els canvis de comunitats els invalida communities/signals.py
+
+@receiver(post_save, sender=Post)
+def post_card_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_post_cards(instance.pk)
+
+
+@receiver(image_processed, sender=Post)
+def post_card_image_processed(sender, pk, **kwargs):
+    invalidate_post_cards(pk)
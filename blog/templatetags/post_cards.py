@@ -0,0 +1,10 @@
+from django import template
+from blog.services.post_cards import card_fragments
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_card_body(post):
+    """{% post_card_body post as body %}: cached pieces of the card."""
+    return card_fragments(post)
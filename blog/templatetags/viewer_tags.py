@@ -0,0 +1,14 @@
+from django import template
+from blog.services.viewer import get_saved_resolver
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def is_saved(context, obj):
+    """
+    {% is_saved post as saved %}: whether the viewer saved the post (or
+    comment). The saved ids are loaded once per request.
+    """
+    return get_saved_resolver(context.get("request"),
+                              context.get("user")).is_saved(obj)
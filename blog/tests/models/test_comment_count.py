@@ -0,0 +1,104 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from blog.models import Comment, Post
+from blog.services.ranking import hot_score
+from blog.services.search import get_search_backend
+from communities.cache import stats
+from communities.models import Community
+
+
+def _comment(post, author, parent=None):
+    return Comment.objects.create(post=post, author=author, content="c",
+                                  parent=parent)
+
+
+def test_comment_count_default_value():
+    field = Post._meta.get_field("comment_count")
+    assert field.default == 0
+
+
+def test_comment_count_is_indexed():
+    index_fields = [index.fields for index in Post._meta.indexes]
+    assert ["-comment_count", "-id"] in index_fields
+
+
+@pytest.mark.django_db
+def test_create_comment_increments_count(post, author):
+    _comment(post, author)
+    reply = _comment(post, author)
+    reply.content = "editat"
+    reply.save()  # editar no ha de sumar
+
+    post.refresh_from_db()
+    assert post.comment_count == 2
+
+
+@pytest.mark.django_db
+def test_comment_delete_view_decrements_whole_subtree(client, post, author):
+    root = _comment(post, author)
+    child = _comment(post, author, root)
+    _comment(post, author, child)
+    _comment(post, author)
+    client.login(username="autor", password="1234")
+
+    client.post(reverse("blog:comment_delete", args=[root.id]))
+
+    post.refresh_from_db()
+    assert post.comment_count == 1
+
+
+@pytest.mark.django_db
+def test_post_delete_cascade_does_not_fail(client, post, author):
+    _comment(post, author, _comment(post, author))
+    client.login(username="autor", password="1234")
+
+    client.post(reverse("blog:post_delete", args=[post.id]))
+
+    assert not Post.objects.filter(pk=post.pk).exists()
+    assert not Comment.objects.exists()
+
+
+@pytest.mark.django_db
+def test_post_delete_does_not_run_per_comment_receivers(author):
+    community = Community.objects.create(name="Gats")
+    small = Post.objects.create(title="Petit", content="c", author=author)
+    large = Post.objects.create(title="Gran", content="c", author=author)
+    # 100: el Collector esborra els comentaris en lots de 100 ids
+    for post, size in ((small, 2), (large, 100)):
+        post.communities.add(community)
+        for _ in range(size):
+            _comment(post, author)
+    stats.reset()
+
+    with CaptureQueriesContext(connection) as few:
+        small.delete()
+    with CaptureQueriesContext(connection) as many:
+        large.delete()
+
+    assert len(many) == len(few) <= 13
+    assert not Comment.objects.exists()
+    assert get_search_backend().search_comments("c", 10, 0) == ([], 0)
+    # Una invalidació per post (la fila de PostsCommunities), no per comentari
+    assert stats.as_dict()["invalidations"] == 2
+
+
+@pytest.mark.django_db
+def test_rebuild_comment_counts_command(post, author):
+    other = Post.objects.create(title="Altre", content="c", author=author)
+    _comment(post, author)
+    _comment(post, author)
+    Post.objects.update(comment_count=7, hot_score=0)
+
+    call_command("rebuild_comment_counts", batch_size=1, stdout=StringIO())
+
+    post.refresh_from_db()
+    other.refresh_from_db()
+    assert post.comment_count == 2
+    assert other.comment_count == 0
+    assert post.hot_score == pytest.approx(hot_score(
+        post.upvotes, post.downvotes, 2, post.published_date))
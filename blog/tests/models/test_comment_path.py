@@ -0,0 +1,113 @@
+import importlib
+
+import pytest
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.urls import reverse
+from blog.models import Comment, Post
+from blog.models.comment import path_segment
+
+
+@pytest.fixture
+def thread():
+    """
+    root_a -> child -> grandchild
+    root_b
+    """
+    author = User.objects.create_user(username="autor", password="1234")
+    post = Post.objects.create(title="Post", content="Contenido",
+                               author=author)
+
+    def comment(parent=None):
+        return Comment.objects.create(post=post, author=author,
+                                      content="c", parent=parent)
+
+    root_a = comment()
+    root_b = comment()
+    child = comment(root_a)
+    grandchild = comment(child)
+    return {"post": post, "root_a": root_a, "root_b": root_b,
+            "child": child, "grandchild": grandchild}
+
+
+@pytest.mark.django_db
+def test_path_is_set_on_insert(thread):
+    grandchild = Comment.objects.get(pk=thread["grandchild"].pk)
+
+    assert grandchild.path == (path_segment(thread["root_a"].pk)
+                               + path_segment(thread["child"].pk)
+                               + path_segment(grandchild.pk))
+    assert grandchild.depth == 2
+    assert thread["grandchild"].path == grandchild.path
+
+
+@pytest.mark.django_db
+def test_thread_is_in_tree_order_and_depth_limited(thread):
+    ids = list(Comment.objects.thread(thread["post"].pk)
+               .values_list("id", flat=True))
+    assert ids == [thread["root_a"].pk, thread["child"].pk,
+                   thread["grandchild"].pk, thread["root_b"].pk]
+
+    first_two = Comment.objects.thread(thread["post"].pk, max_depth=2)
+    assert set(first_two.values_list("id", flat=True)) == {
+        thread["root_a"].pk, thread["child"].pk, thread["root_b"].pk,
+    }
+
+
+@pytest.mark.django_db
+def test_subtree_is_an_index_range(thread):
+    subtree = Comment.objects.subtree(thread["child"])
+
+    assert list(subtree.values_list("id", flat=True)) == [
+        thread["child"].pk, thread["grandchild"].pk,
+    ]
+    assert Comment.objects.subtree(thread["root_b"]).count() == 1
+
+
+@pytest.mark.django_db
+def test_migration_backfills_paths(thread):
+    expected = dict(Comment.objects.values_list("id", "path"))
+    Comment.objects.update(path="", depth=0)
+
+    migration = importlib.import_module("blog.migrations.0014_comment_path")
+    migration.backfill_paths(apps, None)
+
+    assert dict(Comment.objects.values_list("id", "path")) == expected
+    assert Comment.objects.get(pk=thread["grandchild"].pk).depth == 2
+
+
+@pytest.mark.django_db
+def test_insert_and_path_are_atomic(thread, monkeypatch):
+    def fail(self):
+        raise RuntimeError("path")
+
+    monkeypatch.setattr(Comment, "_set_path", fail)
+    with pytest.raises(RuntimeError):
+        Comment.objects.create(post=thread["post"],
+                               author=thread["post"].author, content="c")
+
+    assert Comment.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_rows_inserted_without_save_get_their_path(client, thread):
+    post, author = thread["post"], thread["post"].author
+    [orphan] = Comment.objects.bulk_create([
+        Comment(post=post, author=author, content="c",
+                parent=thread["child"]),
+    ])
+    [reply] = Comment.objects.bulk_create([
+        Comment(post=post, author=author, content="c", parent=orphan),
+    ])
+
+    with pytest.raises(ValueError, match="fill_paths"):
+        Comment.objects.subtree(orphan)
+    streamed = client.get(reverse("blog:comments_index", args=[post.pk]),
+                          {"stream": "1"})
+    assert streamed.status_code == 200
+    b"".join(streamed.streaming_content)
+
+    orphan.refresh_from_db()
+    assert orphan.path == (thread["child"].path + path_segment(orphan.pk))
+    assert Comment.objects.get(pk=reply.pk).depth == 3
+    assert Comment.objects.fill_paths(post.pk) == 0
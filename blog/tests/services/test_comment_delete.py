@@ -0,0 +1,101 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from accounts.models import Profile
+from blog.models import Comment
+from blog.models.votes import VoteComment
+from blog.services.comment_delete import delete_comment_subtree, subtree_ids
+from blog.services.search import get_search_backend
+
+
+def _thread(post, author, size, parent=None):
+    """Cadena de `size` respostes sota `parent`, més una germana."""
+    root = Comment.objects.create(post=post, author=author, content="root",
+                                  parent=parent)
+    current = root
+    for i in range(size):
+        current = Comment.objects.create(post=post, author=author,
+                                         content=f"reply {i}",
+                                         parent=current)
+    Comment.objects.create(post=post, author=author, content="sibling",
+                           parent=root)
+    return root
+
+
+@pytest.mark.django_db
+def test_subtree_ids_collects_every_descendant(post, author):
+    root = _thread(post, author, 5)
+    other = Comment.objects.create(post=post, author=author, content="x")
+
+    ids = subtree_ids(root)
+
+    assert len(ids) == 7
+    assert other.pk not in ids
+    assert root.pk in ids
+
+
+@pytest.mark.django_db
+def test_delete_removes_votes_saved_rows_and_index(post, author):
+    root = _thread(post, author, 3)
+    keep = Comment.objects.create(post=post, author=author,
+                                  content="survivor")
+    reply = root.replies.first()
+    VoteComment.objects.create(user=author, comment=reply, vote=1)
+    VoteComment.objects.create(user=author, comment=keep, vote=1)
+    profile = Profile.objects.create(user=author)
+    profile.saved_comments.add(reply, keep)
+
+    assert delete_comment_subtree(root) == 5
+
+    assert list(Comment.objects.values_list("pk", flat=True)) == [keep.pk]
+    assert list(VoteComment.objects.values_list("comment_id", flat=True)) \
+        == [keep.pk]
+    assert list(profile.saved_comments.all()) == [keep]
+    post.refresh_from_db()
+    assert post.comment_count == 1
+    assert get_search_backend().search_comments("reply", 10, 0) == ([], 0)
+    assert get_search_backend().search_comments("survivor", 10, 0)[1] == 1
+
+
+@pytest.mark.django_db
+def test_query_count_does_not_grow_with_the_subtree(post, author):
+    small = _thread(post, author, 3)
+    large = _thread(post, author, 300)
+
+    with CaptureQueriesContext(connection) as few:
+        delete_comment_subtree(small)
+    with CaptureQueriesContext(connection) as many:
+        delete_comment_subtree(large)
+
+    assert len(many) == len(few)
+    assert Comment.objects.count() == 0
+    post.refresh_from_db()
+    assert post.comment_count == 0
+
+
+@pytest.mark.django_db
+def test_comment_delete_view_removes_the_subtree(client, post, author):
+    root = _thread(post, author, 4)
+    client.login(username="autor", password="1234")
+
+    response = client.post(
+        reverse("blog:comment_delete", args=[root.pk]),
+        HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+    )
+
+    assert response.json() == {"success": True}
+    assert not Comment.objects.exists()
+
+
+@pytest.mark.django_db
+def test_delete_fills_missing_paths_first(post, author):
+    [root] = Comment.objects.bulk_create([
+        Comment(post=post, author=author, content="root"),
+    ])
+    [reply] = Comment.objects.bulk_create([
+        Comment(post=post, author=author, content="reply", parent=root),
+    ])
+
+    assert delete_comment_subtree(root) == 2
+    assert not Comment.objects.exists()
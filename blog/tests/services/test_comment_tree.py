@@ -0,0 +1,280 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from blog.models import Comment, Post
+from blog.models.votes import VoteComment
+from blog import benchmark
+from blog.services import vote_buffer
+from blog.services.comment_tree import (
+    build_comments_tree,
+    get_thread_page,
+    iter_comments_tree,
+)
+
+
+@pytest.fixture
+def thread():
+    """
+    Post amb dos comentaris arrel i respostes niuades:
+        first (votes=1) -> reply_a (votes=0), reply_b (votes=3)
+        second (votes=5) -> nested -> deep
+    """
+    author = User.objects.create_user(username="autor", password="1234")
+    post = Post.objects.create(title="Post", content="Contenido",
+                               author=author)
+    base = timezone.now() - timedelta(days=1)
+
+    def comment(minutes, votes, parent=None):
+        return Comment.objects.create(
+            post=post, author=author, content=f"c{minutes}", votes=votes,
+            parent=parent,
+            published_date=base + timedelta(minutes=minutes),
+        )
+
+    first = comment(0, 1)
+    second = comment(1, 5)
+    reply_a = comment(2, 0, first)
+    reply_b = comment(3, 3, first)
+    nested = comment(4, 2, second)
+    deep = comment(5, 0, nested)
+    return {
+        "author": author, "post": post, "first": first, "second": second,
+        "reply_a": reply_a, "reply_b": reply_b, "nested": nested,
+        "deep": deep,
+    }
+
+
+def _ids(nodes):
+    return [node["id"] for node in nodes]
+
+
+@pytest.mark.django_db
+def test_top_order_sorts_by_votes(thread):
+    tree = build_comments_tree(thread["post"].id, order="top")
+
+    assert _ids(tree) == [thread["second"].id, thread["first"].id]
+    first = tree[1]
+    assert _ids(first["replies"]) == [thread["reply_b"].id,
+                                      thread["reply_a"].id]
+    nested = tree[0]["replies"][0]
+    assert _ids(nested["replies"]) == [thread["deep"].id]
+
+
+@pytest.mark.django_db
+def test_new_and_old_orders(thread):
+    new = build_comments_tree(thread["post"].id, order="new")
+    old = build_comments_tree(thread["post"].id, order="old")
+
+    assert _ids(new) == [thread["second"].id, thread["first"].id]
+    assert _ids(new[1]["replies"]) == [thread["reply_b"].id,
+                                       thread["reply_a"].id]
+    assert _ids(old) == [thread["first"].id, thread["second"].id]
+    assert _ids(old[0]["replies"]) == [thread["reply_a"].id,
+                                       thread["reply_b"].id]
+
+
+@pytest.mark.django_db
+def test_node_shape_and_user_vote(thread):
+    VoteComment.objects.create(user=thread["author"],
+                               comment=thread["reply_b"], vote=1)
+
+    tree = build_comments_tree(thread["post"].id, thread["author"], "top")
+
+    reply_b = tree[1]["replies"][0]
+    assert list(reply_b) == ["id", "author", "content", "published_date",
+                             "votes", "image", "user_vote", "replies"]
+    assert reply_b["author"] == "autor"
+    assert reply_b["image"] is None
+    assert reply_b["user_vote"] == 1
+    assert tree[1]["replies"][1]["user_vote"] == 0
+
+
+@pytest.mark.django_db
+def test_tree_queries_do_not_depend_on_thread_size(
+        thread, django_assert_num_queries):
+    parent = thread["deep"]
+    for i in range(50):
+        parent = Comment.objects.create(post=thread["post"],
+                                        author=thread["author"],
+                                        content=f"r{i}", parent=parent)
+
+    # Un query per als comentaris i un altre pels vots de l'usuari
+    with django_assert_num_queries(2):
+        build_comments_tree(thread["post"].id, thread["author"], "top")
+
+
+@pytest.mark.django_db
+def test_comments_index_returns_tree(client, thread):
+    url = reverse("blog:comments_index", args=[thread["post"].id])
+
+    response = client.get(url, {"order": "old"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert _ids(data) == [thread["first"].id, thread["second"].id]
+    assert data[0]["author"] == "autor"
+    assert _ids(data[0]["replies"]) == [thread["reply_a"].id,
+                                        thread["reply_b"].id]
+
+
+# -------------------- PAGINATED THREAD -------------------- #
+
+def _thread_ids(nodes):
+    return [(node["id"], _thread_ids(node["replies"])) for node in nodes]
+
+
+@pytest.mark.django_db
+def test_thread_page_matches_full_tree_when_nothing_is_cut(thread):
+    for order in ("top", "new", "old"):
+        page, next_cursor = get_thread_page(thread["post"].id, order=order)
+
+        full = build_comments_tree(thread["post"].id, order=order)
+        assert _thread_ids(page) == _thread_ids(full)
+        assert next_cursor is None
+        assert all(node["more_replies"] is None for node in page)
+
+
+@pytest.mark.django_db
+def test_thread_page_paginates_roots(thread):
+    first, cursor = get_thread_page(thread["post"].id, order="old",
+                                    page_size=1)
+    second, last = get_thread_page(thread["post"].id, order="old",
+                                   cursor=cursor, page_size=1)
+
+    assert _ids(first) == [thread["first"].id]
+    assert _ids(second) == [thread["second"].id]
+    assert last is None
+
+
+@pytest.mark.django_db
+def test_thread_page_cuts_depth_and_breadth(thread):
+    page, _ = get_thread_page(thread["post"].id, order="top", depth=2,
+                              breadth=1)
+
+    second, first = page
+    # breadth: reply_b es mostra, reply_a queda darrere el cursor
+    assert _ids(first["replies"]) == [thread["reply_b"].id]
+    more, _ = get_thread_page(thread["post"].id, order="top",
+                              cursor=first["more_replies"], breadth=1)
+    assert _ids(more) == [thread["reply_a"].id]
+
+    # depth: nested no porta respostes, però sí el cursor per a deep
+    nested = second["replies"][0]
+    assert nested["replies"] == []
+    assert second["more_replies"] is None
+    deeper, next_cursor = get_thread_page(thread["post"].id, order="top",
+                                          cursor=nested["more_replies"])
+    assert _ids(deeper) == [thread["deep"].id]
+    assert next_cursor is None
+
+
+@pytest.mark.django_db
+def test_thread_page_cursors_ignore_pending_votes(thread, settings):
+    settings.VOTE_WRITE_BEHIND = True
+    buffer = vote_buffer.get_buffer()
+    buffer.add(("blog.Comment", thread["reply_b"].id, "votes"), 10)
+    try:
+        page, _ = get_thread_page(thread["post"].id, order="top", depth=2,
+                                  breadth=1)
+        first = page[1]
+        more, _ = get_thread_page(thread["post"].id, order="top",
+                                  cursor=first["more_replies"], breadth=1)
+    finally:
+        buffer.drain()
+
+    # El node mostra el vot pendent, el cursor continua pel de la BD
+    assert first["replies"][0]["votes"] == 13
+    assert _ids(more) == [thread["reply_a"].id]
+
+
+@pytest.mark.django_db
+def test_thread_page_query_count_is_per_level(
+        thread, django_assert_num_queries):
+    for i in range(30):
+        Comment.objects.create(post=thread["post"], author=thread["author"],
+                               content=f"r{i}", parent=thread["first"])
+
+    # Un query per nivell (3) i un altre pels vots de l'usuari
+    with django_assert_num_queries(4):
+        page, _ = get_thread_page(thread["post"].id, thread["author"],
+                                  depth=3, breadth=5)
+    assert len(page[1]["replies"]) == 5
+
+
+@pytest.mark.django_db
+def test_comments_thread_view(client, thread):
+    url = reverse("blog:comments_thread", args=[thread["post"].id])
+
+    response = client.get(url, {"order": "old", "limit": 1, "depth": 1})
+
+    data = response.json()
+    assert _ids(data["comments"]) == [thread["first"].id]
+    assert data["comments"][0]["more_replies"]
+    assert client.get(url, {"order": "old",
+                            "cursor": data["next_cursor"]}).status_code == 200
+    assert client.get(url, {"order": "new",
+                            "cursor": data["next_cursor"]}).status_code == 400
+    assert client.get(url, {"cursor": "xx"}).status_code == 400
+
+
+# -------------------- STREAMING -------------------- #
+
+@pytest.mark.django_db
+def test_iter_comments_tree_matches_build(thread):
+    for order in ("top", "new", "old"):
+        streamed = list(iter_comments_tree(thread["post"].id, order=order,
+                                           batch_size=1))
+
+        assert streamed == build_comments_tree(thread["post"].id,
+                                               order=order)
+
+
+@pytest.mark.django_db
+def test_comments_index_stream_mode(client, thread):
+    url = reverse("blog:comments_index", args=[thread["post"].id])
+
+    buffered = client.get(url, {"order": "top"})
+    streamed = client.get(url, {"order": "top", "stream": "1"})
+
+    assert streamed.streaming
+    assert streamed["Content-Type"] == "application/json"
+    assert b"".join(streamed.streaming_content) == buffered.content
+
+
+@pytest.fixture
+def comments_benchmark(thread):
+    """
+    Measures comments_index in both modes over benchmark.THREADS, each
+    thread on its own post, and prints the table (visible with
+    pytest -m benchmark -s). Returns {(roots, replies, mode): result}.
+    """
+    results = {}
+    for roots, replies in benchmark.THREADS:
+        post = Post.objects.create(title="Thread", content="Contenido",
+                                   author=thread["author"])
+        benchmark.comment_thread(post, thread["author"], roots, replies)
+        for mode, stream in [("buffered", False), ("streamed", True)]:
+            results[roots, replies, mode] = benchmark.measure(post.id,
+                                                              stream)
+    print("\n" + benchmark.report(results))
+    return results
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_streaming_keeps_peak_memory_flat(comments_benchmark):
+    (small, replies), (large, _) = benchmark.THREADS
+
+    for roots in (small, large):
+        buffered = comments_benchmark[roots, replies, "buffered"]
+        streamed = comments_benchmark[roots, replies, "streamed"]
+        assert streamed["bytes"] == buffered["bytes"]
+        assert streamed["first_comment"] < buffered["first_comment"]
+    # Amb el fil 4 vegades més gran el pic quasi no creix
+    assert (comments_benchmark[large, replies, "streamed"]["peak"]
+            < 2 * comments_benchmark[small, replies, "streamed"]["peak"])
+    assert (comments_benchmark[large, replies, "streamed"]["peak"] * 3
+            < comments_benchmark[large, replies, "buffered"]["peak"])
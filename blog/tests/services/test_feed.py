@@ -0,0 +1,165 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from blog.models import Comment, Post
+from blog.services.feed import (
+    FEED_ORDERS,
+    InvalidCursor,
+    encode_cursor,
+    feed_queryset,
+    get_feed_page,
+)
+
+
+@pytest.fixture
+def posts():
+    user = User.objects.create_user(username="autor", password="1234")
+    base = timezone.now() - timedelta(days=1)
+    created = []
+    for i in range(12):
+        # Valors repetits per comprovar el desempat per id
+        post = Post.objects.create(
+            title=f"Post {i}", content="Contenido", author=user,
+            votes=i % 3, published_date=base + timedelta(minutes=i // 2),
+        )
+        for _ in range(i % 4):
+            Comment.objects.create(post=post, author=user, content="c")
+        created.append(post)
+    return created
+
+
+def _walk(order, page_size):
+    ids, cursor = [], None
+    while True:
+        page, cursor = get_feed_page(order, cursor, page_size)
+        ids.extend(post.id for post in page)
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("order", list(FEED_ORDERS))
+@pytest.mark.parametrize("page_size", [1, 5, 12, 50])
+def test_pages_cover_feed_in_order(posts, order, page_size):
+    expected = list(feed_queryset(order).values_list("id", flat=True))
+
+    assert _walk(order, page_size) == expected
+    assert len(expected) == len(posts)
+
+
+@pytest.mark.django_db
+def test_deep_pages_use_keyset_not_offset(posts):
+    _, cursor = get_feed_page("mes_vots", None, 10)
+
+    with CaptureQueriesContext(connection) as ctx:
+        page, next_cursor = get_feed_page("mes_vots", cursor, 10)
+
+    assert len(page) == 2
+    assert next_cursor is None
+    assert "OFFSET" not in ctx.captured_queries[0]["sql"].upper()
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != "sqlite",
+                    reason="EXPLAIN QUERY PLAN de SQLite")
+@pytest.mark.parametrize("order", list(FEED_ORDERS))
+def test_every_order_reads_an_index(posts, order):
+    plan = feed_queryset(order)[:10].explain()
+
+    assert "TEMP B-TREE" not in plan
+
+
+@pytest.mark.django_db
+def test_cursor_from_other_order_is_rejected(posts):
+    cursor = encode_cursor("nou", posts[0])
+
+    with pytest.raises(InvalidCursor):
+        get_feed_page("mes_vots", cursor)
+    with pytest.raises(InvalidCursor):
+        get_feed_page("nou", "no-es-un-cursor")
+
+
+@pytest.mark.django_db
+def test_post_list_ignores_bad_cursor(client, posts):
+    response = client.get(reverse("blog:post_list"),
+                          {"order": "antic", "cursor": "roto"})
+
+    assert response.status_code == 200
+    assert response.context["posts_data"][0]["post"] == posts[0]
+
+
+@pytest.mark.django_db
+def test_feed_endpoint_serves_pages(client, posts):
+    url = reverse("blog:post_feed")
+
+    first = client.get(url, {"order": "antic", "limit": 10}).json()
+    second = client.get(url, {"order": "antic", "limit": 10,
+                              "cursor": first["next_cursor"]}).json()
+
+    assert [p["id"] for p in first["posts"] + second["posts"]] == [
+        post.id for post in posts
+    ]
+    assert second["next_cursor"] is None
+    assert "post-card" in first["posts"][0]["html"]
+
+
+@pytest.mark.django_db
+def test_feed_endpoint_rejects_bad_cursor(client, posts):
+    response = client.get(reverse("blog:post_feed"), {"cursor": "roto"})
+
+    assert response.status_code == 400
+
+
+# -------------------- FEED LOADER -------------------- #
+# Pressupost de queries per pàgina, amb la cache de targetes freda: no
+# ha de dependre del nombre de posts de la pàgina.
+FEED_QUERY_BUDGET = {
+    "post_list": 7,
+    "community_site": 11,
+    "profile": 15,
+}
+
+
+def _feed_url(view, community, user):
+    if view == "post_list":
+        return reverse("blog:post_list")
+    if view == "community_site":
+        return reverse("communities:community_site", args=[community.pk])
+    return reverse("accounts:profile", args=[user.username])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("view", list(FEED_QUERY_BUDGET))
+def test_feed_pages_stay_within_query_budget(client, view, post_card_cache):
+    from accounts.models import Profile
+    from communities.models import Community
+
+    user = User.objects.create_user(username="lector", password="1234")
+    profile = Profile.objects.create(user=user)
+    community = Community.objects.create(name="Gats")
+    other = Community.objects.create(name="Gossos")
+    client.login(username="lector", password="1234")
+
+    def page_queries(n):
+        for i in range(n):
+            post = Post.objects.create(title=f"Post {i}", content="c",
+                                       author=user)
+            post.communities.add(community, other)
+            comment = Comment.objects.create(post=post, author=user,
+                                             content="c")
+            profile.saved_posts.add(post)
+            profile.saved_comments.add(comment)
+        post_card_cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(_feed_url(view, community, user))
+        assert response.status_code == 200
+        assert response.content.count(b"Gossos") >= n
+        return len(ctx.captured_queries)
+
+    few, many = page_queries(2), page_queries(10)
+    assert few == many <= FEED_QUERY_BUDGET[view]
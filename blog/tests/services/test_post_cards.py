@@ -0,0 +1,129 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser, User
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.test.signals import template_rendered
+from accounts.models import Profile
+from blog.models import Post
+from blog.services.post_cards import BODY_TEMPLATE
+from communities.models import Community
+from mediafiles import benchmark
+from mediafiles.signals import image_processed
+
+
+def render_card(post, user=None, user_vote=0):
+    request = RequestFactory().get("/")
+    request.user = user or AnonymousUser()
+    return render_to_string("blog/post_card.html",
+                            {"post": post, "user_vote": user_vote},
+                            request=request)
+
+
+def fresh(post):
+    return Post.objects.select_related("author").get(pk=post.pk)
+
+
+@pytest.mark.django_db
+def test_warm_card_renders_without_queries(post, django_assert_num_queries):
+    community = Community.objects.create(name="Gats")
+    post.communities.add(community)
+    render_card(fresh(post))
+
+    post = fresh(post)
+    with django_assert_num_queries(0):
+        warm = render_card(post)
+
+    assert "Gats" in warm
+    assert "Contenido" in warm
+
+
+@pytest.mark.django_db
+def test_viewer_bits_are_not_cached(post, author):
+    other = User.objects.create_user(username="altre", password="1234")
+    Profile.objects.create(user=other).saved_posts.add(post)
+
+    as_author = render_card(fresh(post), author, user_vote=1)
+    as_other = render_card(fresh(post), other)
+
+    assert "Eliminar post" in as_author
+    assert f"/posts/{post.pk}/edit/" in as_author
+    assert "#28a745" in as_author
+    assert "Eliminar post" not in as_other
+    assert f"/posts/{post.pk}/edit/" not in as_other
+    assert "save-post-btn saved" in as_other
+    assert "save-post-btn saved" not in as_author
+
+
+@pytest.mark.django_db
+def test_card_invalidated_by_edit_and_communities(post):
+    render_card(fresh(post))
+
+    post.title = "Títol nou"
+    post.save()
+    assert "Títol nou" in render_card(fresh(post))
+
+    community = Community.objects.create(name="Gats")
+    post.communities.set([community])
+    assert "Gats" in render_card(fresh(post))
+
+    community.name = "Gossos"
+    community.save()
+    assert "Gossos" in render_card(fresh(post))
+
+    community.posts.clear()
+    assert "Gossos" not in render_card(fresh(post))
+
+
+@pytest.mark.django_db
+def test_card_invalidated_when_image_is_processed(post):
+    render_card(fresh(post))
+    Post.objects.filter(pk=post.pk).update(content="Després del worker")
+
+    assert "Després del worker" not in render_card(fresh(post))
+    image_processed.send(sender=Post, pk=post.pk, field="image")
+    assert "Després del worker" in render_card(fresh(post))
+
+
+@pytest.mark.django_db
+def test_votes_are_rendered_outside_the_fragment(post):
+    render_card(fresh(post))
+    Post.objects.filter(pk=post.pk).update(votes=7)
+
+    assert ">\n            7\n" in render_card(fresh(post))
+
+
+@pytest.mark.django_db
+def test_warm_feed_does_not_render_card_bodies(author):
+    for i in range(20):
+        Post.objects.create(title=f"Post {i}", content="c", author=author)
+    rendered = []
+
+    def count(sender, template, **kwargs):
+        if template.name == BODY_TEMPLATE:
+            rendered.append(template)
+
+    def render_feed():
+        rendered.clear()
+        for post in Post.objects.select_related("author"):
+            render_card(post)
+        return len(rendered)
+
+    template_rendered.connect(count)
+    try:
+        assert render_feed() == 20
+        assert render_feed() == 0
+    finally:
+        template_rendered.disconnect(count)
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_warm_feed_render_is_faster(author, post_card_cache):
+    posts = benchmark.feed_posts(author)
+
+    post_card_cache.clear()
+    cold = benchmark.render_feed(posts)
+    warm = benchmark.render_feed(posts)
+    print(f"\n500 cards: cold {cold * 1000:.0f}ms, warm {warm * 1000:.0f}ms")
+
+    assert warm < cold
@@ -0,0 +1,137 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from blog.models import Comment, Post
+from blog.services.feed import get_feed_page
+from blog.services.ranking import controversy_score, hot_score, tally_delta
+from blog.services.votes import DOWNVOTE, UPVOTE, vote_post
+
+
+@pytest.fixture
+def voters():
+    return [User.objects.create_user(username=f"user{i}", password="1234")
+            for i in range(4)]
+
+
+def test_hot_score_prefers_newer_posts_with_same_votes():
+    now = timezone.now()
+    assert hot_score(10, 0, 0, now) > hot_score(10, 0, 0,
+                                                now - timedelta(days=1))
+
+
+def test_hot_score_grows_with_votes_and_comments():
+    now = timezone.now()
+    assert hot_score(10, 0, 0, now) > hot_score(1, 0, 0, now)
+    assert hot_score(0, 0, 10, now) > hot_score(0, 0, 0, now)
+    assert hot_score(0, 10, 0, now) < hot_score(0, 0, 0, now)
+
+
+def test_controversy_score():
+    assert controversy_score(5, 0) == 0
+    assert controversy_score(10, 10) == 20
+    assert controversy_score(10, 10) > controversy_score(20, 2)
+
+
+def test_tally_delta():
+    assert tally_delta(0, 1) == (1, 0)
+    assert tally_delta(1, 0) == (-1, 0)
+    assert tally_delta(-1, 0) == (0, -1)
+    assert tally_delta(0, -1) == (0, 1)
+
+
+@pytest.mark.django_db
+def test_new_post_gets_hot_score(voters):
+    post = Post.objects.create(title="Post", content="c", author=voters[0])
+
+    post.refresh_from_db()
+    assert post.hot_score == hot_score(0, 0, 0, post.published_date)
+
+
+@pytest.mark.django_db
+def test_scores_follow_votes_and_comments(voters):
+    post = Post.objects.create(title="Post", content="c", author=voters[0])
+    vote_post(voters[0], post.id, UPVOTE)
+    vote_post(voters[1], post.id, DOWNVOTE)
+    Comment.objects.create(post=post, author=voters[2], content="c")
+
+    post.refresh_from_db()
+    assert post.hot_score == hot_score(1, 1, 1, post.published_date)
+    assert post.controversy_score == controversy_score(1, 1)
+
+
+@pytest.mark.django_db
+def test_tallies_follow_vote_transitions(voters):
+    post = Post.objects.create(title="Post", content="c", author=voters[0])
+    vote_post(voters[0], post.id, UPVOTE)
+    vote_post(voters[1], post.id, UPVOTE)
+    vote_post(voters[1], post.id, DOWNVOTE)  # 1 -> 0
+    vote_post(voters[2], post.id, DOWNVOTE)
+    vote_post(voters[2], post.id, DOWNVOTE)  # ja era -1: no fa res
+
+    post.refresh_from_db()
+    assert (post.upvotes, post.downvotes, post.votes) == (1, 1, 0)
+    assert post.hot_score == hot_score(1, 1, 0, post.published_date)
+
+
+@pytest.mark.django_db
+def test_vote_cost_does_not_grow_with_the_votes_of_the_post(voters):
+    author = voters[0]
+    quiet = Post.objects.create(title="Quiet", content="c", author=author)
+    popular = Post.objects.create(title="Popular", content="c",
+                                  author=author)
+    for i in range(50):
+        user = User.objects.create_user(username=f"fan{i}", password="1234")
+        vote_post(user, popular.id, UPVOTE)
+
+    with CaptureQueriesContext(connection) as few:
+        vote_post(voters[1], quiet.id, UPVOTE)
+    with CaptureQueriesContext(connection) as many:
+        vote_post(voters[1], popular.id, UPVOTE)
+
+    assert len(many) == len(few)
+    assert not any("blog_votepost" in q["sql"] and "COUNT(" in q["sql"]
+                   for q in many.captured_queries)
+    popular.refresh_from_db()
+    assert popular.hot_score == hot_score(51, 0, 0, popular.published_date)
+
+
+@pytest.mark.django_db
+def test_hot_and_controversial_feeds(voters):
+    author = voters[0]
+    old = timezone.now() - timedelta(days=3)
+    quiet = Post.objects.create(title="Quiet", content="c", author=author,
+                                published_date=old)
+    popular = Post.objects.create(title="Popular", content="c",
+                                  author=author, published_date=old)
+    split = Post.objects.create(title="Split", content="c", author=author,
+                                published_date=old)
+    for i, user in enumerate(voters):
+        vote_post(user, popular.id, UPVOTE)
+        vote_post(user, split.id, UPVOTE if i % 2 else DOWNVOTE)
+
+    hot, _ = get_feed_page("hot")
+    controversial, _ = get_feed_page("controversial")
+
+    assert hot[0] == popular
+    assert hot[-1] in (quiet, split)
+    assert controversial[0] == split
+
+
+@pytest.mark.django_db
+def test_recompute_post_scores_command(voters):
+    post = Post.objects.create(title="Post", content="c", author=voters[0])
+    vote_post(voters[0], post.id, UPVOTE)
+    Post.objects.update(hot_score=0, controversy_score=0, upvotes=0)
+
+    call_command("recompute_post_scores", "--batch-size", "1",
+                 stdout=StringIO())
+
+    post.refresh_from_db()
+    assert post.upvotes == 1
+    assert post.hot_score == hot_score(1, 0, 0, post.published_date)
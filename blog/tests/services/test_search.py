@@ -0,0 +1,88 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from blog.models import Comment, Post
+from blog.services.search import search_comments, search_posts
+
+
+def _post(author, title, content="Contingut"):
+    return Post.objects.create(title=title, content=content, author=author)
+
+
+@pytest.mark.django_db
+def test_search_posts_ranks_title_matches_first(author):
+    in_content = _post(author, "Receptes", "Com fer una paella valenciana")
+    in_title = _post(author, "Paella de marisc")
+    _post(author, "Res a veure")
+
+    posts, total = search_posts("paella")
+
+    assert posts == [in_title, in_content]
+    assert total == 2
+
+
+@pytest.mark.django_db
+def test_search_matches_prefixes_and_ignores_accents(author):
+    post = _post(author, "Informació pràctica")
+
+    assert search_posts("informacio")[0] == [post]
+    assert search_posts("pràct")[0] == [post]
+
+
+@pytest.mark.django_db
+def test_search_ignores_query_syntax(author):
+    _post(author, "Normal")
+
+    assert search_posts('"NEAR( OR *') == ([], 0)
+    assert search_posts("   ") == ([], 0)
+
+
+@pytest.mark.django_db
+def test_index_follows_edits_and_deletes(author):
+    post = _post(author, "Títol antic")
+    comment = Comment.objects.create(post=post, author=author,
+                                     content="comentari original")
+
+    post.title = "Títol renovat"
+    post.save()
+    comment.content = "comentari editat"
+    comment.save()
+
+    assert search_posts("antic")[0] == []
+    assert search_posts("renovat")[0] == [post]
+    assert search_comments("editat")[0] == [comment]
+
+    post.delete()
+    assert search_posts("renovat")[0] == []
+    assert search_comments("editat")[0] == []
+
+
+@pytest.mark.django_db
+def test_search_is_paginated(author):
+    posts = [_post(author, f"Tema repetit {i}") for i in range(5)]
+
+    first, total = search_posts("tema", page=1, page_size=2)
+    last, _ = search_posts("tema", page=3, page_size=2)
+
+    assert total == 5
+    assert len(first) == 2
+    assert len(last) == 1
+    assert set(first) | set(last) <= set(posts)
+
+
+@pytest.mark.django_db
+def test_both_mode_queries_each_index_once(client, author):
+    post = _post(author, "Gats i gossos")
+    Comment.objects.create(post=post, author=author,
+                           content="M'agraden els gats")
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(reverse("blog:search"),
+                              {"q": "gats", "type": "both"})
+
+    index_queries = [q["sql"] for q in ctx.captured_queries
+                     if "_fts" in q["sql"]]
+    assert len(index_queries) == 2
+    assert response.context["posts_results"] == [post]
+    assert len(response.context["comments_results"]) == 1
@@ -0,0 +1,148 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from accounts.models import Profile
+from blog.models import Comment, Post
+from blog.models.votes import VotePost
+from blog.services.viewer import (
+    SavedResolver,
+    get_saved_resolver,
+    get_user_post_votes,
+)
+
+
+def _create_posts(author, n):
+    return [
+        Post.objects.create(title=f"Post {i}", content="Contenido",
+                            author=author)
+        for i in range(n)
+    ]
+
+
+@pytest.mark.django_db
+def test_post_votes_keyed_by_post_id():
+    user = User.objects.create_user(username="votante", password="1234")
+    up, down, none = _create_posts(user, 3)
+    VotePost.objects.create(user=user, post=up, vote=1)
+    VotePost.objects.create(user=user, post=down, vote=-1)
+
+    votes = get_user_post_votes(user, [up, down, none])
+
+    assert votes == {up.id: 1, down.id: -1}
+
+
+@pytest.mark.django_db
+def test_post_votes_ignore_other_users():
+    user = User.objects.create_user(username="votante", password="1234")
+    other = User.objects.create_user(username="otro", password="1234")
+    (post,) = _create_posts(user, 1)
+    VotePost.objects.create(user=other, post=post, vote=1)
+
+    assert get_user_post_votes(user, [post]) == {}
+
+
+@pytest.mark.django_db
+def test_post_votes_anonymous_user_runs_no_queries(
+        django_assert_num_queries):
+    user = User.objects.create_user(username="autor", password="1234")
+    posts = _create_posts(user, 3)
+
+    with django_assert_num_queries(0):
+        assert get_user_post_votes(AnonymousUser(), posts) == {}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("page_size", [1, 10, 100])
+def test_post_votes_single_query_for_any_page_size(
+        page_size, django_assert_num_queries):
+    user = User.objects.create_user(username="votante", password="1234")
+    posts = _create_posts(user, page_size)
+    for post in posts[::2]:
+        VotePost.objects.create(user=user, post=post, vote=1)
+
+    with django_assert_num_queries(1):
+        votes = get_user_post_votes(user, posts)
+
+    assert len(votes) == len(posts[::2])
+
+
+@pytest.mark.django_db
+def test_post_list_vote_queries_do_not_grow_with_feed(client):
+    user = User.objects.create_user(username="votante", password="1234")
+    client.login(username="votante", password="1234")
+
+    def vote_queries(n):
+        for post in _create_posts(user, n):
+            VotePost.objects.create(user=user, post=post, vote=1)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(reverse("blog:post_list"))
+        assert response.status_code == 200
+        return [q for q in ctx.captured_queries
+                if "blog_votepost" in q["sql"]]
+
+    assert len(vote_queries(2)) == len(vote_queries(20)) == 1
+
+
+# -------------------- SAVED RESOLVER -------------------- #
+
+@pytest.mark.django_db
+def test_saved_resolver_loads_each_set_once(django_assert_num_queries):
+    user = User.objects.create_user(username="lector", password="1234")
+    saved, other = _create_posts(user, 2)
+    comment = Comment.objects.create(post=saved, author=user, content="c")
+    profile = Profile.objects.create(user=user)
+    profile.saved_posts.add(saved)
+    profile.saved_comments.add(comment)
+
+    resolver = SavedResolver(user)
+    with django_assert_num_queries(2):
+        for _ in range(10):
+            assert resolver.is_saved(saved)
+            assert not resolver.is_saved(other)
+            assert resolver.is_saved(comment)
+
+    with django_assert_num_queries(0):
+        assert not SavedResolver(AnonymousUser()).is_saved(saved)
+
+
+@pytest.mark.django_db
+def test_saved_resolver_cached_per_request_and_user(rf):
+    user = User.objects.create_user(username="lector", password="1234")
+    other = User.objects.create_user(username="altre", password="1234")
+    post, = _create_posts(user, 1)
+    Profile.objects.create(user=user).saved_posts.add(post)
+    request = rf.get("/")
+    request.user = user
+
+    resolver = get_saved_resolver(request)
+
+    assert get_saved_resolver(request, user) is resolver
+    assert resolver.is_saved(post)
+    assert not get_saved_resolver(request, other).is_saved(post)
+
+
+@pytest.mark.django_db
+def test_saved_stars_do_not_scan_per_card(client):
+    user = User.objects.create_user(username="lector", password="1234")
+    profile = Profile.objects.create(user=user)
+    client.login(username="lector", password="1234")
+
+    def saved_queries(n):
+        posts = _create_posts(user, n)
+        profile.saved_posts.add(*posts[::2])
+        for post in posts:
+            comment = Comment.objects.create(post=post, author=user,
+                                             content="c")
+            profile.saved_comments.add(comment)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(reverse("accounts:profile",
+                                          args=["lector"]))
+        assert response.content.count(b"save-post-btn saved") == (
+            2 * len(profile.saved_posts.all())
+        )
+        return [q for q in ctx.captured_queries
+                if "saved_posts" in q["sql"] or "saved_comments" in q["sql"]]
+
+    assert len(saved_queries(2)) == len(saved_queries(10))
@@ -0,0 +1,137 @@
+import time
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from blog.models import Comment, Post
+from blog.services import vote_buffer
+from blog.services.ranking import hot_score
+from blog.services.votes import DOWNVOTE, UPVOTE, vote_comment, vote_post
+
+
+# transaction=True: el vot entra al buffer amb on_commit, que dins la
+# transacció d'un test normal no s'executaria mai.
+@pytest.fixture(autouse=True)
+def write_behind():
+    with override_settings(VOTE_WRITE_BEHIND=True,
+                           VOTE_FLUSH_INTERVAL_MS=60_000):
+        yield
+        vote_buffer.stop_flusher()
+        vote_buffer.get_buffer().drain()
+
+
+@pytest.fixture
+def users():
+    return [User.objects.create_user(username=f"user{i}", password="1234")
+            for i in range(3)]
+
+
+@pytest.fixture
+def post(users):
+    return Post.objects.create(title="Post", content="c", author=users[0])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_votes_are_buffered_not_written(post, users):
+    assert vote_post(users[0], post.id, UPVOTE) == 1
+    assert vote_post(users[1], post.id, UPVOTE) == 2
+
+    post.refresh_from_db()
+    assert post.votes == 0
+    assert vote_buffer.pending_votes(Post, [post.id]) == {post.id: 2}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_flush_folds_deltas_in_batch(post, users):
+    comment = Comment.objects.create(post=post, author=users[0], content="c")
+    other = Post.objects.create(title="Altre", content="c", author=users[0])
+    for user in users:
+        vote_post(user, post.id, UPVOTE)
+        vote_post(user, other.id, DOWNVOTE)
+        vote_comment(user, comment.id, UPVOTE)
+
+    with CaptureQueriesContext(connection) as ctx:
+        assert vote_buffer.flush() == 3
+
+    # Un UPDATE per model (Post i Comment), no un per fila
+    updates = [q for q in ctx.captured_queries
+               if '"votes" = ("' in q["sql"]]
+    assert len(updates) == 2
+
+    post.refresh_from_db()
+    other.refresh_from_db()
+    comment.refresh_from_db()
+    assert (post.votes, other.votes, comment.votes) == (3, -3, 3)
+    assert (post.upvotes, other.downvotes) == (3, 3)
+    assert post.hot_score == hot_score(3, 0, 1, post.published_date)
+    assert vote_buffer.pending_votes(Post, [post.id, other.id]) == {}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reads_merge_pending_deltas(client, post, users):
+    client.login(username="user1", password="1234")
+    client.post(reverse("blog:upvote_post", args=[post.id]))
+
+    comment = Comment.objects.create(post=post, author=users[0],
+                                     content="Post comentat")
+    client.post(reverse("blog:comment_upvote", args=[comment.id]))
+
+    detail = client.get(reverse("blog:post_detail", args=[post.id]))
+    feed = client.get(reverse("blog:post_list"))
+    profile = client.get(reverse("accounts:profile", args=["user0"]))
+    search = client.get(reverse("blog:search"), {"q": "Post"})
+
+    assert detail.context["post"].votes == 1
+    assert detail.context["user_vote"] == 1
+    assert feed.context["posts_data"][0]["post"].votes == 1
+    assert profile.context["posts"][0].votes == 1
+    assert profile.context["comments"][0].votes == 1
+    assert search.context["posts_results"][0].votes == 1
+    assert search.context["comments_results"][0].votes == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_apply_pending_votes_is_noop_when_disabled(post, users):
+    vote_post(users[0], post.id, UPVOTE)
+
+    with override_settings(VOTE_WRITE_BEHIND=False):
+        posts = vote_buffer.apply_pending_votes([Post.objects.get()])
+
+    assert posts[0].votes == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_background_flusher_writes_votes(users):
+    post = Post.objects.create(title="Post", content="c", author=users[0])
+
+    with override_settings(VOTE_FLUSH_INTERVAL_MS=50):
+        vote_post(users[0], post.id, UPVOTE)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            post.refresh_from_db()
+            if post.votes == 1:
+                break
+            time.sleep(0.05)
+
+    assert post.votes == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_flusher_logs_errors_with_traceback(monkeypatch, caplog):
+    def fail():
+        raise RuntimeError("base de dades caiguda")
+
+    monkeypatch.setattr(vote_buffer, "flush", fail)
+    flusher = vote_buffer.VoteFlusher(0.01)
+    with caplog.at_level("ERROR", logger="blog.services.vote_buffer"):
+        flusher.start()
+        deadline = time.monotonic() + 5
+        while not caplog.records and time.monotonic() < deadline:
+            time.sleep(0.01)
+        flusher.stop()
+        flusher.join()
+
+    assert caplog.records[0].exc_info[0] is RuntimeError
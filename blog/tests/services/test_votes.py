@@ -0,0 +1,130 @@
+import threading
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.urls import reverse
+from blog.models import Comment, Post
+from blog.models.votes import VoteComment, VotePost
+from blog.services.votes import DOWNVOTE, UPVOTE, vote_comment, vote_post
+
+
+@pytest.mark.django_db
+def test_upvote_twice_is_a_noop(post, author):
+    assert vote_post(author, post.id, UPVOTE) == 1
+    assert vote_post(author, post.id, UPVOTE) == 1
+    assert VotePost.objects.get(user=author, post=post).vote == 1
+
+
+@pytest.mark.django_db
+def test_opposite_vote_moves_one_step(post, author):
+    vote_post(author, post.id, UPVOTE)
+
+    assert vote_post(author, post.id, DOWNVOTE) == 0
+    assert vote_post(author, post.id, DOWNVOTE) == -1
+    assert vote_post(author, post.id, DOWNVOTE) == -1
+    assert VotePost.objects.get(user=author, post=post).vote == -1
+
+
+@pytest.mark.django_db
+def test_vote_only_touches_votes_column(post, author):
+    Post.objects.filter(pk=post.pk).update(title="Canviat")
+
+    vote_post(author, post.id, UPVOTE)
+
+    post.refresh_from_db()
+    assert post.title == "Canviat"
+    assert post.votes == 1
+
+
+@pytest.mark.django_db
+def test_comment_vote_views(client, post, author):
+    comment = Comment.objects.create(post=post, author=author, content="c")
+    client.login(username="autor", password="1234")
+
+    up = client.post(reverse("blog:comment_upvote", args=[comment.id]))
+    down = client.post(reverse("blog:comment_downvote", args=[comment.id]))
+
+    assert up.json() == {"votes": 1}
+    assert down.json() == {"votes": 0}
+    assert VoteComment.objects.get(user=author, comment=comment).vote == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_votes_are_not_lost():
+    author = User.objects.create_user(username="autor", password="1234")
+    post = Post.objects.create(title="Post", content="c", author=author)
+    comment = Comment.objects.create(post=post, author=author, content="c")
+    voters = [
+        User.objects.create_user(username=f"user{i}", password="1234")
+        for i in range(20)
+    ]
+    errors = []
+    barrier = threading.Barrier(len(voters))
+
+    def worker(index, user):
+        try:
+            barrier.wait()
+            # Cada usuari vota dues vegades igual, i un de cada tres
+            # també un cop al revés (el seu vot torna a 0)
+            direction = UPVOTE if index % 4 else DOWNVOTE
+            for _ in range(2):
+                vote_post(user, post.id, direction)
+                vote_comment(user, comment.id, direction)
+            if index % 3 == 0:
+                vote_post(user, post.id, -direction)
+                vote_comment(user, comment.id, -direction)
+        except Exception as e:  # pragma: no cover - es reporta a baix
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i, user))
+               for i, user in enumerate(voters)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    expected = sum(UPVOTE if i % 4 else DOWNVOTE
+                   for i in range(20) if i % 3)
+    post.refresh_from_db()
+    comment.refresh_from_db()
+    assert post.votes == expected
+    assert comment.votes == expected
+    assert sum(VotePost.objects.values_list("vote", flat=True)) == expected
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_double_vote_by_the_same_user():
+    author = User.objects.create_user(username="autor", password="1234")
+    post = Post.objects.create(title="Post", content="c", author=author)
+    comment = Comment.objects.create(post=post, author=author, content="c")
+    errors = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        # Tots els fils creen la mateixa fila de vot alhora: el que perd
+        # la carrera ha de reintentar (IntegrityError) i no sumar
+        try:
+            barrier.wait()
+            vote_post(author, post.id, UPVOTE)
+            vote_comment(author, comment.id, UPVOTE)
+        except Exception as e:  # pragma: no cover - es reporta a baix
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    post.refresh_from_db()
+    comment.refresh_from_db()
+    assert post.votes == comment.votes == 1
+    assert VotePost.objects.get(user=author, post=post).vote == UPVOTE
+    assert VoteComment.objects.get(user=author, comment=comment).vote == UPVOTE
@@ -9,6 +9,11 @@ urlpatterns = [
         post_views.post_list,
         name="post_list",
     ),  # /posts/
+    path(
+        "posts/feed/",
+        post_views.post_feed,
+        name="post_feed",
+    ),  # /posts/feed/?order=nou&cursor=...
     path(
         "posts/create/",
         post_views.post_create,
@@ -34,6 +39,11 @@ urlpatterns = [
         post_views.comments_index,
         name="comments_index",
     ),  # /posts/1/comments/
+    path(
+        "posts/<int:post_id>/comments/thread/",
+        post_views.comments_thread,
+        name="comments_thread",
+    ),  # /posts/1/comments/thread/?cursor=...
     path(
         "posts/<int:post_id>/comments/create/",
         post_views.comment_create,
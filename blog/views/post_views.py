@@ -1,13 +1,42 @@
-from django.http import JsonResponse
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.views.decorators.http import require_POST
 from django.utils import timezone
 from blog.models import Post, Comment
-from blog.models.votes import VotePost, VoteComment
+from blog.models.comment import MAX_DEPTH
 from blog.forms import PostForm
+from blog.services.comment_tree import (
+    THREAD_BREADTH,
+    THREAD_DEPTH,
+    THREAD_PAGE_SIZE,
+    build_comments_tree,
+    get_thread_page,
+    iter_comments_tree,
+)
+from blog.services.comment_delete import delete_comment_subtree
+from blog.services.feed import (
+    DEFAULT_ORDER,
+    FEED_ORDERS,
+    PAGE_SIZE,
+    InvalidCursor,
+    get_feed_page,
+)
+from blog.services.search import (
+    PAGE_SIZE as SEARCH_PAGE_SIZE,
+    search_comments,
+    search_posts,
+)
+from blog.services.vote_buffer import apply_pending_votes
+from blog.services.viewer import get_user_post_votes, with_user_votes
+from blog.services.votes import DOWNVOTE, UPVOTE, vote_comment, vote_post
+from mediafiles.validators import validate_image_upload
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden
-from django.db.models import Count
+from django.http import HttpResponseBadRequest, HttpResponseForbidden
 
 
 @login_required
@@ -30,31 +59,61 @@ def post_edit(request, pk):
 
 
 def post_list(request):
-    order = request.GET.get("order", "nou")  # per defecte nou
-
-    if order == "nou":
-        posts = Post.objects.all().order_by("-published_date")
-    elif order == "antic":
-        posts = Post.objects.all().order_by("published_date")
-    elif order == "mes_comentaris":
-        posts = Post.objects.annotate(num_comments=Count(
-            'comments')).order_by("-num_comments")
-    elif order == "mes_vots":
-        posts = Post.objects.all().order_by("-votes")
-    else:
-        posts = Post.objects.all().order_by("-published_date")
-
-    posts_data = []
-    for post in posts:
-        user_vote = 0
-        if request.user.is_authenticated:
-            vote_obj = VotePost.objects.filter(user=request.user,
-                                               post=post).first()
-            if vote_obj:
-                user_vote = vote_obj.vote
-        posts_data.append({"post": post, "user_vote": user_vote})
-
-    return render(request, "blog/post_list.html", {"posts_data": posts_data})
+    order = request.GET.get("order", DEFAULT_ORDER)  # per defecte nou
+    if order not in FEED_ORDERS:
+        order = DEFAULT_ORDER
+
+    try:
+        posts, next_cursor = get_feed_page(order, request.GET.get("cursor"))
+    except InvalidCursor:
+        posts, next_cursor = get_feed_page(order)
+
+    apply_pending_votes(posts)
+    posts_data = with_user_votes(request.user, posts)
+
+    return render(request, "blog/post_list.html", {
+        "posts_data": posts_data,
+        "order": order,
+        "next_cursor": next_cursor,
+    })
+
+
+def post_feed(request):
+    """Pàgines del feed en JSON per a l'scroll infinit."""
+    order = request.GET.get("order", DEFAULT_ORDER)
+    if order not in FEED_ORDERS:
+        order = DEFAULT_ORDER
+    try:
+        page_size = int(request.GET.get("limit", PAGE_SIZE))
+        posts, next_cursor = get_feed_page(order,
+                                           request.GET.get("cursor"),
+                                           page_size)
+    except (ValueError, InvalidCursor):
+        return JsonResponse({"error": "Paràmetres de paginació invàlids."},
+                            status=400)
+
+    apply_pending_votes(posts)
+    posts_data = with_user_votes(request.user, posts)
+    return JsonResponse({
+        "posts": [
+            {
+                "id": item["post"].id,
+                "title": item["post"].title,
+                "author": item["post"].author.username,
+                "published_date": item["post"].published_date,
+                "votes": item["post"].votes,
+                "user_vote": item["user_vote"],
+                "url": item["post"].url,
+                "html": render_to_string(
+                    "blog/post_card.html",
+                    {"post": item["post"], "user_vote": item["user_vote"]},
+                    request=request,
+                ),
+            }
+            for item in posts_data
+        ],
+        "next_cursor": next_cursor,
+    })
 
 
 @login_required
@@ -74,13 +133,10 @@ def post_create(request):
 
 def post_detail(request, pk):
     post = get_object_or_404(Post, pk=pk)
+    apply_pending_votes([post])
 
-    user_vote = 0
-    if request.user.is_authenticated:
-        vote_obj = VotePost.objects.filter(user=request.user,
-                                           post=post).first()
-        if vote_obj:
-            user_vote = vote_obj.vote  # 1, -1 o 0
+    # 1, -1 o 0
+    user_vote = get_user_post_votes(request.user, [post]).get(post.pk, 0)
 
     return render(request, "blog/post_detail.html",
                   {"post": post, "user_vote": user_vote})
@@ -91,15 +147,7 @@ def post_detail(request, pk):
 @login_required
 def upvote_post(request, pk):
     post = get_object_or_404(Post, pk=pk)
-    vote_obj, _ = VotePost.objects.get_or_create(user=request.user, post=post)
-
-    if vote_obj.vote == 1:
-        pass
-    else:
-        post.votes += 1
-        vote_obj.vote += 1
-        vote_obj.save()
-        post.save()
+    vote_post(request.user, post.pk, UPVOTE)
 
     return redirect(request.META.get("HTTP_REFERER", "blog:post_list"))
 
@@ -108,15 +156,7 @@ def upvote_post(request, pk):
 @login_required
 def downvote_post(request, pk):
     post = get_object_or_404(Post, pk=pk)
-    vote_obj, _ = VotePost.objects.get_or_create(user=request.user, post=post)
-
-    if vote_obj.vote == -1:
-        pass
-    else:
-        post.votes -= 1
-        vote_obj.vote -= 1
-        vote_obj.save()
-        post.save()
+    vote_post(request.user, post.pk, DOWNVOTE)
 
     return redirect(request.META.get("HTTP_REFERER", "blog:post_list"))
 
@@ -126,94 +166,71 @@ def downvote_post(request, pk):
 @login_required
 def comment_upvote(request, comment_id):
     comment = get_object_or_404(Comment, pk=comment_id)
-    vote_obj, _ = VoteComment.objects.get_or_create(user=request.user,
-                                                    comment=comment)
-
-    if vote_obj.vote == 1:
-        pass
-    else:
-        comment.votes += 1
-        vote_obj.vote += 1
-        vote_obj.save()
-        comment.save()
+    votes = vote_comment(request.user, comment.pk, UPVOTE)
 
-    return JsonResponse({"votes": comment.votes})
+    return JsonResponse({"votes": votes})
 
 
 @require_POST
 @login_required
 def comment_downvote(request, comment_id):
     comment = get_object_or_404(Comment, pk=comment_id)
-    vote_obj, _ = VoteComment.objects.get_or_create(user=request.user,
-                                                    comment=comment)
+    votes = vote_comment(request.user, comment.pk, DOWNVOTE)
 
-    if vote_obj.vote == -1:
-        pass
-    else:
-        comment.votes -= 1
-        vote_obj.vote -= 1
-        vote_obj.save()
-        comment.save()
-
-    return JsonResponse({"votes": comment.votes})
+    return JsonResponse({"votes": votes})
 
 
 # ------------------- COMMENTS TREE Y CREACIÓN ------------------- #
 
 def get_comments_tree(post_id, user=None, order="top"):
-    def build_tree(comment):
-        user_vote = 0
-        if user and user.is_authenticated:
-            vote_obj = VoteComment.objects.filter(
-                user=user,
-                comment=comment).first()
-            user_vote = vote_obj.vote if vote_obj else 0
-        return {
-            "id": comment.id,
-            "author": comment.author.username,
-            "content": comment.content,
-            "published_date": comment.published_date,
-            "votes": comment.votes,
-            "image": comment.image.url if comment.image else None,
-            "user_vote": user_vote,
-            "replies": sorted(
-                [build_tree(reply) for reply in comment.replies.all()],
-                key=lambda x: (
-                    -x["votes"] if order == "top"
-                    else x["published_date"] if order == "old"
-                    else -x["published_date"].timestamp()
-                )
-            ),
-        }
-
-    # Define order for root comments
-    if order == "top":
-        root_comments = Comment.objects.filter(
-            post_id=post_id,
-            parent__isnull=True).order_by(
-                "-votes",
-                "-published_date")
-    elif order == "old":
-        root_comments = Comment.objects.filter(
-            post_id=post_id,
-            parent__isnull=True).order_by(
-                "published_date")
-    else:  # "new"
-        root_comments = Comment.objects.filter(
-            post_id=post_id,
-            parent__isnull=True).order_by(
-                "-published_date")
-
-    return [build_tree(c) for c in root_comments]
+    return build_comments_tree(post_id, user, order)
+
+
+def _json_array(items):
+    # Mateix format que JsonResponse, un element cada cop
+    yield "["
+    for i, item in enumerate(items):
+        yield (", " if i else "") + json.dumps(item, cls=DjangoJSONEncoder)
+    yield "]"
 
 
 def comments_index(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     order = request.GET.get("order", "top")  # 'top', 'new', or 'old'
+    if request.GET.get("stream"):
+        # L'arbre s'envia per subarbres a mesura que es construeix
+        return StreamingHttpResponse(
+            _json_array(iter_comments_tree(post.id, request.user, order)),
+            content_type="application/json",
+        )
     comments_data = get_comments_tree(post.id, request.user, order)
     return JsonResponse(comments_data, safe=False)
 
 
+def comments_thread(request, post_id):
+    """
+    Comentaris per pàgines en JSON: arrels paginades i respostes tallades
+    a `depth` nivells i `breadth` germans; els talls porten un cursor
+    ("more_replies") per carregar-ne més.
+    """
+    post = get_object_or_404(Post, pk=post_id)
+    order = request.GET.get("order", "top")  # 'top', 'new', or 'old'
+    try:
+        comments, next_cursor = get_thread_page(
+            post.id,
+            request.user,
+            order,
+            request.GET.get("cursor"),
+            page_size=int(request.GET.get("limit", THREAD_PAGE_SIZE)),
+            depth=int(request.GET.get("depth", THREAD_DEPTH)),
+            breadth=int(request.GET.get("breadth", THREAD_BREADTH)),
+        )
+    except (ValueError, InvalidCursor):
+        return JsonResponse({"error": "Paràmetres de paginació invàlids."},
+                            status=400)
+    return JsonResponse({"comments": comments, "next_cursor": next_cursor})
+
+
 @require_POST
 @login_required
 def comment_create(request, post_id):
@@ -222,10 +239,18 @@ def comment_create(request, post_id):
     content = request.POST.get("content")
     parent_id = request.POST.get("parent_id")
     image = request.FILES.get("image")
+    if image:
+        try:
+            validate_image_upload(image)
+        except ValidationError as e:
+            return HttpResponseBadRequest(e.messages[0])
 
     parent_comment = None
     if parent_id:
         parent_comment = get_object_or_404(Comment, pk=parent_id, post=post)
+        # El path té espai per a MAX_DEPTH nivells
+        if parent_comment.depth + 1 >= MAX_DEPTH:
+            return HttpResponseBadRequest("Massa nivells de respostes.")
 
     Comment.objects.create(
         post=post,
@@ -247,18 +272,28 @@ def comment_create(request, post_id):
 def search_view(request):
     query = request.GET.get("q", "")
     search_type = request.GET.get("type", "both")  # posts, comments, both
+    try:
+        page = max(1, int(request.GET.get("page", 1)))
+    except ValueError:
+        page = 1
     results = []
     posts_results = []
     comments_results = []
+    total = 0
 
+    # Cada índex es consulta un sol cop (resultats i total alhora)
     if query:
+        if search_type in ("posts", "both"):
+            posts_results, posts_total = search_posts(query, page)
+            total = max(total, posts_total)
+        if search_type in ("comments", "both"):
+            comments_results, comments_total = search_comments(query, page)
+            total = max(total, comments_total)
+        apply_pending_votes(posts_results + comments_results)
         if search_type == "posts":
-            results = Post.objects.filter(title__icontains=query)
+            results = posts_results
         elif search_type == "comments":
-            results = Comment.objects.filter(content__icontains=query)
-        elif search_type == "both":
-            posts_results = Post.objects.filter(title__icontains=query)
-            comments_results = Comment.objects.filter(content__icontains=query)
+            results = comments_results
 
     context = {
         "results": results,
@@ -266,6 +301,9 @@ def search_view(request):
         "search_type": search_type,
         "posts_results": posts_results,
         "comments_results": comments_results,
+        "page": page,
+        "has_previous": page > 1,
+        "has_next": page * SEARCH_PAGE_SIZE < total,
     }
     return render(request, "blog/search_results.html", context)
 
@@ -294,13 +332,8 @@ def comment_delete(request, comment_id):
     if request.user != comment.author:
         return HttpResponseForbidden("No pots esborrar aquest comentari.")
 
-    # 🔁 Borrado recursivo de replies
-    def delete_with_replies(c):
-        for reply in c.replies.all():
-            delete_with_replies(reply)
-        c.delete()
-
-    delete_with_replies(comment)
+    # Borra el comentario y todas sus replies en bloque (rango de path)
+    delete_comment_subtree(comment)
 
     # Respuesta JSON si viene de AJAX
     if request.headers.get("x-requested-with") == "XMLHttpRequest":
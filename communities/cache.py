@@ -0,0 +1,120 @@
+"""
+Cache of the community page: post ids of each feed order plus the
+subscriber, post and comment counters, in the ``community_feeds`` cache.
+
+Each community has a version key and every feed key includes it, so
+communities/signals.py invalidates all the orders of a community with a
+single ``incr`` when a post, comment or subscription changes.
+
+With the default LocMem backend the feeds and the versions are per
+process: the invalidation only reaches the gunicorn worker that handled
+the write, and the others can serve a stale feed for up to the alias
+TIMEOUT (60 s). ``COMMUNITY_FEEDS_REDIS_URL`` shares them (see
+settings.CACHES).
+"""
+import threading
+import time
+
+from django.core.cache import caches
+from blog.models import Comment
+from blog.services.feed import feed_queryset
+
+# Alias de CACHES (settings.py). La versió per comunitat permet invalidar
+# tots els ordres d'una comunitat amb un sol increment; les entrades
+# velles les acaba traient l'LRU del backend.
+CACHE_ALIAS = "community_feeds"
+
+
+class CacheStats:
+    """Hit/miss counters of the community feed cache (per process)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def record(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "miss_rate": self.misses / lookups if lookups else 0.0,
+            }
+
+
+stats = CacheStats()
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _version_key(community_id):
+    return f"community:{community_id}:version"
+
+
+def _version(community_id):
+    # Si l'LRU treu la clau de versió, en comencem una de nova (no 1) per
+    # no tornar a llegir entrades antigues que encara siguin a la cache.
+    return _cache().get_or_set(_version_key(community_id), time.time_ns,
+                               timeout=None)
+
+
+def _feed_key(community_id, order):
+    return f"community:{community_id}:v{_version(community_id)}:{order}"
+
+
+def _build_feed(community, order):
+    post_ids = list(
+        feed_queryset(order)
+        .filter(communities=community)
+        .values_list("id", flat=True)
+    )
+    return {
+        "post_ids": post_ids,
+        "subs": community.subscribers.count(),
+        "posts": len(post_ids),
+        "comments": Comment.objects.filter(
+            post__communities=community
+        ).count(),
+    }
+
+
+def get_community_feed(community, order):
+    """
+    Returns {"post_ids", "subs", "posts", "comments"} for the community
+    page, from cache when possible.
+    """
+    key = _feed_key(community.pk, order)
+    feed = _cache().get(key)
+    if feed is None:
+        stats.record("misses")
+        feed = _build_feed(community, order)
+        _cache().set(key, feed)
+    else:
+        stats.record("hits")
+    return feed
+
+
+def invalidate_community(*community_ids):
+    """Drops every cached feed of the given communities."""
+    cache = _cache()
+    for community_id in set(community_ids):
+        try:
+            cache.incr(_version_key(community_id))
+        except ValueError:
+            # No hi havia res a la cache per aquesta comunitat
+            pass
+        stats.record("invalidations")
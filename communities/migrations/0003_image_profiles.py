@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:54
+
+import communities.models
+import mediafiles.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("communities", "0002_community_subscribers"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="community",
+            name="avatar",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                upload_to=communities.models.community_avatar_path,
+                validators=[mediafiles.validators.validate_image_upload],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="community",
+            name="banner",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                upload_to=communities.models.community_banner_path,
+                validators=[mediafiles.validators.validate_image_upload],
+            ),
+        ),
+    ]
@@ -1,28 +1,29 @@
 from django.db import models
-import uuid
-import os
 from django.contrib.auth.models import User
+from mediafiles.images import upload_path
+from mediafiles.mixins import ProcessedImagesMixin
+from mediafiles.validators import validate_image_upload
 
 
 def community_avatar_path(instance, filename):
-    ext = filename.split(".")[-1]
-    filename = f"{uuid.uuid4()}.{ext}"
-    return os.path.join("community_avatars", filename)
+    return upload_path("community_avatars", filename)
 
 
 def community_banner_path(instance, filename):
-    ext = filename.split(".")[-1]
-    filename = f"{uuid.uuid4()}.{ext}"
-    return os.path.join("community_banners", filename)
+    return upload_path("community_banners", filename)
 
 
-class Community(models.Model):
+class Community(ProcessedImagesMixin, models.Model):
+    image_profiles = {"avatar": "avatar", "banner": "banner"}
+
     id = models.BigAutoField(primary_key=True)
     name = models.CharField(max_length=200, blank=True, null=True)
     avatar = models.ImageField(upload_to=community_avatar_path,
-                               blank=True, null=True)
+                               blank=True, null=True,
+                               validators=[validate_image_upload])
     banner = models.ImageField(upload_to=community_banner_path,
-                               blank=True, null=True)
+                               blank=True, null=True,
+                               validators=[validate_image_upload])
 
     # Subscriptions
     subscribers = models.ManyToManyField(
@@ -0,0 +1,97 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from blog.models import Comment, Post, PostsCommunities
+from blog.services.comment_delete import comments_deleted, deleted_with_post
+from blog.services.post_cards import invalidate_post_cards
+from .cache import invalidate_community
+from .models import Community
+
+
+def _communities_of_post(post_id):
+    return PostsCommunities.objects.filter(post_id=post_id).values_list(
+        "community_id", flat=True
+    )
+
+
+# -------------------- FEED CACHE INVALIDATION -------------------- #
+# Els canvis de comunitats també invaliden les targetes dels posts
+# afectats (blog/services/post_cards.py).
+# Amb LocMem la invalidació només arriba al worker que ha rebut el
+# canvi (vegeu communities/cache.py).
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_community(*_communities_of_post(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=PostsCommunities)
+def post_community_changed(sender, instance, **kwargs):
+    invalidate_community(instance.community_id)
+    invalidate_post_cards(instance.post_id)
+
+
+@receiver(m2m_changed, sender=PostsCommunities)
+def post_communities_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    # post.communities.set()/add()/remove() (el PostForm fa servir set)
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if reverse:
+        invalidate_community(instance.pk)
+        if action == "pre_clear":
+            invalidate_post_cards(
+                *instance.posts.values_list("pk", flat=True)
+            )
+        else:
+            invalidate_post_cards(*pk_set)
+        return
+    invalidate_post_cards(instance.pk)
+    if action == "pre_clear":
+        invalidate_community(*_communities_of_post(instance.pk))
+    else:
+        invalidate_community(*pk_set)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        invalidate_community(*_communities_of_post(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    # Si s'esborra el post, les files de PostsCommunities que cauen amb
+    # ell ja invaliden les seves comunitats (post_community_changed)
+    if deleted_with_post(instance, origin):
+        return
+    invalidate_community(*_communities_of_post(instance.post_id))
+
+
+@receiver(comments_deleted, sender=Comment)
+def comment_subtree_deleted(sender, post_id, **kwargs):
+    invalidate_community(*_communities_of_post(post_id))
+
+
+@receiver(post_save, sender=Community)
+def community_saved(sender, instance, created, **kwargs):
+    # El nom de la comunitat surt a les targetes dels seus posts
+    if not created:
+        invalidate_post_cards(
+            *instance.posts.values_list("pk", flat=True)
+        )
+
+
+@receiver(m2m_changed, sender=Community.subscribers.through)
+def subscribers_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        invalidate_community(instance.pk)
+    elif action == "pre_clear":
+        invalidate_community(
+            *instance.subscribed_communities.values_list("pk", flat=True)
+        )
+    else:
+        invalidate_community(*pk_set)
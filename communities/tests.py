@@ -1,4 +1,11 @@
 import pytest
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from blog.models import Comment, Post
+from communities import cache
 from communities.models import Community
 
 
@@ -113,3 +120,156 @@ def test_id_is_primary_key():
 def test_id_is_bigautofield():
     id_field = Community._meta.get_field("id")
     assert id_field.__class__.__name__ == "BigAutoField"
+
+
+# Testing community feed cache
+@pytest.fixture
+def feed_cache():
+    caches[cache.CACHE_ALIAS].clear()
+    cache.stats.reset()
+    yield cache
+    caches[cache.CACHE_ALIAS].clear()
+
+
+@pytest.fixture
+def community_with_posts():
+    user = User.objects.create_user(username="autor", password="1234")
+    community = Community.objects.create(name="Cached")
+    posts = []
+    for i in range(3):
+        post = Post.objects.create(title=f"Post {i}", content="c",
+                                   author=user)
+        post.communities.add(community)
+        posts.append(post)
+    return community, posts, user
+
+
+@pytest.mark.django_db
+def test_community_site_uses_cache(client, feed_cache, community_with_posts):
+    community, posts, _ = community_with_posts
+    url = reverse("communities:community_site", args=[community.pk])
+
+    first = client.get(url)
+    second = client.get(url)
+
+    assert [i["post"] for i in second.context["posts_data"]] == posts[::-1]
+    assert first.context["posts_count"] == second.context["posts_count"] == 3
+    assert feed_cache.stats.as_dict()["hits"] == 1
+    assert feed_cache.stats.as_dict()["misses"] == 1
+
+
+@pytest.mark.django_db
+def test_community_site_is_paged(client, feed_cache, community_with_posts,
+                                 monkeypatch):
+    community, posts, _ = community_with_posts
+    monkeypatch.setattr("communities.views.PAGE_SIZE", 2)
+    url = reverse("communities:community_site", args=[community.pk])
+
+    first = client.get(url, {"order": "antic"})
+    second = client.get(url, {"order": "antic", "page": 2})
+
+    assert [i["post"] for i in first.context["posts_data"]] == posts[:2]
+    assert first.context["has_next"]
+    assert [i["post"] for i in second.context["posts_data"]] == posts[2:]
+    assert second.context["has_previous"]
+    assert not second.context["has_next"]
+    assert second.context["posts_count"] == 3
+    assert b"?order=controversial" in first.content
+
+
+@pytest.mark.django_db
+def test_cache_keyed_by_order(feed_cache, community_with_posts):
+    community, posts, _ = community_with_posts
+
+    new = feed_cache.get_community_feed(community, "nou")
+    old = feed_cache.get_community_feed(community, "antic")
+
+    assert new["post_ids"] == [p.id for p in posts[::-1]]
+    assert old["post_ids"] == [p.id for p in posts]
+    assert feed_cache.stats.misses == 2
+
+
+@pytest.mark.django_db
+def test_cache_invalidated_by_model_changes(feed_cache,
+                                            community_with_posts):
+    community, posts, user = community_with_posts
+
+    def feed():
+        return feed_cache.get_community_feed(community, "nou")
+
+    feed()
+    Comment.objects.create(post=posts[0], author=user, content="c")
+    assert feed()["comments"] == 1
+
+    community.subscribers.add(user)
+    assert feed()["subs"] == 1
+
+    new_post = Post.objects.create(title="Nou", content="c", author=user)
+    new_post.communities.set([community])
+    assert feed()["post_ids"][0] == new_post.id
+
+    posts[1].delete()
+    assert posts[1].id not in feed()["post_ids"]
+    assert feed_cache.stats.hits == 0
+
+
+@pytest.mark.django_db
+def test_cache_stats_view_requires_staff(client, feed_cache,
+                                         community_with_posts):
+    _, _, user = community_with_posts
+    url = reverse("communities:cache_stats")
+    client.login(username="autor", password="1234")
+    assert client.get(url).status_code == 302
+
+    user.is_staff = True
+    user.save()
+    data = client.get(url).json()
+    assert set(data) >= {"hits", "misses", "hit_rate", "miss_rate"}
+
+
+# Testing community_list
+def _community_list_data(client, mode="tot"):
+    response = client.get(reverse("communities:community_list"),
+                          {"mode": mode})
+    assert response.status_code == 200
+    return {item["obj"].name: item
+            for item in response.context["community_data"]}
+
+
+@pytest.mark.django_db
+def test_community_list_counts_and_modes(client, community_with_posts):
+    community, posts, user = community_with_posts
+    other_user = User.objects.create_user(username="altre", password="1234")
+    empty = Community.objects.create(name="Empty")
+    community.subscribers.add(user, other_user)
+    Comment.objects.create(post=posts[0], author=user, content="c")
+    Comment.objects.create(post=posts[1], author=user, content="c")
+    client.login(username="autor", password="1234")
+
+    data = _community_list_data(client)
+
+    assert data["Cached"]["subs"] == 2
+    assert data["Cached"]["posts"] == 3
+    assert data["Cached"]["comments"] == 2
+    assert data["Cached"]["is_subscribed"] is True
+    assert data["Empty"]["subs"] == data["Empty"]["posts"] == 0
+    assert data["Empty"]["is_subscribed"] is False
+    assert list(_community_list_data(client, "subscrit")) == ["Cached"]
+    assert list(_community_list_data(client, "local")) == [empty.name]
+
+
+@pytest.mark.django_db
+def test_community_list_query_count_is_constant(client):
+    users = [User.objects.create_user(username=f"user{i}", password="1234")
+             for i in range(4)]
+    client.login(username="user0", password="1234")
+
+    def queries(n_communities):
+        for i in range(n_communities):
+            community = Community.objects.create(name=f"C{i}")
+            community.subscribers.add(*users)
+        with CaptureQueriesContext(connection) as ctx:
+            _community_list_data(client)
+        return len(ctx.captured_queries)
+
+    assert queries(1) == queries(10)
@@ -8,4 +8,5 @@ urlpatterns = [
     path('toggle-subscription/<int:pk>/',
          views.toggle_subscription,
          name='toggle_subscription'),
+    path("cache-stats/", views.cache_stats, name="cache_stats"),
 ]
@@ -1,9 +1,18 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from .forms import CommunityForm
+from .cache import get_community_feed, stats as feed_cache_stats
 from .models import Community
-from blog.models import Post
+from blog.models import Comment, Post, PostsCommunities
+from blog.services.feed import (
+    DEFAULT_ORDER, FEED_ORDERS, PAGE_SIZE, feed_loader,
+)
+from blog.services.vote_buffer import apply_pending_votes
+from blog.services.viewer import with_user_votes
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count
+from django.http import JsonResponse
+from django.db.models import Exists, F, Func, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
 
 @login_required
@@ -11,7 +20,7 @@ def toggle_subscription(request, pk):
     community = get_object_or_404(Community, pk=pk)
     user = request.user
 
-    if user in community.subscribers.all():
+    if community.subscribers.filter(pk=user.pk).exists():
         community.subscribers.remove(user)  # unsubscribe
     else:
         community.subscribers.add(user)     # subscribe
@@ -31,29 +40,52 @@ def community_create(request):
     return render(request, "communities/community_form.html", {"form": form})
 
 
+def _count(queryset):
+    """Scalar subquery counting the rows of `queryset` (has OuterRef)."""
+    return Coalesce(
+        Subquery(
+            queryset.order_by()
+            .annotate(n=Func(F("pk"), function="COUNT"))
+            .values("n")
+        ),
+        0,
+    )
+
+
 @login_required
 def community_list(request):
     user = request.user
     filter_mode = request.GET.get('mode', 'tot')  # default = 'tot'
 
-    communities = Community.objects.annotate(
-        real_posts=Count('posts', distinct=True),
-        real_comments=Count('posts__comments', distinct=True)
+    # Tot en una sola consulta: els comptadors són subconsultes (sense
+    # joins que multipliquin files) i la subscripció un EXISTS
+    subscriptions = Community.subscribers.through.objects.filter(
+        community_id=OuterRef("pk")
     )
+    communities = Community.objects.annotate(
+        subs=_count(subscriptions),
+        real_posts=_count(
+            PostsCommunities.objects.filter(community_id=OuterRef("pk"))
+        ),
+        real_comments=_count(
+            Comment.objects.filter(post__communities=OuterRef("pk"))
+        ),
+        is_subscribed=Exists(subscriptions.filter(user_id=user.pk)),
+    ).order_by("id")
 
     if filter_mode == 'subscrit':
-        communities = [c for c in communities if user in c.subscribers.all()]
+        communities = communities.filter(is_subscribed=True)
     elif filter_mode == 'local':
-        communities = [c for c in communities if user not in c.subscribers.all()]  # noqa: E501
+        communities = communities.filter(is_subscribed=False)
 
     community_data = []
     for c in communities:
         community_data.append({
             "obj": c,
-            "subs": c.subscribers.count(),
+            "subs": c.subs,  # type: ignore
             "posts": c.real_posts,  # type: ignore
             "comments": c.real_comments,  # type: ignore
-            "is_subscribed": user in c.subscribers.all()
+            "is_subscribed": c.is_subscribed,  # type: ignore
         })
 
     return render(
@@ -67,18 +99,24 @@ def community_list(request):
 
 
 def community_site(request, pk):
-    # Annotate single community with post and comment counts
-    community = get_object_or_404(
-        Community.objects.annotate(
-            real_posts=Count('posts', distinct=True),
-            real_comments=Count('posts__comments', distinct=True)
-        ),
-        id=pk
-    )
-
-    posts = Post.objects.filter(
-        communities=community
-    ).order_by('-published_date')
+    community = get_object_or_404(Community, id=pk)
+    order = request.GET.get("order", DEFAULT_ORDER)
+    if order not in FEED_ORDERS:
+        order = DEFAULT_ORDER
+
+    try:
+        page = max(1, int(request.GET.get("page", 1)))
+    except ValueError:
+        page = 1
+
+    # Ids dels posts i comptadors surten de la cache (communities/cache.py);
+    # només es carreguen els posts de la pàgina, com al feed
+    feed = get_community_feed(community, order)
+    start = (page - 1) * PAGE_SIZE
+    page_ids = feed["post_ids"][start:start + PAGE_SIZE]
+    posts_by_id = feed_loader(Post.objects.all()).in_bulk(page_ids)
+    posts = [posts_by_id[i] for i in page_ids if i in posts_by_id]
+    apply_pending_votes(posts)
 
     return render(
         request,
@@ -86,8 +124,19 @@ def community_site(request, pk):
         {
             'community': community,
             'posts': posts,
-            'subs': community.subscribers.count(),
-            'posts_count': community.real_posts,  # type: ignore
-            'comments_count': community.real_comments,  # type: ignore
+            'posts_data': with_user_votes(request.user, posts),
+            'order': order,
+            'page': page,
+            'has_previous': page > 1,
+            'has_next': start + PAGE_SIZE < len(feed["post_ids"]),
+            'subs': feed["subs"],
+            'posts_count': feed["posts"],
+            'comments_count': feed["comments"],
         }
     )
+
+
+@staff_member_required
+def cache_stats(request):
+    """Hit/miss rates of the community feed cache, for monitoring."""
+    return JsonResponse(feed_cache_stats.as_dict())
@@ -0,0 +1,67 @@
+import pytest
+
+
+@pytest.fixture(scope="session")
+def django_db_modify_db_settings(tmp_path_factory):
+    """
+    Test DB de SQLite en fitxer en lloc de memòria compartida, perquè els
+    tests de concurrència (fils amb la seva pròpia connexió) puguin
+    esperar el lock d'escriptura en lloc de fallar amb "table is locked".
+    """
+    from django.db import connections
+
+    settings_dict = connections["default"].settings_dict
+    if settings_dict["ENGINE"] == "django.db.backends.sqlite3":
+        db_path = tmp_path_factory.mktemp("db") / "test_db.sqlite3"
+        settings_dict["TEST"]["NAME"] = str(db_path)
+
+
+@pytest.fixture
+def author():
+    from django.contrib.auth.models import User
+
+    return User.objects.create_user(username="autor", password="1234")
+
+
+@pytest.fixture
+def post(author):
+    from blog.models import Post
+
+    return Post.objects.create(title="Post", content="Contenido",
+                               author=author)
+
+
+@pytest.fixture
+def media_storage(settings, tmp_path):
+    """
+    Media a un FileSystemStorage temporal en lloc d'S3 (amb la capa
+    content-addressed al damunt), i la conversió d'imatges en línia
+    (sense cua).
+    """
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "default": {
+            "BACKEND": "mediafiles.storage.ContentAddressedStorage",
+            "OPTIONS": {
+                "backend": "django.core.files.storage.FileSystemStorage",
+                "options": {"location": str(tmp_path),
+                            "base_url": "/media/"},
+            },
+        },
+    }
+    settings.MEDIA_URL = "/media/"
+    settings.MEDIA_TRANSCODE_ASYNC = False
+    return tmp_path
+
+
+@pytest.fixture(autouse=True)
+def post_card_cache():
+    """
+    Buida la cache de fragments de les targetes després de cada test: la
+    BD torna enrere i un post nou pot reaprofitar l'id d'un d'anterior.
+    """
+    from django.core.cache import caches
+    from blog.services.post_cards import CACHE_ALIAS
+
+    yield caches[CACHE_ALIAS]
+    caches[CACHE_ALIAS].clear()
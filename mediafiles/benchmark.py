@@ -0,0 +1,172 @@
+"""
+Peak memory and time of the image pipeline over a generated corpus, and
+the render time of a feed full of images (`render_feed`).
+
+Every measurement runs in a freshly spawned process. On Linux the peak
+is read from VmHWM after resetting it through /proc/self/clear_refs (a
+spawned child inherits the parent's ``ru_maxrss`` across exec, so that
+is only the fallback elsewhere). Run it directly with
+``python -m mediafiles.benchmark`` or through the ``image_benchmark``
+fixture in mediafiles/tests.py.
+"""
+import multiprocessing
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+from .processing import PROFILES, encode_variants
+
+# (format, size) of the generated images: a phone photo, a 12 MP and a
+# 24 MP camera JPEG, and a 12 MP PNG (no reduced-scale decoding).
+CORPUS = [
+    ("JPEG", (1280, 960)),
+    ("JPEG", (4000, 3000)),
+    ("JPEG", (6000, 4000)),
+    ("PNG", (4000, 3000)),
+]
+
+# ru_maxrss is in KiB on Linux and in bytes on macOS
+_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def generate_image(fmt, size):
+    """An RGB gradient of `size` encoded as `fmt`."""
+    gradient = Image.linear_gradient("L").resize(size)
+    img = Image.merge("RGB", (
+        gradient,
+        gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT),
+        gradient.transpose(Image.Transpose.FLIP_TOP_BOTTOM),
+    ))
+    buffer = BytesIO()
+    img.save(buffer, format=fmt, quality=90)
+    return buffer.getvalue()
+
+
+def encode_unbounded(data):
+    """
+    Reference: the pipeline before bounded decoding, which converted the
+    upload to RGB at full resolution before resizing.
+    """
+    spec = PROFILES["post"]
+    with Image.open(BytesIO(data)) as img:
+        current = img.convert("RGB")
+    for width, height, _ in spec["variants"].values():
+        current = current.copy()
+        current.thumbnail((width, height), Image.LANCZOS)
+        current.save(BytesIO(), format="WEBP", quality=spec["quality"],
+                     method=spec["method"])
+
+
+def _status_kb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise LookupError(field)
+
+
+def _reset_peak():
+    """Resets VmHWM to the current RSS; False where unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _measure(encode, data):
+    if _reset_peak():
+        def rss():
+            return _status_kb("VmHWM") * 1024
+    else:
+        def rss():
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            return usage.ru_maxrss * _RSS_UNIT
+    baseline = rss()
+    start = time.perf_counter()
+    encode(data)
+    elapsed = time.perf_counter() - start
+    return elapsed, rss() - baseline
+
+
+def measure(data, encode=encode_variants):
+    """(seconds, peak RSS growth in bytes) of `encode(data)`."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_measure, encode, data).result()
+
+
+def run(corpus=CORPUS, encode=encode_variants):
+    results = []
+    for fmt, size in corpus:
+        data = generate_image(fmt, size)
+        seconds, peak_rss = measure(data, encode)
+        results.append({
+            "format": fmt,
+            "size": size,
+            "bytes": len(data),
+            "seconds": seconds,
+            "peak_rss": peak_rss,
+        })
+    return results
+
+
+def report(results):
+    lines = [f"{'image':<16}{'file':>10}{'time':>10}{'peak RSS':>12}"]
+    for r in results:
+        name = f"{r['format']} {r['size'][0]}x{r['size'][1]}"
+        lines.append(
+            f"{name:<16}{r['bytes'] / 2**20:>8.1f}MB"
+            f"{r['seconds'] * 1000:>8.0f}ms{r['peak_rss'] / 2**20:>10.1f}MB"
+        )
+    return "\n".join(lines)
+
+
+def feed_posts(author, count=500):
+    """`count` posts whose image already has its WebP variants."""
+    from blog.models import Post
+
+    def name(i, variant):
+        return f"cas/{i % 256:02x}/{i:064x}.{variant}.webp"
+
+    Post.objects.bulk_create(
+        Post(
+            title=f"Post {i}",
+            content="Contingut",
+            author=author,
+            url=f"/posts/{i}/",
+            image=name(i, "full"),
+            image_variants={
+                variant: {"name": name(i, variant), "width": width}
+                for variant, (width, _, _) in
+                PROFILES["post"]["variants"].items()
+            },
+        )
+        for i in range(count)
+    )
+    return list(Post.objects.filter(author=author)
+                .select_related("author").order_by("id"))
+
+
+def render_feed(posts, user=None):
+    """Seconds taken to render blog/post_card.html for every post."""
+    from django.contrib.auth.models import AnonymousUser
+    from django.template.loader import get_template
+
+    template = get_template("blog/post_card.html")
+    context = {"user": user or AnonymousUser(), "user_vote": 0}
+    start = time.perf_counter()
+    for post in posts:
+        template.render({**context, "post": post})
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    print("bounded decode")
+    print(report(run()))
+    print("\nfull-resolution decode")
+    print(report(run(encode=encode_unbounded)))
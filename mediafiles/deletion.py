@@ -0,0 +1,103 @@
+"""
+Deferred media deletion.
+
+Deleting a model (or replacing/clearing one of its images) never talks
+to the storage backend: the file names are released through
+`storage.delete()`, which for ContentAddressedStorage drops a reference
+and, when nothing else uses the object, records its key in
+PendingDeletion. `purge()` then removes queued keys in batches of up to
+1,000 (one S3 DeleteObjects call each), after the transaction commits
+(`tasks.schedule_purge`) or from `manage.py purge_media`. Keys the
+backend fails to delete stay queued for the next drain.
+"""
+import logging
+
+from django.core.files.storage import default_storage
+
+from .models import MediaBlob, PendingDeletion
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def image_names(instance, fields=None):
+    """
+    {field: [stored names]} for the processed image fields of `instance`,
+    one entry per reference taken when the files were saved: each
+    variant (the field itself is the "full" one), or just the field for
+    images without variants. Fields that were not loaded (deferred) are
+    skipped instead of being fetched.
+    """
+    names = {}
+    for field in fields or instance.image_profiles:
+        if field not in instance.__dict__:
+            continue
+        value = instance.__dict__[field]
+        name = getattr(value, "name", value)
+        variants = instance.__dict__.get(f"{field}_variants") or {}
+        if variants:
+            names[field] = [info["name"] for info in variants.values()]
+        else:
+            names[field] = [name] if name else []
+    return names
+
+
+def release(names, storage=None):
+    """Drops one reference to each name (see module docstring)."""
+    storage = storage or default_storage
+    for name in names:
+        storage.delete(name)
+
+
+def enqueue(keys):
+    from .tasks import schedule_purge
+
+    keys = [key for key in keys if key]
+    if not keys:
+        return
+    PendingDeletion.objects.bulk_create(PendingDeletion(key=key)
+                                        for key in keys)
+    schedule_purge()
+
+
+def _remove(storage, keys):
+    """Deletes `keys` and returns the set of keys that failed."""
+    purge_keys = getattr(storage, "purge", None)
+    if purge_keys is not None:
+        return set(purge_keys(keys) or ())
+    failed = set()
+    for key in keys:
+        try:
+            storage.delete(key)
+        except Exception:
+            failed.add(key)
+    return failed
+
+
+def purge(storage=None, batch_size=BATCH_SIZE):
+    """
+    Removes queued keys from the backend, `batch_size` at a time, and
+    returns how many were removed. Safe to run concurrently: deleting a
+    key twice is harmless. Keys stored again in the meantime (a new
+    MediaBlob for the same content) are kept. Keys the backend fails to
+    delete are logged and left in the queue.
+    """
+    storage = storage or default_storage
+    total, last_id = 0, 0
+    while True:
+        batch = list(PendingDeletion.objects.filter(id__gt=last_id)
+                     .order_by("id").values_list("id", "key")[:batch_size])
+        if not batch:
+            return total
+        last_id = batch[-1][0]
+        keys = {key for _, key in batch}
+        keys -= set(MediaBlob.objects.filter(key__in=keys)
+                    .values_list("key", flat=True))
+        failed = _remove(storage, sorted(keys)) if keys else set()
+        if failed:
+            logger.warning("Could not delete %d media keys, kept for the "
+                           "next purge: %s", len(failed), sorted(failed))
+        PendingDeletion.objects.filter(
+            id__in=[pk for pk, key in batch if key not in failed]).delete()
+        total += len(keys - failed)
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.templatetags.static import static
+from django.utils.encoding import filepath_to_uri
+
+PLACEHOLDER = "img/image_processing.svg"
+
+# Signed URLs kept in memory (name -> (url, valid until)), LRU-bounded
+DEFAULT_SIGNED_URL_TTL = 50 * 60
+SIGNED_URL_CACHE_SIZE = 10_000
+_signed_urls = OrderedDict()
+_signed_urls_lock = threading.Lock()
+
+
+def media_url(file):
+    """
+    URL of a stored file (FieldFile or name) without asking the storage
+    backend: MEDIA_URL + name, which is what S3 returns for a public
+    bucket or CDN. With MEDIA_SIGNED_URLS the backend signs each name
+    once and the URL is reused for MEDIA_SIGNED_URL_TTL seconds (keep it
+    below AWS_QUERYSTRING_EXPIRE).
+    """
+    name = getattr(file, "name", file)
+    if not name:
+        return ""
+    if not getattr(settings, "MEDIA_SIGNED_URLS", False):
+        return urljoin(settings.MEDIA_URL, filepath_to_uri(name).lstrip("/"))
+
+    now = time.monotonic()
+    with _signed_urls_lock:
+        cached = _signed_urls.get(name)
+        if cached and cached[1] > now:
+            _signed_urls.move_to_end(name)
+            return cached[0]
+
+    storage = getattr(file, "storage", default_storage)
+    url = storage.url(name)
+    ttl = getattr(settings, "MEDIA_SIGNED_URL_TTL", DEFAULT_SIGNED_URL_TTL)
+    with _signed_urls_lock:
+        _signed_urls[name] = (url, now + ttl)
+        _signed_urls.move_to_end(name)
+        while len(_signed_urls) > SIGNED_URL_CACHE_SIZE:
+            _signed_urls.popitem(last=False)
+    return url
+
+
+def clear_url_cache():
+    with _signed_urls_lock:
+        _signed_urls.clear()
+
+
+def image_url(obj, variant="full", field="image"):
+    """
+    URL of one variant of `obj.<field>`: the placeholder while it is
+    being processed, and the plain file URL for images uploaded before
+    variants existed.
+    """
+    fieldfile = getattr(obj, field)
+    if not fieldfile:
+        return ""
+    if getattr(obj, f"{field}_processing", False):
+        return static(PLACEHOLDER)
+    info = (getattr(obj, f"{field}_variants", None) or {}).get(variant)
+    return media_url(info["name"] if info else fieldfile)
+
+
+def image_srcset(obj, field="image"):
+    """`srcset` value with every variant of `obj.<field>` ("" if none)."""
+    fieldfile = getattr(obj, field)
+    variants = getattr(obj, f"{field}_variants", None) or {}
+    if not fieldfile or not variants or getattr(
+            obj, f"{field}_processing", False):
+        return ""
+    return ", ".join(
+        f"{media_url(info['name'])} {info['width']}w"
+        for info in sorted(variants.values(), key=lambda i: i["width"])
+    )
+
+
+def upload_path(folder, filename):
+    """
+    `upload_to` helper: <folder>/<uuid>.webp for already converted files,
+    originals/<folder>/<uuid><ext> for uploads waiting to be transcoded.
+    ContentAddressedStorage replaces the former with a content hash.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".webp":
+        return f"{folder}/{uuid.uuid4()}.webp"
+    return f"originals/{folder}/{uuid.uuid4()}{ext}"
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from mediafiles.deletion import BATCH_SIZE, purge
+
+
+class Command(BaseCommand):
+    help = (
+        "Esborra del storage els fitxers pendents de la cua d'esborrat "
+        "(per lots de DeleteObjects). Pensat per executar-se amb cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = purge(batch_size=min(options["batch_size"], BATCH_SIZE))
+        self.stdout.write(self.style.SUCCESS(f"{total} fitxers esborrats."))
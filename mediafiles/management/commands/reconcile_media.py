@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from mediafiles.deletion import BATCH_SIZE, purge
+from mediafiles.mixins import ProcessedImagesMixin
+from mediafiles.models import MediaBlob, PendingDeletion
+
+
+def referenced_names():
+    """Every name the DB points to: image fields, variants and blobs."""
+    names = set(MediaBlob.objects.values_list("key", flat=True).iterator())
+    names.update(PendingDeletion.objects.values_list("key", flat=True)
+                 .iterator())
+    for model in apps.get_models():
+        if not issubclass(model, ProcessedImagesMixin):
+            continue
+        fields = {f.name for f in model._meta.concrete_fields}
+        for field in model.image_profiles:
+            variants = f"{field}_variants"
+            if variants in fields:
+                rows = model.objects.values_list(field, variants)
+            else:
+                rows = model.objects.values_list(field)
+            for name, *rest in rows.iterator():
+                if name:
+                    names.add(name)
+                for info in ((rest[0] if rest else None) or {}).values():
+                    names.add(info["name"])
+    return names
+
+
+class Command(BaseCommand):
+    help = (
+        "Recorre el llistat del bucket de media i mostra els fitxers que "
+        "cap fila de la BD referencia. Amb --delete els esborra."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--delete", action="store_true",
+            help="Esborra els fitxers orfes (per defecte només es llisten).",
+        )
+        parser.add_argument(
+            "--grace-hours", type=float, default=24,
+            help="Ignora els fitxers més nous (pujades encara en curs).",
+        )
+
+    def handle(self, *args, **options):
+        iter_keys = getattr(default_storage, "iter_keys", None)
+        if iter_keys is None:
+            raise CommandError("El storage de media no es pot llistar.")
+
+        referenced = referenced_names()
+        cutoff = timezone.now() - timedelta(hours=options["grace_hours"])
+        scanned, orphans, batch = 0, 0, []
+        for key, modified in iter_keys():
+            scanned += 1
+            if key in referenced or modified > cutoff:
+                continue
+            orphans += 1
+            self.stdout.write(key)
+            if options["delete"]:
+                batch.append(PendingDeletion(key=key))
+                if len(batch) >= BATCH_SIZE:
+                    PendingDeletion.objects.bulk_create(batch)
+                    batch = []
+        if batch:
+            PendingDeletion.objects.bulk_create(batch)
+
+        summary = f"{scanned} fitxers revisats, {orphans} orfes."
+        if options["delete"]:
+            summary += f" {purge()} esborrats."
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from mediafiles import tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Torna a encuar la conversió de les imatges que fa més de "
+        "--older-than minuts que estan marcades com a 'processing' (la "
+        "feina es va perdre en reiniciar el procés). Pensat per cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, default=15,
+                            help="Minuts (per defecte 15).")
+
+    def handle(self, *args, **options):
+        total = tasks.requeue_stale(timedelta(minutes=options["older_than"]))
+        # Les feines corren al pool d'aquest procés: esperem que acabin
+        tasks.shutdown(wait=True)
+        self.stdout.write(self.style.SUCCESS(f"{total} conversions encuades."))
@@ -0,0 +1,55 @@
+from collections import Counter
+
+from django.utils import timezone
+from .deletion import image_names, release
+from .tasks import schedule_transcode
+
+
+class ProcessedImagesMixin:
+    """
+    Model mixin for image fields that are stored as WebP variants.
+
+    `image_profiles` maps each field to its processing profile
+    (`mediafiles.processing.PROFILES`). A newly uploaded file is saved as
+    is and transcoded in the background after the row is written; the
+    optional `<field>_processing` / `<field>_variants` fields are reset
+    meanwhile, and `<field>_processing_since` records when the job was
+    queued (see `tasks.requeue_stale`). Files that a save replaces or
+    clears, and all of them when the row is deleted (mediafiles/signals.py),
+    are released for deferred deletion.
+    """
+    image_profiles = {}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_images = image_names(instance)
+        return instance
+
+    def save(self, *args, **kwargs):
+        pending = [
+            name for name in self.image_profiles
+            if getattr(self, name) and not getattr(self, name)._committed
+        ]
+        for name in pending:
+            if hasattr(self, f"{name}_processing"):
+                setattr(self, f"{name}_processing", True)
+            if hasattr(self, f"{name}_processing_since"):
+                setattr(self, f"{name}_processing_since", timezone.now())
+            if hasattr(self, f"{name}_variants"):
+                setattr(self, f"{name}_variants", {})
+
+        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get("update_fields")
+        stored = getattr(self, "_stored_images", {})
+        current = image_names(self)
+        for name, names in current.items():
+            if name in stored and (update_fields is None
+                                   or name in update_fields):
+                release((Counter(stored[name]) - Counter(names)).elements())
+                stored[name] = names
+        self._stored_images = {**current, **stored}
+
+        for name in pending:
+            schedule_transcode(self, name)
@@ -0,0 +1,29 @@
+from django.db import models
+
+
+class MediaBlob(models.Model):
+    """
+    One object stored by ContentAddressedStorage (mediafiles/storage.py).
+    `refcount` counts the saves of these bytes that have not been deleted
+    yet; the object is removed from the backend when it reaches zero.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.key} ({self.refcount})"
+
+
+class PendingDeletion(models.Model):
+    """
+    Storage key waiting to be removed from the backend. Rows are written
+    in the same transaction as the delete that released the file and
+    drained in batches by mediafiles.deletion.purge().
+    """
+    key = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.key
@@ -0,0 +1,146 @@
+import math
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+# Uploads declaring more pixels than this are rejected before decoding
+# (40 MP is a bit above a full-frame camera; RGB at that size is 120 MB).
+MAX_PIXELS = 40_000_000
+
+# Processing profiles, the one place to tune sizes and encoder effort.
+#   variants: name -> (width, height, crop), from largest to smallest.
+#     crop=False fits the image inside the box keeping its aspect ratio;
+#     crop=True fills the box and centre-crops the rest.
+#   quality: WebP quality (0-100).
+#   method: WebP effort (0 fastest ... 6 smallest files).
+# "full" is always stored under the field's own name.
+PROFILES = {
+    # Post and comment images. The variants keep the aspect ratio so
+    # they can be listed together in a srcset.
+    "post": {
+        "variants": {
+            "full": (1920, 1920, False),
+            "feed": (640, 640, False),
+            "thumb": (320, 320, False),
+        },
+        "quality": 85,
+        "method": 4,
+    },
+    "avatar": {
+        "variants": {"full": (256, 256, True)},
+        "quality": 85,
+        "method": 6,
+    },
+    "banner": {
+        "variants": {"full": (1500, 500, True)},
+        "quality": 80,
+        "method": 4,
+    },
+}
+
+DEFAULT_PROFILE = "post"
+
+
+class ImageTooLarge(ValueError):
+    """The image declares more pixels than the configured limit."""
+
+
+def check_pixels(img, max_pixels=MAX_PIXELS):
+    """Raises ImageTooLarge using only the size read from the header."""
+    width, height = img.size
+    if width * height > max_pixels:
+        raise ImageTooLarge(
+            f"{width}x{height} exceeds the limit of {max_pixels} pixels"
+        )
+
+
+def _scale(size, box):
+    """Factor that makes `size` fit in (or, cropping, cover) `box`."""
+    (width, height), (box_width, box_height, crop) = size, box
+    pick = max if crop else min
+    return pick(box_width / width, box_height / height)
+
+
+def decode_bounded(data, boxes, max_pixels=MAX_PIXELS):
+    """
+    Decodes `data` into an RGB image just large enough for every
+    (width, height, crop) box in `boxes`, without holding the
+    full-resolution pixels when the format allows it: JPEGs are decoded
+    at 1/2, 1/4 or 1/8 scale with `draft()`, other formats are shrunk
+    with `reduce()` right after loading. EXIF orientation is applied and
+    every metadata block (EXIF, ICC, XMP, comments) is dropped.
+    """
+    img = Image.open(BytesIO(data))
+    check_pixels(img, max_pixels)
+
+    width, height = img.size
+    # The boxes are in display orientation; EXIF 5-8 swap the axes
+    oriented = (width, height)
+    if img.getexif().get(0x0112) in (5, 6, 7, 8):
+        oriented = (height, width)
+    ratio = max(_scale(oriented, box) for box in boxes)
+    if ratio < 1:
+        size = (max(1, math.ceil(width * ratio)),
+                max(1, math.ceil(height * ratio)))
+        # draft() only picks a scale that stays >= the requested size
+        img.draft("RGB", size)
+        img.thumbnail(size, Image.LANCZOS)
+    img = ImageOps.exif_transpose(img)
+
+    rgb = img.convert("RGB")
+    rgb.info.clear()
+    return rgb
+
+
+def _fit(img, box):
+    """Resizes/crops `img` for `box`; never upscales."""
+    width, height, crop = box
+    if not crop:
+        resized = img.copy()
+        resized.thumbnail((width, height), Image.LANCZOS)
+        return resized
+    # Imatges petites: es retalla a la proporció sense ampliar
+    ratio = min(1, img.width / width, img.height / height)
+    size = (max(1, round(width * ratio)), max(1, round(height * ratio)))
+    return ImageOps.fit(img, size, Image.LANCZOS)
+
+
+def _webp(img, quality, method):
+    buffer = BytesIO()
+    img.save(buffer, format="WEBP", quality=quality, method=method)
+    return buffer.getvalue()
+
+
+def encode_variants(data, profile=DEFAULT_PROFILE, max_pixels=MAX_PIXELS):
+    """
+    Decodes the image once and returns {variant: (webp bytes, width)}
+    for every variant of `profile`. The decode already stops at the size
+    the largest variant needs, and each variant that keeps the aspect
+    ratio is resized from the previous (smaller) one.
+    Pure bytes-in/bytes-out so it can run in a worker process.
+    """
+    spec = PROFILES[profile]
+    boxes = spec["variants"]
+    current = decode_bounded(data, boxes.values(), max_pixels)
+
+    encoded = {}
+    for name, box in boxes.items():
+        variant = _fit(current, box)
+        if not box[2]:
+            current = variant
+        encoded[name] = (_webp(variant, spec["quality"], spec["method"]),
+                         variant.width)
+    return encoded
+
+
+def encode_webp(data, profile=DEFAULT_PROFILE):
+    """The "full" variant of `profile` as WebP bytes."""
+    return encode_variants(data, profile)["full"][0]
+
+
+def variant_name(name, variant):
+    """posts/u/abc.webp -> posts/u/abc.thumb.webp ("full" keeps the name)."""
+    if variant == "full":
+        return name
+    base, dot, ext = name.rpartition(".")
+    return f"{base}.{variant}.{ext}" if dot else f"{name}.{variant}"
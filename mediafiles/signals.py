@@ -0,0 +1,24 @@
+from django.apps import apps
+from django.db.models.signals import post_delete
+from django.dispatch import Signal
+from .deletion import image_names, release
+from .mixins import ProcessedImagesMixin
+
+
+# Sent when a transcode job has updated the row (sender=model, pk, field)
+image_processed = Signal()
+
+
+def release_deleted_images(sender, instance, **kwargs):
+    """Deleted rows (cascades included) release all their image files."""
+    for names in image_names(instance).values():
+        release(names)
+
+
+def connect():
+    # Només els models amb imatges: un receptor sense sender desactivaria
+    # el fast-delete de Django per a tots els models
+    for model in apps.get_models():
+        if issubclass(model, ProcessedImagesMixin):
+            post_delete.connect(release_deleted_images, sender=model,
+                                dispatch_uid=f"media_release_{model._meta}")
@@ -0,0 +1,158 @@
+"""
+Content-addressed media storage.
+
+`ContentAddressedStorage` wraps the real backend (S3 in production, a
+FileSystemStorage in tests) and stores each file under the SHA-256 of its
+bytes, so the same image uploaded many times is written and served once:
+
+    cas/3f/3fa1...e9.webp
+
+Every `save()` of identical bytes returns the same name and adds a
+reference (MediaBlob.refcount); `delete()` drops one and only queues the
+object for removal (mediafiles/deletion.py) when nobody uses it anymore.
+Names under the pass-through prefixes (the originals waiting to be
+transcoded) and files stored before this existed are saved straight to
+the backend and queued as they are on delete.
+"""
+import hashlib
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKEND = "storages.backends.s3boto3.S3Boto3Storage"
+PREFIX = "cas"
+PASSTHROUGH = ("originals/",)
+
+
+@deconstructible
+class ContentAddressedStorage(Storage):
+    def __init__(self, backend=DEFAULT_BACKEND, options=None, prefix=PREFIX,
+                 passthrough=PASSTHROUGH):
+        self.backend = import_string(backend)(**(options or {}))
+        self.prefix = prefix
+        self.passthrough = tuple(passthrough)
+
+    def key_for(self, digest, name):
+        ext = os.path.splitext(name)[1].lower()
+        return f"{self.prefix}/{digest[:2]}/{digest}{ext}"
+
+    def is_content_addressed(self, name):
+        return name.startswith(f"{self.prefix}/")
+
+    # Escriptura / esborrat
+
+    def get_available_name(self, name, max_length=None):
+        # El nom definitiu depèn del contingut: el decideix _save()
+        if name.startswith(self.passthrough):
+            return self.backend.get_available_name(name, max_length)
+        return name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        if name.startswith(self.passthrough):
+            return self.backend.save(name, content)
+
+        content.seek(0)
+        data = content.read()
+        key = self.key_for(hashlib.sha256(data).hexdigest(), name)
+        if MediaBlob.objects.filter(key=key).update(
+                refcount=F("refcount") + 1):
+            return key
+
+        # Primera referència: es puja (si no hi era ja) i es registra
+        if not self.backend.exists(key):
+            saved = self.backend.save(key, ContentFile(data))
+            if saved != key:
+                # Un altre procés l'ha pujat alhora (backend sense overwrite)
+                self.backend.delete(saved)
+        try:
+            with transaction.atomic():
+                MediaBlob.objects.create(key=key, size=len(data))
+        except IntegrityError:
+            MediaBlob.objects.filter(key=key).update(
+                refcount=F("refcount") + 1)
+        return key
+
+    def delete(self, name):
+        from .deletion import enqueue
+        from .models import MediaBlob
+
+        if not name:
+            return
+        if not self.is_content_addressed(name):
+            enqueue([name])
+            return
+
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(
+                key=name).first()
+            if blob is None:
+                return
+            if blob.refcount > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(
+                    refcount=F("refcount") - 1)
+                return
+            blob.delete()
+            enqueue([name])
+
+    def purge(self, keys):
+        """
+        Removes `keys` from the backend, batched when it supports it.
+        Returns the keys that could not be removed.
+        """
+        delete_many = getattr(self.backend, "delete_many", None)
+        if delete_many is not None:
+            return {error["Key"] for error in delete_many(keys)}
+        failed = set()
+        for key in keys:
+            try:
+                self.backend.delete(key)
+            except Exception:
+                failed.add(key)
+        return failed
+
+    def iter_keys(self):
+        """Yields (key, last modified) for every object in the backend."""
+        iter_keys = getattr(self.backend, "iter_keys", None)
+        if iter_keys is not None:
+            yield from iter_keys()
+            return
+
+        def walk(path):
+            dirs, files = self.backend.listdir(path)
+            for name in files:
+                key = f"{path}/{name}" if path else name
+                yield key, self.backend.get_modified_time(key)
+            for directory in dirs:
+                yield from walk(f"{path}/{directory}" if path else directory)
+
+        yield from walk("")
+
+    # Lectura: tot va al backend
+
+    def _open(self, name, mode="rb"):
+        return self.backend.open(name, mode)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
@@ -0,0 +1,218 @@
+"""
+Background image transcoding.
+
+The request only stores the original upload and marks the object as
+processing; `schedule_transcode` queues a job that, once the transaction
+commits, produces the WebP variants of the field's processing profile
+(`processing.PROFILES`) and swaps them into the model. Jobs run
+on a local thread pool (the queue stand-in) and hand the CPU-bound
+encoding to a process pool.
+
+With ``MEDIA_TRANSCODE_ASYNC = False`` the job runs inline instead,
+which is what tests and local development use.
+
+The pool lives in memory, so a restart between the commit and the
+encode loses the job and the row stays marked as processing;
+`requeue_stale` (the ``requeue_transcodes`` command) queues those again.
+"""
+import logging
+import threading
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .processing import encode_variants, variant_name
+from .validators import max_pixels
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+
+_lock = threading.Lock()
+_job_pool = None
+_encode_pool = None
+
+
+def _workers():
+    return getattr(settings, "MEDIA_TRANSCODE_WORKERS", DEFAULT_WORKERS)
+
+
+def _pools():
+    global _job_pool, _encode_pool
+    with _lock:
+        if _job_pool is None:
+            _job_pool = ThreadPoolExecutor(max_workers=_workers(),
+                                           thread_name_prefix="transcode")
+            _encode_pool = ProcessPoolExecutor(max_workers=_workers())
+        return _job_pool, _encode_pool
+
+
+def shutdown(wait=True):
+    """Stops the worker pools (they are recreated on the next job)."""
+    global _job_pool, _encode_pool
+    with _lock:
+        if _job_pool is not None:
+            _job_pool.shutdown(wait=wait)
+            _encode_pool.shutdown(wait=wait)
+        _job_pool = _encode_pool = None
+
+
+def _enqueue(label, pk, field_name):
+    if not getattr(settings, "MEDIA_TRANSCODE_ASYNC", True):
+        transcode(label, pk, field_name)
+        return
+
+    def enqueue():
+        job_pool, _ = _pools()
+        job_pool.submit(_run_job, label, pk, field_name)
+
+    transaction.on_commit(enqueue)
+
+
+def schedule_transcode(instance, field_name="image"):
+    """Queues the WebP transcoding of `instance.<field_name>`."""
+    _enqueue(instance._meta.label, instance.pk, field_name)
+
+
+def requeue_stale(older_than):
+    """
+    Queues again the jobs of the rows still marked `<field>_processing`
+    that were queued more than `older_than` (a timedelta) ago, or at an
+    unknown time. Their `<field>_processing_since` restarts, so a
+    second sweep does not queue them twice. Returns the number of jobs.
+    """
+    # Import local: mixins importa aquest mòdul
+    from .mixins import ProcessedImagesMixin
+
+    now = timezone.now()
+    total = 0
+    for model in apps.get_models():
+        if not issubclass(model, ProcessedImagesMixin):
+            continue
+        fields = {f.name for f in model._meta.concrete_fields}
+        for field_name in model.image_profiles:
+            flag = f"{field_name}_processing"
+            since = f"{field_name}_processing_since"
+            if flag not in fields or since not in fields:
+                continue
+            pks = list(
+                model.objects.filter(**{flag: True})
+                .filter(Q(**{f"{since}__lt": now - older_than})
+                        | Q(**{f"{since}__isnull": True}))
+                .values_list("pk", flat=True)
+            )
+            model.objects.filter(pk__in=pks).update(**{since: now})
+            for pk in pks:
+                _enqueue(model._meta.label, pk, field_name)
+            total += len(pks)
+    return total
+
+
+def schedule_purge():
+    """
+    Drains the media deletion queue once the transaction commits (inline
+    with ``MEDIA_TRANSCODE_ASYNC = False``, on the job pool otherwise).
+    """
+    from .deletion import purge
+
+    if not getattr(settings, "MEDIA_TRANSCODE_ASYNC", True):
+        transaction.on_commit(purge)
+        return
+
+    def enqueue():
+        job_pool, _ = _pools()
+        job_pool.submit(_run_purge)
+
+    transaction.on_commit(enqueue)
+
+
+def _run_purge():
+    from .deletion import purge
+
+    try:
+        purge()
+    except Exception:
+        logger.exception("Error deleting media")
+    finally:
+        connection.close()
+
+
+def _run_job(label, pk, field_name):
+    _, encode_pool = _pools()
+    try:
+        transcode(label, pk, field_name,
+                  encode=lambda data, profile: encode_pool.submit(
+                      encode_variants, data, profile, max_pixels()
+                  ).result())
+    except Exception:
+        logger.exception("Error transcoding %s #%s", label, pk)
+    finally:
+        connection.close()
+
+
+def transcode(label, pk, field_name="image", encode=None):
+    """
+    Converts the stored original to the WebP variants of the field's
+    processing profile and updates the row with a conditional UPDATE, so
+    an image replaced in the meantime is not overwritten. The original is
+    deleted afterwards.
+
+    `<field>_processing` and `<field>_variants` are updated when the model
+    has them (posts and comments do, avatars and banners don't).
+    """
+    from .signals import image_processed
+
+    if encode is None:
+        encode = partial(encode_variants, max_pixels=max_pixels())
+    model = apps.get_model(label)
+    obj = model.objects.filter(pk=pk).first()
+    if obj is None:
+        return
+    fieldfile = getattr(obj, field_name)
+    original = fieldfile.name
+    if not original:
+        return
+    storage = fieldfile.storage
+    profile = model.image_profiles[field_name]
+    fields = {f.name for f in model._meta.concrete_fields}
+    status = {}
+    if f"{field_name}_processing" in fields:
+        status[f"{field_name}_processing"] = False
+
+    saved = {}
+    try:
+        with storage.open(original, "rb") as f:
+            data = f.read()
+        main = fieldfile.field.generate_filename(obj, f"{field_name}.webp")
+        for variant, (content, width) in encode(data, profile).items():
+            name = storage.save(variant_name(main, variant),
+                                ContentFile(content))
+            saved[variant] = {"name": name, "width": width}
+    except Exception:
+        # Ens quedem amb l'original, que també es pot mostrar
+        logger.exception("Error converting %s #%s %s to WebP",
+                         label, pk, field_name)
+        for info in saved.values():
+            storage.delete(info["name"])
+        if status:
+            model.objects.filter(pk=pk).update(**status)
+            image_processed.send(sender=model, pk=pk, field=field_name)
+        return
+
+    values = {field_name: saved["full"]["name"], **status}
+    if f"{field_name}_variants" in fields:
+        values[f"{field_name}_variants"] = saved
+    updated = model.objects.filter(pk=pk, **{field_name: original}).update(
+        **values
+    )
+    if updated:
+        storage.delete(original)
+        image_processed.send(sender=model, pk=pk, field=field_name)
+    else:
+        for info in saved.values():
+            storage.delete(info["name"])
@@ -0,0 +1,22 @@
+from django import template
+from mediafiles import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_url(obj, variant="full", field="image"):
+    """{% image_url post "thumb" %}"""
+    return images.image_url(obj, variant, field)
+
+
+@register.simple_tag
+def image_srcset(obj, field="image"):
+    """<img srcset="{% image_srcset post %}" sizes="120px">"""
+    return images.image_srcset(obj, field)
+
+
+@register.filter
+def media_url(file):
+    """<img src="{{ profile.avatar|media_url }}">"""
+    return images.media_url(file)
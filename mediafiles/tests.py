@@ -0,0 +1,753 @@
+import os
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from moto import mock_aws
+from PIL import Image
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import Profile
+from blog.models import Comment, Post
+from communities.models import Community
+from mediafiles import benchmark, tasks
+from mediafiles.images import (
+    clear_url_cache,
+    image_srcset,
+    image_url,
+    media_url,
+)
+from mediafiles.deletion import purge
+from mediafiles.models import MediaBlob, PendingDeletion
+from mediafiles.processing import (
+    ImageTooLarge,
+    decode_bounded,
+    encode_variants,
+    encode_webp,
+    variant_name,
+)
+from mediafiles.validators import validate_image_upload
+
+
+def make_image(fmt="JPEG", size=(64, 48), color=(200, 30, 90)):
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def upload(name="foto.jpg", data=None):
+    return SimpleUploadedFile(name, data or make_image(),
+                              content_type="image/jpeg")
+
+
+# Testing encode_webp
+def test_encode_webp_returns_webp():
+    data = encode_webp(make_image("PNG"))
+
+    with Image.open(BytesIO(data)) as img:
+        assert img.format == "WEBP"
+        assert img.size == (64, 48)
+
+
+# Testing decode_bounded
+def test_decode_bounded_uses_jpeg_draft(monkeypatch):
+    calls = []
+    draft = Image.Image.draft
+    monkeypatch.setattr(
+        "PIL.JpegImagePlugin.JpegImageFile.draft",
+        lambda self, mode, size: calls.append(size) or draft(self, mode, size)
+    )
+
+    img = decode_bounded(make_image(size=(4000, 2000)),
+                         [(1000, 1000, False)])
+
+    assert img.size == (1000, 500)
+    assert calls[0] == (1000, 500)
+
+
+def test_decode_bounded_rejects_too_many_pixels():
+    with pytest.raises(ImageTooLarge):
+        decode_bounded(make_image(size=(400, 300)), [(100, 100, False)],
+                       max_pixels=100_000)
+
+
+def test_decode_bounded_strips_metadata_and_applies_orientation():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # girada 90°
+    exif[0x010F] = "Càmera"
+    buffer = BytesIO()
+    Image.new("RGB", (64, 48)).save(buffer, format="JPEG", exif=exif,
+                                    icc_profile=b"perfil")
+
+    img = decode_bounded(buffer.getvalue(), [(1920, 1920, False)])
+
+    assert img.size == (48, 64)
+    assert img.info == {}
+    with Image.open(BytesIO(encode_webp(buffer.getvalue()))) as webp:
+        assert "exif" not in webp.info
+        assert "icc_profile" not in webp.info
+
+
+# Testing encode_variants
+def test_encode_variants_keep_aspect_ratio():
+    variants = encode_variants(make_image(size=(2000, 1000)))
+
+    assert [(name, width) for name, (_, width) in variants.items()] == [
+        ("full", 1920), ("feed", 640), ("thumb", 320)]
+    with Image.open(BytesIO(variants["thumb"][0])) as img:
+        assert img.format == "WEBP"
+        assert img.size == (320, 160)
+
+
+def test_encode_variants_never_upscale():
+    variants = encode_variants(make_image(size=(64, 48)))
+
+    assert {width for _, width in variants.values()} == {64}
+
+
+def test_variant_name():
+    assert variant_name("posts/u/a.webp", "full") == "posts/u/a.webp"
+    assert variant_name("posts/u/a.webp", "thumb") == "posts/u/a.thumb.webp"
+
+
+@pytest.mark.parametrize("profile, size, expected", [
+    ("avatar", (1200, 800), (256, 256)),
+    ("avatar", (100, 60), (60, 60)),
+    ("banner", (4000, 3000), (1500, 500)),
+    ("banner", (600, 600), (600, 200)),
+])
+def test_crop_profiles(profile, size, expected):
+    data = encode_webp(make_image(size=size), profile)
+
+    with Image.open(BytesIO(data)) as img:
+        assert img.size == expected
+
+
+def test_banner_from_exif_rotated_photo():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # girada 90°: es mostra 3000x4000
+    buffer = BytesIO()
+    Image.new("RGB", (4000, 3000)).save(buffer, format="JPEG", exif=exif)
+
+    data = encode_webp(buffer.getvalue(), "banner")
+
+    with Image.open(BytesIO(data)) as img:
+        assert img.size == (1500, 500)
+
+
+# Testing validate_image_upload
+def test_validate_image_upload_limits(settings):
+    settings.MEDIA_MAX_IMAGE_PIXELS = 1000
+    with pytest.raises(ValidationError):
+        validate_image_upload(upload())
+
+    settings.MEDIA_MAX_IMAGE_PIXELS = 64 * 48
+    settings.MEDIA_MAX_UPLOAD_BYTES = 10
+    with pytest.raises(ValidationError):
+        validate_image_upload(upload())
+
+    settings.MEDIA_MAX_UPLOAD_BYTES = 1024 * 1024
+    image = upload()
+    validate_image_upload(image)
+    assert image.tell() == 0
+
+
+@pytest.mark.django_db
+def test_clean_fields_does_not_revalidate_stored_image(
+        media_storage, author, monkeypatch):
+    post = Post.objects.create(title="T", content="c", author=author,
+                               image=upload())
+    post.refresh_from_db()
+    calls = []
+    monkeypatch.setattr("mediafiles.validators.Image.open",
+                        lambda *args: calls.append(args))
+
+    post.title = "Editat"
+    post.clean_fields(exclude=["url"])
+
+    assert calls == []
+
+
+@pytest.mark.django_db
+def test_comment_create_rejects_huge_image(client, author, settings):
+    settings.MEDIA_MAX_IMAGE_PIXELS = 1000
+    post = Post.objects.create(title="T", content="c", author=author)
+    client.force_login(author)
+
+    response = client.post(reverse("blog:comment_create", args=[post.pk]),
+                           {"content": "c", "image": upload()})
+
+    assert response.status_code == 400
+    assert not Comment.objects.exists()
+
+
+# Testing transcoding
+@pytest.mark.django_db
+def test_post_image_transcoded(media_storage, author,
+                               django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        post = Post.objects.create(title="T", content="c", author=author,
+                                   image=upload())
+
+    post.refresh_from_db()
+    assert post.image.name.startswith("cas/")
+    assert post.image.name.endswith(".webp")
+    assert post.image_processing is False
+    with Image.open(post.image.path) as img:
+        assert img.format == "WEBP"
+    # L'original ja no hi és
+    assert list(media_storage.rglob("*.jpg")) == []
+    assert set(post.image_variants) == {"full", "feed", "thumb"}
+    assert post.image_variants["full"]["name"] == post.image.name
+    assert (media_storage / post.image_variants["thumb"]["name"]).exists()
+
+
+@pytest.mark.django_db
+def test_comment_image_transcoded(media_storage, author):
+    post = Post.objects.create(title="T", content="c", author=author)
+    comment = Comment.objects.create(post=post, author=author, content="c",
+                                     image=upload("foto.png",
+                                                  make_image("PNG")))
+
+    comment.refresh_from_db()
+    assert comment.image.name.startswith("cas/")
+    assert comment.image.name.endswith(".webp")
+    assert comment.image_processing is False
+
+
+@pytest.mark.django_db
+def test_profile_and_community_images_transcoded(
+        media_storage, author, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        profile = Profile.objects.create(
+            user=author,
+            avatar=upload(data=make_image(size=(900, 600))),
+            banner=upload(data=make_image(size=(3000, 2000))),
+        )
+        community = Community.objects.create(
+            name="C", avatar=upload(data=make_image(size=(900, 600))))
+
+    profile.refresh_from_db()
+    community.refresh_from_db()
+    assert profile.avatar.name.startswith("cas/")
+    assert community.avatar.name == profile.avatar.name
+    with Image.open(profile.avatar.path) as img:
+        assert (img.format, img.size) == ("WEBP", (256, 256))
+    with Image.open(profile.banner.path) as img:
+        assert img.size == (1500, 500)
+    assert list(media_storage.rglob("*.jpg")) == []
+
+
+@pytest.mark.django_db
+def test_broken_image_keeps_original(media_storage, author, caplog):
+    with caplog.at_level("ERROR", logger="mediafiles.tasks"):
+        post = Post.objects.create(title="T", content="c", author=author,
+                                   image=upload("roto.jpg", b"no es imatge"))
+
+    assert caplog.records[0].exc_info is not None
+    post.refresh_from_db()
+    assert post.image.name.startswith("originals/posts/autor/")
+    assert post.image_processing is False
+
+
+@pytest.mark.django_db
+def test_transcode_does_not_overwrite_replaced_image(
+        media_storage, author, django_capture_on_commit_callbacks):
+    post = Post.objects.create(title="T", content="c", author=author)
+    original = post.image.storage.save("originals/a.jpg", upload())
+    Post.objects.filter(pk=post.pk).update(image=original)
+
+    def replace_meanwhile(data, profile):
+        Post.objects.filter(pk=post.pk).update(image="posts/autor/nova.webp")
+        return encode_variants(data, profile)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        tasks.transcode("blog.Post", post.pk, "image",
+                        encode=replace_meanwhile)
+
+    post.refresh_from_db()
+    assert post.image.name == "posts/autor/nova.webp"
+    assert not MediaBlob.objects.exists()
+    assert list((media_storage / "cas").rglob("*.webp")) == []
+
+
+@pytest.mark.django_db
+def test_edit_without_new_image_does_not_transcode(media_storage, author,
+                                                   monkeypatch):
+    post = Post.objects.create(title="T", content="c", author=author,
+                               image=upload())
+    calls = []
+    monkeypatch.setattr("mediafiles.mixins.schedule_transcode",
+                        lambda *args: calls.append(args))
+
+    post.title = "Editat"
+    post.save()
+
+    assert calls == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_transcoding_off_request_path(media_storage, author, settings):
+    settings.MEDIA_TRANSCODE_ASYNC = True
+    try:
+        post = Post.objects.create(title="T", content="c", author=author,
+                                   image=upload())
+        assert post.image_processing is True
+        assert post.image.name.startswith("originals/")
+
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            post.refresh_from_db()
+            if not post.image_processing:
+                break
+            time.sleep(0.05)
+    finally:
+        tasks.shutdown()
+
+    assert post.image_processing is False
+    assert post.image.name.endswith(".webp")
+
+
+@pytest.mark.django_db
+def test_requeue_transcodes_recovers_lost_jobs(media_storage, author,
+                                               monkeypatch):
+    # La feina es perd (el procés es reinicia abans de convertir)
+    monkeypatch.setattr("mediafiles.mixins.schedule_transcode",
+                        lambda *args: None)
+    post = Post.objects.create(title="T", content="c", author=author,
+                               image=upload())
+    monkeypatch.undo()
+    assert post.image_processing is True
+
+    call_command("requeue_transcodes", stdout=StringIO())
+    post.refresh_from_db()
+    assert post.image_processing is True  # encara és recent
+
+    Post.objects.filter(pk=post.pk).update(
+        image_processing_since=timezone.now() - timedelta(hours=1))
+    out = StringIO()
+    call_command("requeue_transcodes", "--older-than", "15", stdout=out)
+
+    post.refresh_from_db()
+    assert "1 conversions" in out.getvalue()
+    assert post.image_processing is False
+    assert post.image.name.endswith(".webp")
+
+
+# Testing ContentAddressedStorage
+@pytest.mark.django_db
+def test_identical_files_stored_once(media_storage,
+                                     django_capture_on_commit_callbacks):
+    first = default_storage.save("posts/a/x.webp", ContentFile(b"meme"))
+    second = default_storage.save("comment_image/y.webp", ContentFile(b"meme"))
+
+    assert first == second
+    assert first.startswith("cas/") and first.endswith(".webp")
+    assert MediaBlob.objects.get(key=first).refcount == 2
+    assert len(list((media_storage / "cas").rglob("*.webp"))) == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        default_storage.delete(first)
+    assert default_storage.exists(first)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        default_storage.delete(second)
+    assert not default_storage.exists(first)
+    assert not MediaBlob.objects.exists()
+
+
+@pytest.mark.django_db
+def test_same_image_in_two_posts_shares_objects(media_storage, author):
+    data = make_image(size=(800, 600))
+    first = Post.objects.create(title="A", content="c", author=author,
+                                image=upload(data=data))
+    second = Post.objects.create(title="B", content="c", author=author,
+                                 image=upload(data=data))
+
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert first.image_variants == second.image_variants
+    assert len(list((media_storage / "cas").rglob("*.webp"))) == 3
+    assert set(MediaBlob.objects.values_list("refcount", flat=True)) == {2}
+
+
+@pytest.mark.django_db
+def test_originals_and_legacy_files_pass_through(
+        media_storage, django_capture_on_commit_callbacks):
+    first = default_storage.save("originals/x.jpg", ContentFile(b"jpg"))
+    second = default_storage.save("originals/x.jpg", ContentFile(b"jpg"))
+    (media_storage / "posts").mkdir()
+    (media_storage / "posts" / "vella.webp").write_bytes(b"webp")
+
+    assert first != second
+    assert not MediaBlob.objects.exists()
+    with django_capture_on_commit_callbacks(execute=True):
+        default_storage.delete("posts/vella.webp")
+    assert not (media_storage / "posts" / "vella.webp").exists()
+
+
+# Testing deferred deletion
+@pytest.fixture
+def purge_on_commit(django_capture_on_commit_callbacks):
+    return lambda: django_capture_on_commit_callbacks(execute=True)
+
+
+def stored_files(root):
+    return sorted(p for p in root.rglob("*") if p.is_file())
+
+
+@pytest.mark.django_db
+def test_post_delete_removes_its_files(media_storage, author,
+                                       purge_on_commit):
+    with purge_on_commit():
+        post = Post.objects.create(
+            title="T", content="c", author=author,
+            image=upload(data=make_image(size=(800, 600))))
+        Comment.objects.create(post=post, author=author, content="c",
+                               image=upload(data=make_image("PNG")))
+    assert len(stored_files(media_storage)) == 4
+
+    with purge_on_commit():
+        Post.objects.get(pk=post.pk).delete()  # i el comentari en cascada
+
+    assert stored_files(media_storage) == []
+    assert not MediaBlob.objects.exists()
+    assert not PendingDeletion.objects.exists()
+
+
+@pytest.mark.django_db
+def test_shared_files_survive_one_delete(media_storage, author,
+                                         purge_on_commit):
+    data = make_image(size=(800, 600))
+    with purge_on_commit():
+        first = Post.objects.create(title="A", content="c", author=author,
+                                    image=upload(data=data))
+        Post.objects.create(title="B", content="c", author=author,
+                            image=upload(data=data))
+
+    with purge_on_commit():
+        Post.objects.get(pk=first.pk).delete()
+
+    assert len(stored_files(media_storage)) == 3
+    assert set(MediaBlob.objects.values_list("refcount", flat=True)) == {1}
+
+
+@pytest.mark.django_db
+def test_replaced_and_cleared_images_are_released(media_storage, author,
+                                                  client, purge_on_commit):
+    with purge_on_commit():
+        Profile.objects.create(user=author, avatar=upload())
+    profile = Profile.objects.get(user=author)
+    old_avatar = profile.avatar.name
+
+    with purge_on_commit():
+        profile.avatar = upload(data=make_image(color=(0, 0, 255)))
+        profile.save()
+    assert not (media_storage / old_avatar).exists()
+
+    client.force_login(author)
+    with purge_on_commit():
+        client.post(reverse("accounts:settings"),
+                    {"nombre": "", "bio": "", "delete_avatar": "true"})
+    assert not Profile.objects.get(user=author).avatar
+    assert stored_files(media_storage) == []
+
+
+@pytest.mark.django_db
+def test_purge_deletes_in_batches_of_1000():
+    class RecordingStorage:
+        def __init__(self):
+            self.calls = []
+
+        def purge(self, keys):
+            self.calls.append(len(keys))
+
+    PendingDeletion.objects.bulk_create(
+        PendingDeletion(key=f"originals/{i}.jpg") for i in range(2500))
+    storage = RecordingStorage()
+
+    assert purge(storage) == 2500
+    assert storage.calls == [1000, 1000, 500]
+    assert not PendingDeletion.objects.exists()
+
+
+@pytest.mark.django_db
+def test_purge_keeps_keys_that_failed(caplog):
+    class FailingStorage:
+        def purge(self, keys):
+            return {"originals/1.jpg"}
+
+    PendingDeletion.objects.bulk_create(
+        PendingDeletion(key=f"originals/{i}.jpg") for i in range(3))
+
+    with caplog.at_level("WARNING", logger="mediafiles.deletion"):
+        assert purge(FailingStorage(), batch_size=2) == 2
+
+    assert list(PendingDeletion.objects.values_list("key", flat=True)) == [
+        "originals/1.jpg"]
+    assert "originals/1.jpg" in caplog.text
+
+
+@pytest.mark.django_db
+def test_reconcile_media_deletes_old_orphans(media_storage, author,
+                                             purge_on_commit):
+    with purge_on_commit():
+        post = Post.objects.create(title="T", content="c", author=author,
+                                   image=upload())
+    post.refresh_from_db()
+    old_orphan = media_storage / "posts" / "orfe.webp"
+    new_orphan = media_storage / "originals" / "pujant.jpg"
+    for path in (old_orphan, new_orphan):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x")
+    two_days_ago = time.time() - 48 * 3600
+    os.utime(old_orphan, (two_days_ago, two_days_ago))
+
+    out = StringIO()
+    call_command("reconcile_media", "--delete", stdout=out)
+
+    assert "posts/orfe.webp" in out.getvalue()
+    assert not old_orphan.exists()
+    assert new_orphan.exists()
+    assert (media_storage / post.image.name).exists()
+
+
+def test_s3_delete_many_against_moto(s3_storage_factory):
+    with mock_aws():
+        storage = s3_storage_factory()
+        client = storage.connection.meta.client
+        client.create_bucket(Bucket="media")
+        for i in range(1005):
+            client.put_object(Bucket="media", Key=f"cas/{i}.webp", Body=b"")
+
+        assert len(list(storage.iter_keys())) == 1005
+        storage.delete_many([f"cas/{i}.webp" for i in range(1005)])
+
+        assert list(storage.iter_keys()) == []
+
+
+# Testing PooledS3Boto3Storage
+@pytest.fixture
+def s3_storage_factory():
+    from asw_pd11e_dj.storages import (
+        PooledS3Boto3Storage,
+        reset_shared_clients,
+    )
+
+    reset_shared_clients()
+    yield lambda **kwargs: PooledS3Boto3Storage(
+        bucket_name="media", region_name="us-east-1", access_key="clau",
+        secret_key="secret", security_token=None, **kwargs)
+    reset_shared_clients()
+
+
+def test_s3_client_shared_across_instances_and_threads(s3_storage_factory):
+    first = s3_storage_factory()
+    second = s3_storage_factory(multipart_threshold=5 * 1024 * 1024)
+    other_thread = []
+    thread = threading.Thread(
+        target=lambda: other_thread.append(first.connection))
+    thread.start()
+    thread.join()
+
+    client = first.connection.meta.client
+    assert second.connection.meta.client is client
+    assert other_thread[0] is not first.connection
+    assert other_thread[0].meta.client is client
+    assert client.meta.config.max_pool_connections == 50
+    assert second.transfer_config.multipart_threshold == 5 * 1024 * 1024
+
+
+def test_s3_session_token_refreshes_in_place(s3_storage_factory):
+    # El primer ja ha caducat: el client el renova al següent ús
+    expiries = iter([timezone.now() - timedelta(hours=1),
+                     timezone.now() + timedelta(hours=1)])
+    tokens = iter(["token-1", "token-2"])
+
+    def refresher():
+        return {
+            "access_key": "clau",
+            "secret_key": "secret",
+            "token": next(tokens),
+            "expiry_time": next(expiries).isoformat(),
+        }
+
+    storage = s3_storage_factory(credentials_refresher=refresher)
+    client = storage.connection.meta.client
+    credentials = client._request_signer._credentials
+
+    assert credentials.get_frozen_credentials().token == "token-2"
+    assert storage.connection.meta.client is client
+
+
+def test_s3_multipart_upload_against_moto(s3_storage_factory):
+    with mock_aws():
+        storage = s3_storage_factory(multipart_threshold=5 * 1024 * 1024,
+                                     multipart_chunksize=5 * 1024 * 1024)
+        storage.connection.meta.client.create_bucket(Bucket="media")
+        data = b"x" * (12 * 1024 * 1024)
+
+        name = storage.save("cas/ab/gran.webp", ContentFile(data))
+
+        head = storage.connection.meta.client.head_object(Bucket="media",
+                                                          Key=name)
+        assert head["ContentLength"] == len(data)
+        assert head["ETag"].strip('"').endswith("-3")  # 3 parts
+
+
+# Testing image_url / image_srcset
+@pytest.mark.django_db
+def test_image_url_and_srcset_use_variants(media_storage, author):
+    post = Post.objects.create(title="T", content="c", author=author,
+                               image=upload(data=make_image(size=(800, 400))))
+    post.refresh_from_db()
+
+    thumb = post.image_variants["thumb"]["name"]
+    assert image_url(post, "thumb") == f"/media/{thumb}"
+    assert image_url(post) == post.image.url
+    assert image_srcset(post) == (
+        f"/media/{thumb} 320w, "
+        f"/media/{post.image_variants['feed']['name']} 640w, "
+        f"{post.image.url} 800w"
+    )
+
+
+@pytest.mark.django_db
+def test_image_url_placeholder_and_legacy(media_storage, author):
+    post = Post.objects.create(title="T", content="c", author=author)
+    Post.objects.filter(pk=post.pk).update(image="posts/autor/vella.jpg")
+    post.refresh_from_db()
+
+    # Imatges anteriors a les variants: es serveix l'original
+    assert image_url(post, "thumb") == "/media/posts/autor/vella.jpg"
+    assert image_srcset(post) == ""
+
+    post.image_processing = True
+    assert image_url(post, "thumb").endswith("img/image_processing.svg")
+    assert image_url(Post(title="x")) == ""
+
+
+# Testing media_url
+def test_media_url_built_from_media_url(settings, monkeypatch):
+    settings.MEDIA_URL = "https://cdn.example.com/media/"
+    settings.MEDIA_SIGNED_URLS = False
+    monkeypatch.setattr(default_storage, "url", None)  # no s'ha de cridar
+
+    assert media_url("cas/ab/foto ñ.webp") == (
+        "https://cdn.example.com/media/cas/ab/foto%20%C3%B1.webp")
+    assert media_url("") == ""
+
+
+def test_signed_media_urls_cached_until_ttl(settings, monkeypatch):
+    settings.MEDIA_SIGNED_URLS = True
+    settings.MEDIA_SIGNED_URL_TTL = 60
+    calls = []
+
+    def sign(name):
+        calls.append(name)
+        return f"https://s3/{name}?sig={len(calls)}"
+
+    monkeypatch.setattr(default_storage, "url", sign)
+    clock = [1000.0]
+    monkeypatch.setattr("mediafiles.images.time.monotonic", lambda: clock[0])
+    clear_url_cache()
+
+    assert media_url("a.webp") == "https://s3/a.webp?sig=1"
+    assert media_url("a.webp") == "https://s3/a.webp?sig=1"
+    clock[0] += 61
+    assert media_url("a.webp") == "https://s3/a.webp?sig=2"
+    assert calls == ["a.webp", "a.webp"]
+    clear_url_cache()
+
+
+# Benchmark: peak RSS and time over the generated corpus
+@pytest.fixture(scope="module")
+def image_benchmark():
+    """
+    Runs the bounded pipeline and the full-resolution reference over
+    benchmark.CORPUS, one spawned process per image, and prints both
+    tables (visible with pytest -m benchmark -s).
+    """
+    bounded = benchmark.run()
+    unbounded = benchmark.run(encode=benchmark.encode_unbounded)
+    print("\nbounded decode\n" + benchmark.report(bounded))
+    print("full-resolution decode\n" + benchmark.report(unbounded))
+    return bounded, unbounded
+
+
+@pytest.mark.benchmark
+def test_bounded_decode_peak_memory(image_benchmark):
+    bounded, unbounded = image_benchmark
+
+    for new, old in zip(bounded, unbounded):
+        width, height = new["size"]
+        if new["format"] == "JPEG" and width >= 4000:
+            # Mai es descodifica a resolució completa
+            assert new["peak_rss"] * 2 < old["peak_rss"]
+
+
+# Benchmark: 500-post feed with images, URLs from MEDIA_URL vs signed
+@pytest.fixture
+def feed_benchmark(settings, author, monkeypatch, post_card_cache):
+    """
+    Renders the same 500-post feed with public URLs, with signed URLs
+    and a cold cache and with signed URLs already cached, on top of the
+    S3 backend (signing is local, nothing goes over the network). The
+    post card fragments are dropped before each scenario, so every
+    render builds its URLs.
+    Returns {scenario: (seconds, storage url() calls)}.
+    """
+    from asw_pd11e_dj.storages import PooledS3Boto3Storage
+
+    settings.MEDIA_URL = "https://media.example.com/"
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "default": {
+            "BACKEND": "mediafiles.storage.ContentAddressedStorage",
+            "OPTIONS": {
+                "backend": "asw_pd11e_dj.storages.PooledS3Boto3Storage",
+                "options": {"bucket_name": "media",
+                            "region_name": "us-east-1",
+                            "querystring_auth": True},
+            },
+        },
+    }
+    calls = []
+    sign = PooledS3Boto3Storage.url
+    monkeypatch.setattr(
+        PooledS3Boto3Storage, "url",
+        lambda self, name, *args, **kwargs: calls.append(name) or sign(
+            self, name, *args, **kwargs),
+    )
+    posts = benchmark.feed_posts(author)
+    clear_url_cache()
+
+    results = {}
+    for scenario, signed in [("public", False), ("signed, cold", True),
+                             ("signed, cached", True)]:
+        settings.MEDIA_SIGNED_URLS = signed
+        post_card_cache.clear()
+        calls.clear()
+        results[scenario] = (benchmark.render_feed(posts), len(calls))
+    clear_url_cache()
+
+    print()
+    for scenario, (seconds, count) in results.items():
+        print(f"{scenario:<16}{seconds * 1000:>8.0f}ms{count:>6} url()")
+    return results
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_feed_render_does_not_call_storage(feed_benchmark):
+    # thumb (src i srcset), feed i full: 3 noms per post
+    assert feed_benchmark["public"][1] == 0
+    assert feed_benchmark["signed, cold"][1] == 3 * 500
+    assert feed_benchmark["signed, cached"][1] == 0
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from PIL import Image
+from .processing import MAX_PIXELS, ImageTooLarge, check_pixels
+
+DEFAULT_MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+
+def max_pixels():
+    return getattr(settings, "MEDIA_MAX_IMAGE_PIXELS", MAX_PIXELS)
+
+
+def validate_image_upload(file):
+    """
+    Rejects uploads over MEDIA_MAX_UPLOAD_BYTES or whose header declares
+    more than MEDIA_MAX_IMAGE_PIXELS pixels. Only the header is read, the
+    pixels are decoded later by the transcoder. Files already stored
+    were checked when they were uploaded and are skipped, so a
+    full_clean() on an edited instance doesn't read them back from the
+    storage.
+    """
+    if getattr(file, "_committed", False):
+        return
+    limit = getattr(settings, "MEDIA_MAX_UPLOAD_BYTES",
+                    DEFAULT_MAX_UPLOAD_BYTES)
+    if file.size is not None and file.size > limit:
+        raise ValidationError(
+            "La imagen no puede superar los %(mb)d MB.",
+            code="file_too_large",
+            params={"mb": limit // (1024 * 1024)},
+        )
+    position = file.tell() if hasattr(file, "tell") else 0
+    try:
+        check_pixels(Image.open(file), max_pixels())
+    except ImageTooLarge:
+        raise ValidationError(
+            "La imagen tiene demasiada resolución.", code="too_many_pixels"
+        )
+    except Exception:
+        # Imatge il·legible: ja ho diu ImageField (o el transcoder)
+        pass
+    finally:
+        file.seek(position)